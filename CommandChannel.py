@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""Persistent command channel from the controller to the emulator's command server. Messages are newline-delimited JSON objects carrying the
+   session of the channel, an id, and a batch of mobility commands:
+      {"session": "9f1c...", "id": 3, "commands": [{"Drone": "drone5", "Action": "Move to Hover", ...}, {"Drone": "drone1", ...}]}
+   and are acknowledged asynchronously by the server with:
+      {"id": 3, "ack": "ACK", "count": 2}
+   Commands are pipelined over a single long-lived TCP connection (green threads of Ryu's hub). Unacknowledged messages are re-sent when the
+   connection is re-established; the server ignores messages whose id has already been handled in the same session. Every channel has its own
+   random session, since ids restart at 1 when the controller restarts"""
+
+#################################################################################################################Imports
+from ryu.lib import hub
+
+import json
+import socket
+import time
+import uuid
+
+class CommandChannel: ####################################################################################Command Channel
+    '''Creates a CommandChannel object and starts its sender green thread (the connection is opened on demand)
+       @param str address (address of the command server)
+       @param int port (port number of the command server)
+       @param function on_ack (called with message id, commands, reply, and round-trip time [s] for every acknowledged message)
+       @param float reconnect_interval (time in between connection attempts [s])'''
+    def __init__(self, address, port, on_ack=None, reconnect_interval=1.0):
+        self.address=address
+        self.port=port
+        self.on_ack=on_ack
+        self.reconnect_interval=reconnect_interval
+
+        self.__queue=hub.Queue() #queue of messages waiting to be sent
+        self.__pending={} #dictionary <int id, (dict message, float send time)> of messages waiting for an ACK
+        self.__session=uuid.uuid4().hex #session of the channel (message ids are unique within it)
+        self.__next_id=1 #next message id
+        self.__sock=None #connected socket (None when disconnected)
+        self.__connecting=False #True while a connection attempt is in progress
+        self.__running=True
+
+        self.__rtt=[] #round-trip times of acknowledged messages [s]
+        self.__connections=0 #counter of established connections
+        self.__resent=0 #counter of messages re-sent after a reconnection
+
+        self.__thread=hub.spawn(self.sender)
+
+    '''Enqueue a batch of commands, sent as a single message
+       @param CommandChannel object
+       @param dict commands (one or more mobility commands)
+       @return int id (message id)'''
+    def send(self, *commands):
+        msg_id=self.__next_id
+        self.__next_id+=1
+        self.__queue.put({'session': self.__session, 'id': msg_id, 'commands': list(commands)})
+        return msg_id
+
+    '''Stop the channel, closing its connection
+       @param CommandChannel object'''
+    def close(self):
+        self.__running=False
+        self.__queue.put(None)
+        self.disconnect()
+
+    '''Green thread function. Sends queued messages on the persistent connection, (re)connecting when needed
+       @param CommandChannel object'''
+    def sender(self):
+        while self.__running:
+            msg=self.__queue.get()
+            if msg is None: #close() has been called
+                break
+
+            self.__pending[msg['id']]=(msg, time.perf_counter())
+            while self.__running and msg['id'] in self.__pending:
+                if self.__sock is None:
+                    if not self.connect(): #server not available
+                        hub.sleep(self.reconnect_interval)
+                        continue
+                    break #connect() has sent every pending message, including this one
+                try:
+                    self.__sock.sendall((json.dumps(msg)+'\n').encode())
+                    break
+                except OSError as e:
+                    print(f"[ERROR] Command channel: failed to send message {msg['id']}: {e}")
+                    self.disconnect()
+
+    '''Opens the connection to the command server, starts its receiver green thread, and sends pending messages (messages sent on a previous
+       connection and never acknowledged are re-sent)
+       @param CommandChannel object
+       @return bool True if connected'''
+    def connect(self):
+        if self.__connecting: #another green thread is connecting
+            return False
+        self.__connecting=True
+        try:
+            sock=socket.create_connection((self.address, self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) #small messages are sent immediately
+        except OSError as e:
+            print(f"[ERROR] Command channel: cannot connect to {self.address}:{self.port}: {e}")
+            return False
+        finally:
+            self.__connecting=False
+
+        self.__sock=sock
+        self.__connections+=1
+        hub.spawn(self.receiver, sock)
+
+        for msg_id in sorted(self.__pending.keys()): #messages waiting for an ACK, in order
+            msg, start=self.__pending[msg_id]
+            try:
+                sock.sendall((json.dumps(msg)+'\n').encode())
+            except OSError:
+                self.disconnect()
+                return False
+            if self.__connections>1:
+                self.__resent+=1
+        return True
+
+    '''Closes the current connection (unacknowledged messages will be re-sent on the next one)
+       @param CommandChannel object'''
+    def disconnect(self):
+        sock, self.__sock=self.__sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    '''Green thread function. Reads ACKs from a connection, matching them to pending messages by id
+       @param CommandChannel object
+       @param socket sock'''
+    def receiver(self, sock):
+        buffer=b''
+        while True:
+            try:
+                data=sock.recv(4096)
+            except OSError:
+                data=b''
+            if not data: #connection closed
+                break
+
+            buffer+=data
+            while b'\n' in buffer:
+                line, buffer=buffer.split(b'\n', 1)
+                try:
+                    reply=json.loads(line)
+                    entry=self.__pending.pop(reply['id'], None)
+                except (ValueError, KeyError, TypeError):
+                    print(f"[ERROR] Command channel: malformed reply {line}")
+                    continue
+                if entry is None: #ACK of a message re-sent after a reconnection
+                    continue
+
+                msg, start=entry
+                rtt=time.perf_counter()-start
+                self.__rtt.append(rtt)
+                if self.on_ack is not None:
+                    self.on_ack(msg['id'], msg['commands'], reply, rtt)
+
+        if sock is self.__sock: #connection lost: reconnect on next message, or now if messages are waiting for an ACK
+            self.disconnect()
+            if self.__pending and self.__running:
+                hub.spawn(self.reconnect)
+
+    '''Green thread function. Re-establishes a lost connection while messages are waiting for an ACK
+       @param CommandChannel object'''
+    def reconnect(self):
+        while self.__running and self.__pending and self.__sock is None:
+            if self.connect():
+                return
+            hub.sleep(self.reconnect_interval)
+
+    '''Returns channel statistics
+       @param CommandChannel object
+       @return <str, float> stats'''
+    def stats(self):
+        rtt=self.__rtt
+        return { 'acknowledged': len(rtt),
+                 'pending': len(self.__pending),
+                 'connections': self.__connections,
+                 'resent': self.__resent,
+                 'avg_rtt_ms': sum(rtt)/len(rtt)*1000 if rtt else 0.0,
+                 'max_rtt_ms': max(rtt)*1000 if rtt else 0.0 }
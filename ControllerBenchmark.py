@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+"""Usage:
+   python3 ControllerBenchmark.py [--events=<N>] Optional: number of events of each scenario (default: EVENTS)
+                                  [--scenarios=<s1,s2,...>] Optional: scenarios to run after boot-up (default: all of SCENARIOS)
+                                  [--copies=<N>] Optional: copies of each notification, as sent by drones (default: 5, as notify_copies in
+                                                           FootballStreaming.py)
+                                  [--level=<essential/info/detail>] Optional: verbosity of the controller's logs (default: the controller's own)
+                                  [--no_fast_path] Optional: disable the fixed-offset pre-classifier of Packet-Ins (every frame is fully parsed)
+                                  [--no_serialize] Optional: do not encode sent messages (by default they are encoded, as Ryu's send_msg does in
+                                                             the handler's thread)
+                                  [--seed=<N>] Optional: seed of the random traffic (default: 0)
+                                  [--topology=<file>] Optional: network description generated by Topology.py (Topology.py options, e.g. --fleet and
+                                                                --grid, can be given instead to describe a network on the fly)
+                                  [--logs=<dir>] Optional: directory of the controller's logs (default: a new temporary directory)
+                                  [--out=<file>] Optional: save the results as JSON
+
+   Benchmark of FleetController (DroneController.py) without Mininet-WiFi, OVS, or root. The Ryu application is instantiated in-process against
+   fake OpenFlow 1.3 datapaths, which record the messages sent to them (encoding them as Ryu's Datapath does) and reply to barriers, and against a
+   fake command channel recording mobility commands. Events are synthesized from the network description and passed to the controller's handlers:
+      - boot: SwitchFeatures and EventDP of every AP, EventHostAdd of every drone and endpoint (the last one installs proactive rules)
+      - arp: Packet-Ins of ARP requests between random drones and endpoints
+      - unicast: Packet-Ins of IPv4/UDP packets between random drones and endpoints
+      - lldp: Packet-Ins of LLDP frames (discarded by the controller)
+      - notification: Packet-Ins of DSCP-marked position notifications (drones flying from the base to their hovering position, every notification
+        received copies times)
+      - congestion: PortStatsReplies of APs' WiFi ports alternating congested and idle channels (the occupancy estimator is replayed without
+        wall-clock smoothing and hold times, so every reading counts)
+   Events are built before each scenario and only handler calls are timed (Ryu's event queue and socket I/O are not part of the measure). For every
+   scenario, handler latency percentiles, events handled per second, and OpenFlow messages emitted per event are reported"""
+
+#################################################################################################################Imports
+import os
+import re
+import sys
+import json
+import time
+import random
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+from ryu.controller import ofp_event
+from ryu.controller.dpset import EventDP
+from ryu.topology.event import EventHostAdd
+from ryu.topology.switches import Host
+from ryu.lib.packet import packet, ethernet, ether_types, ipv4, arp, udp, lldp
+
+import DroneController #controller application under benchmark
+import Notification #in-band notification format
+import Topology #parametric network description
+from OccupancyEstimator import OccupancyEstimator #per-AP channel occupation estimator
+from LogWriter import ESSENTIAL, INFO, DETAIL #verbosity levels
+
+########################################################################################################Global Variables
+EVENTS=2000 #default number of events of each scenario
+SCENARIOS=('arp', 'unicast', 'lldp', 'notification', 'congestion') #scenarios run after boot-up, in order
+LEVELS={'essential': ESSENTIAL, 'info': INFO, 'detail': DETAIL} #verbosity levels of the controller's logs
+
+class FakeDatapath: ########################################################################################Fake Datapath
+    '''Creates a FakeDatapath object, standing for an OVSAP connected with OpenFlow 1.3
+       @param int dpid
+       @param <bytes, int> ports (port name -> port number)
+       @param list outbox (list where sent messages are recorded, shared by the datapaths of a benchmark)
+       @param bool serialize (if True, sent messages are encoded, default True)'''
+    def __init__(self, dpid, ports, outbox, serialize=True):
+        self.id=dpid
+        self.ofproto=ofproto_v1_3
+        self.ofproto_parser=ofproto_v1_3_parser
+        self.ports=ports
+        self.outbox=outbox
+        self.serialize=serialize
+        self.xid=0 #last transaction ID
+        self.barriers=[] #transaction IDs of barrier requests waiting for a reply
+
+    '''Assigns the next transaction ID to a message (as Ryu's Datapath)
+       @param FakeDatapath object
+       @param MsgBase msg
+       @return int xid'''
+    def set_xid(self, msg):
+        self.xid=(self.xid+1) & self.ofproto.MAX_XID
+        msg.set_xid(self.xid)
+        return self.xid
+
+    '''Records a message sent to the datapath, encoding it as Ryu's Datapath does before queueing it on the socket
+       @param FakeDatapath object
+       @param MsgBase msg'''
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        if self.serialize:
+            msg.serialize()
+        self.outbox.append(msg)
+        if isinstance(msg, self.ofproto_parser.OFPBarrierRequest):
+            self.barriers.append(msg.xid)
+
+    '''Returns the ports of the datapath, as listed by EventDP
+       @param FakeDatapath object
+       @return OFPPort[] ports'''
+    def phy_ports(self):
+        return [self.ofproto_parser.OFPPort(port_no=port_no, hw_addr=f'00:00:00:{(self.id>>8)&0xff:02x}:{self.id&0xff:02x}:{port_no&0xff:02x}',
+                                            name=name, config=0, state=0, curr=0, advertised=0, supported=0, peer=0, curr_speed=0, max_speed=0)
+                for name, port_no in self.ports.items()]
+
+class FakeCommandChannel: ###########################################################################Fake Command Channel
+    '''Creates a FakeCommandChannel object, recording mobility commands instead of sending them to the emulator (same signature as CommandChannel)
+       @param str address
+       @param int port
+       @param function on_ack (never called, commands are not acknowledged)
+       @param float reconnect_interval'''
+    def __init__(self, address, port, on_ack=None, reconnect_interval=1.0):
+        self.on_ack=on_ack
+        self.sent=[] #messages: (id, commands)
+
+    '''Records a batch of commands
+       @param FakeCommandChannel object
+       @param dict commands
+       @return int id (message id)'''
+    def send(self, *commands):
+        self.sent.append((len(self.sent)+1, list(commands)))
+        return len(self.sent)
+
+    '''Does nothing, there is no connection to close
+       @param FakeCommandChannel object'''
+    def close(self):
+        pass
+
+    '''Returns channel statistics
+       @param FakeCommandChannel object
+       @return <str, int> stats'''
+    def stats(self):
+        return {'sent': len(self.sent), 'commands': sum(len(commands) for msg_id, commands in self.sent)}
+
+class ControllerBenchmark: ##########################################################################Controller Benchmark
+    '''Creates a ControllerBenchmark object, instantiating FleetController against fake datapaths of the APs of a network description
+       @param dict description (network description, see Topology.py)
+       @param str logs (directory of the controller's logs, default None meaning a new temporary directory)
+       @param int level (verbosity of the controller's logs, default None meaning the controller's own)
+       @param bool serialize (if True, sent messages are encoded, default True)
+       @param int seed (seed of the random traffic, default 0)
+       @param bool fast_path (if False, the controller fully parses every Packet-In, default True)'''
+    def __init__(self, description, logs=None, level=None, serialize=True, seed=0, fast_path=True):
+        self.topo=description
+        self.logs=logs or tempfile.mkdtemp(prefix='controller-benchmark-')
+        os.makedirs(self.logs, exist_ok=True)
+        self.random=random.Random(seed)
+
+        topology_path=os.path.join(self.logs, 'topology.json')
+        Topology.save(description, topology_path)
+        DroneController.log_path=os.path.join(self.logs, 'ControllerLog.txt') #log files of the controller's settings
+        DroneController.mob_log=os.path.join(self.logs, 'MobilityLog.txt')
+        DroneController.band_log=os.path.join(self.logs, 'BandwidthLog.txt')
+
+        estimator=OccupancyEstimator(tau=0.0, hold_up=0.0, hold_down=0.0, levels=len(description['tiers'])) #replayed without wall-clock
+                                                                                                           #smoothing and hold times
+        options={} if level is None else {'log_level': level}
+        self.app=DroneController.FleetController(command_channel=FakeCommandChannel, #mobility commands are recorded (no emulator listening)
+                                                 topology=topology_path, estimator=estimator, fast_path=fast_path, **options)
+
+        self.outbox=[] #messages sent by the controller and not yet counted
+        self.datapaths={ ap['dpid']: FakeDatapath(ap['dpid'], self.ap_ports(ap_name), self.outbox, serialize)
+                         for ap_name, ap in description['aps'].items() } #dictionary <DPID, FakeDatapath>
+
+        self.hosts={} #dictionary <host name, dict> (MAC, IPv4, AP, and AP port number of drones and endpoints)
+        for name, drone in description['drones'].items():
+            self.hosts[name]={'mac': drone['mac'], 'ip': drone['ip'], 'ap': drone['ap'], 'port': 1} #drones are reached on the AP's WiFi port
+        for name, endpoint in description['endpoints'].items():
+            self.hosts[name]={'mac': endpoint['mac'], 'ip': endpoint['ip'], 'ap': endpoint['ap'], 'port': 2} #endpoints on Ethernet port 2
+
+        self.results={} #dictionary <scenario name, dict> of results
+
+    '''Returns the ports of an AP, as created by FootballStreaming.py (without trouble-maker nodes)
+       @param ControllerBenchmark object
+       @param str ap_name
+       @return <bytes, int> ports (port name -> port number)'''
+    def ap_ports(self, ap_name):
+        ports={ ap_name.encode(): ofproto_v1_3.OFPP_LOCAL,
+                f'{ap_name}-wlan1'.encode(): 1,
+                f'{ap_name}-eth2'.encode(): 2 }
+        ports.update({port.encode(): Topology.port_number(port) for port in self.topo['aps'][ap_name]['backbone'].values()})
+        return ports
+
+    '''Returns the datapath of an AP
+       @param ControllerBenchmark object
+       @param str ap_name
+       @return FakeDatapath datapath'''
+    def datapath(self, ap_name):
+        return self.datapaths[self.topo['aps'][ap_name]['dpid']]
+
+    '''Runs the handlers of a list of events, timing each call. Messages sent by every handler are counted, and barriers are replied to after the
+       handler returns (replies are not timed)
+       @param ControllerBenchmark object
+       @param str name (scenario name)
+       @param (function, EventBase)[] events (handler and event)
+       @return dict result (latency percentiles [us], events per second, messages per event, messages by type)'''
+    def measure(self, name, events):
+        latencies=np.empty(len(events))
+        messages=Counter() #dictionary <message type, int>
+
+        for i, (handler, ev) in enumerate(events):
+            start=time.perf_counter()
+            handler(ev)
+            latencies[i]=time.perf_counter()-start
+
+            messages.update(type(msg).__name__ for msg in self.outbox)
+            self.outbox.clear()
+            self.reply_barriers()
+
+        total=sum(messages.values())
+        p50, p90, p99=np.percentile(latencies, [50, 90, 99])*1e6 if len(events) else (0.0, 0.0, 0.0)
+        self.results[name]={ 'events': len(events),
+                             'p50_us': float(p50),
+                             'p90_us': float(p90),
+                             'p99_us': float(p99),
+                             'max_us': float(latencies.max()*1e6) if len(events) else 0.0,
+                             'events_per_s': len(events)/latencies.sum() if latencies.sum()>0 else 0.0,
+                             'messages_per_event': total/len(events) if len(events) else 0.0,
+                             'messages': dict(messages.most_common()) }
+        return self.results[name]
+
+    '''Replies to the barrier requests received by the fake datapaths, confirming rule batches
+       @param ControllerBenchmark object'''
+    def reply_barriers(self):
+        for datapath in self.datapaths.values():
+            barriers, datapath.barriers=datapath.barriers, []
+            for xid in barriers:
+                reply=datapath.ofproto_parser.OFPBarrierReply(datapath)
+                reply.set_xid(xid)
+                self.app.barrier_reply_handler(ofp_event.EventOFPBarrierReply(reply))
+        self.outbox.clear() #messages sent when a batch is confirmed are not counted
+
+    '''Builds a Packet-In event
+       @param ControllerBenchmark object
+       @param FakeDatapath datapath
+       @param int in_port
+       @param bytes data (frame)
+       @param bool action (True if the packet matched a rule sending it to the controller, False for a table-miss)
+       @return EventOFPPacketIn event'''
+    def packet_in(self, datapath, in_port, data, action=False):
+        ofproto=datapath.ofproto
+        parser=datapath.ofproto_parser
+        msg=parser.OFPPacketIn(datapath, buffer_id=ofproto.OFP_NO_BUFFER, total_len=len(data), reason=ofproto.OFPR_ACTION if action else ofproto.OFPR_NO_MATCH,
+                               table_id=0, cookie=0, match=parser.OFPMatch(in_port=in_port), data=data)
+        msg.msg_len=ofproto.OFP_PACKET_IN_SIZE+len(data) #length of the message as received (the whole frame is attached)
+        return ofp_event.EventOFPPacketIn(msg)
+
+    '''Returns random pairs of distinct hosts (drones and endpoints)
+       @param ControllerBenchmark object
+       @param int n
+       @return (dict, dict)[] pairs (source, destination)'''
+    def host_pairs(self, n):
+        names=sorted(self.hosts)
+        return [tuple(self.hosts[name] for name in self.random.sample(names, 2)) for i in range(n)]
+
+    ##########################################################################################################Scenarios
+    '''Connects all APs, drones, and endpoints: the last host completes the network boot-up and triggers the installation of proactive rules
+       @param ControllerBenchmark object
+       @return dict result'''
+    def boot(self):
+        events=[]
+        for ap_name, ap in self.topo['aps'].items():
+            datapath=self.datapath(ap_name)
+            features=datapath.ofproto_parser.OFPSwitchFeatures(datapath, datapath_id=ap['dpid'], n_buffers=0, n_tables=254, auxiliary_id=0,
+                                                               capabilities=0)
+            events.append((self.app.ap_features_handler, ofp_event.EventOFPSwitchFeatures(features)))
+        for ap_name in self.topo['aps']:
+            ev=EventDP(self.datapath(ap_name), True)
+            ev.ports=self.datapath(ap_name).phy_ports()
+            events.append((self.app.handle_ap_enter, ev))
+        for name in list(self.topo['drones'])+list(self.topo['endpoints']):
+            events.append((self.app.event_host_add_handler, EventHostAdd(Host(self.hosts[name]['mac'], None))))
+        return self.measure('boot', events)
+
+    '''Packet-Ins of ARP requests between random hosts, received by the AP of the source
+       @param ControllerBenchmark object
+       @param int n (number of Packet-Ins)
+       @return dict result'''
+    def arp(self, n):
+        events=[]
+        for src, dst in self.host_pairs(n):
+            pkt=packet.Packet()
+            pkt.add_protocol(ethernet.ethernet(dst='ff:ff:ff:ff:ff:ff', src=src['mac'], ethertype=ether_types.ETH_TYPE_ARP))
+            pkt.add_protocol(arp.arp(opcode=arp.ARP_REQUEST, src_mac=src['mac'], src_ip=src['ip'], dst_mac='00:00:00:00:00:00', dst_ip=dst['ip']))
+            pkt.serialize()
+            events.append((self.app._packet_in_handler, self.packet_in(self.datapath(src['ap']), src['port'], bytes(pkt.data))))
+        return self.measure('arp', events)
+
+    '''Packet-Ins of IPv4/UDP packets between random hosts, received by the AP of the source
+       @param ControllerBenchmark object
+       @param int n (number of Packet-Ins)
+       @return dict result'''
+    def unicast(self, n):
+        events=[]
+        for src, dst in self.host_pairs(n):
+            pkt=packet.Packet()
+            pkt.add_protocol(ethernet.ethernet(dst=dst['mac'], src=src['mac'], ethertype=ether_types.ETH_TYPE_IP))
+            pkt.add_protocol(ipv4.ipv4(src=src['ip'], dst=dst['ip'], proto=17))
+            pkt.add_protocol(udp.udp(src_port=self.random.randint(1024, 65535), dst_port=5000))
+            pkt.add_protocol(bytes(64))
+            pkt.serialize()
+            events.append((self.app._packet_in_handler, self.packet_in(self.datapath(src['ap']), src['port'], bytes(pkt.data))))
+        return self.measure('unicast', events)
+
+    '''Packet-Ins of LLDP frames sent by APs on their ports (as with topology discovery enabled), received by random APs
+       @param ControllerBenchmark object
+       @param int n (number of Packet-Ins)
+       @return dict result'''
+    def lldp(self, n):
+        events=[]
+        for k in range(n):
+            datapath=self.datapaths[self.random.choice(list(self.datapaths))]
+            port_no=self.random.choice(list(datapath.ports.values()))
+            pkt=packet.Packet()
+            pkt.add_protocol(ethernet.ethernet(dst=lldp.LLDP_MAC_NEAREST_BRIDGE, src='00:00:00:00:00:01', ethertype=ether_types.ETH_TYPE_LLDP))
+            pkt.add_protocol(lldp.lldp(tlvs=[ lldp.ChassisID(subtype=lldp.ChassisID.SUB_LOCALLY_ASSIGNED, chassis_id=f'dpid:{datapath.id:016x}'.encode()),
+                                              lldp.PortID(subtype=lldp.PortID.SUB_PORT_COMPONENT, port_id=str(port_no).encode()),
+                                              lldp.TTL(ttl=120),
+                                              lldp.End() ]))
+            pkt.serialize()
+            events.append((self.app._packet_in_handler, self.packet_in(datapath, port_no, bytes(pkt.data))))
+        return self.measure('lldp', events)
+
+    '''Packet-Ins of position notifications: drones fly from the base to their hovering position in steps notifications and then hover, and every
+       notification is received copies times by the AP of the drone
+       @param ControllerBenchmark object
+       @param int n (number of Packet-Ins)
+       @param int copies (copies of each notification, default 5)
+       @param int steps (notifications of the flight to the hovering position, default 20)
+       @return dict result'''
+    def notification(self, n, copies=5, steps=20):
+        drones=sorted(self.topo['drones'], key=lambda name: int(re.search(r'\d+', name).group()))
+        seqs=Counter() #dictionary <drone name, int> of sequence numbers
+        events=[]
+        for k in range(-(-n//copies)):
+            name=drones[k%len(drones)]
+            drone=self.topo['drones'][name]
+            step=min(seqs[name], steps)/steps #fraction of the flight
+            position=tuple(round(c*step, 2) for c in drone['hover'])
+            payload=Notification.pack_notification(int(re.search(r'\d+', name).group()), seqs[name], position, self.random.uniform(0.0, 0.3), 54.0)
+            seqs[name]+=1
+
+            frame=Notification.build_frame(bytes.fromhex(drone['mac'].replace(':', '')), drone['ip'], self.topo['broadcast'], payload)
+            ev=self.packet_in(self.datapath(drone['ap']), 1, frame, action=True)
+            events+=[(self.app._packet_in_handler, ev)]*copies
+        return self.measure('notification', events[:n])
+
+    '''PortStatsReplies of APs' WiFi ports, alternating period congested readings and period idle readings on every AP. The occupancy estimator
+       is replayed without wall-clock smoothing and hold times (replies are handled much faster than the 1 s polling interval)
+       @param ControllerBenchmark object
+       @param int n (number of replies)
+       @param int period (readings of each phase, default 3)
+       @param float high (occupation of congested readings, default 0.9)
+       @param float low (occupation of idle readings, default 0.1)
+       @return dict result'''
+    def congestion(self, n, period=3, high=0.9, low=0.1):
+        channel_rate=self.app.channel_rates()
+
+        aps=list(self.topo['aps'])
+        counters={ap_name: [0, 0] for ap_name in aps} #dictionary <AP name, [rx bytes, AP-side time [s]]>
+        events=[]
+        for k in range(n+len(aps)): #the first reply of every AP is only a baseline
+            ap_name=aps[k%len(aps)]
+            reading=k//len(aps)
+            occupation=high if (reading//period)%2==0 else low
+            counter=counters[ap_name]
+            counter[0]+=int(occupation*channel_rate[ap_name]*(10**6)/8) if reading>0 else 0 #bytes received in 1 s
+            counter[1]+=1
+
+            datapath=self.datapath(ap_name)
+            parser=datapath.ofproto_parser
+            stat=parser.OFPPortStats(port_no=1, rx_packets=counter[0]//1500, tx_packets=0, rx_bytes=counter[0], tx_bytes=0, rx_dropped=0,
+                                     tx_dropped=0, rx_errors=0, tx_errors=0, rx_frame_err=0, rx_over_err=0, rx_crc_err=0, collisions=0,
+                                     duration_sec=counter[1], duration_nsec=0)
+            reply=parser.OFPPortStatsReply(datapath)
+            reply.body=[stat]
+            events.append((self.app.port_stats_handler, ofp_event.EventOFPPortStatsReply(reply)))
+
+        for handler, ev in events[:len(aps)]: #baselines are not timed
+            handler(ev)
+        self.outbox.clear()
+        result=self.measure('congestion', events[len(aps):])
+        result['transitions']=sum(state['transitions'] for state in self.app.occupancy_state().values())
+        return result
+
+    '''Runs the boot-up and the selected scenarios
+       @param ControllerBenchmark object
+       @param str[] scenarios (default SCENARIOS)
+       @param int n (events of each scenario, default EVENTS)
+       @param int copies (copies of each notification, default 5)
+       @return <str, dict> results'''
+    def run(self, scenarios=SCENARIOS, n=EVENTS, copies=5):
+        self.boot()
+        ready=len(self.app.ready_aps())
+        print(f"Boot-up: {len(self.topo['aps'])} APs ({ready} ready), {len(self.hosts)} hosts")
+
+        for scenario in scenarios:
+            parse_count=self.app.classification_stats()
+            if scenario=='notification':
+                self.notification(n, copies)
+            else:
+                getattr(self, scenario)(n)
+            self.results[scenario]['classified']={kind: count-parse_count[kind] for kind, count in self.app.classification_stats().items()}
+        return self.results
+
+    '''Stops the controller, flushing its logs
+       @param ControllerBenchmark object'''
+    def close(self):
+        self.app.stop()
+
+    '''Prints the results as a table
+       @param ControllerBenchmark object'''
+    def report(self):
+        print(f"\n{'scenario':<14}{'events':>8}{'p50 [us]':>11}{'p90 [us]':>11}{'p99 [us]':>11}{'max [us]':>12}{'events/s':>11}{'msgs/event':>12}")
+        for name, r in self.results.items():
+            print(f"{name:<14}{r['events']:>8}{r['p50_us']:>11.1f}{r['p90_us']:>11.1f}{r['p99_us']:>11.1f}{r['max_us']:>12.1f}"
+                  f"{r['events_per_s']:>11.0f}{r['messages_per_event']:>12.2f}")
+        print()
+        for name, r in self.results.items():
+            extra=f", {r['transitions']} estimator transitions" if 'transitions' in r else ''
+            if any(r.get('classified', {}).values()):
+                extra+=f" ({', '.join(f'{count} {kind}' for kind, count in r['classified'].items())} Packet-In classifications)"
+            print(f"{name}: {', '.join(f'{count} {msg}' for msg, count in r['messages'].items()) or 'no messages'}{extra}")
+        print(f"\nController logs: {self.logs}")
+
+####################################################################################################################Main
+if __name__ == '__main__':
+    args=sys.argv[1:]
+    topology_path=next((arg.split('=', 1)[1] for arg in args if arg.startswith('--topology=')), None)
+    description=Topology.load(topology_path) if topology_path is not None else Topology.from_args(args)
+
+    n=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--events=')), EVENTS))
+    copies=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--copies=')), 5))
+    seed=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--seed=')), 0))
+    scenarios=next((arg.split('=', 1)[1].split(',') for arg in args if arg.startswith('--scenarios=')), SCENARIOS)
+    level=next((LEVELS[arg.split('=', 1)[1]] for arg in args if arg.startswith('--level=')), None)
+    logs=next((arg.split('=', 1)[1] for arg in args if arg.startswith('--logs=')), None)
+    out=next((arg.split('=', 1)[1] for arg in args if arg.startswith('--out=')), None)
+
+    unknown=[scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    print(f"Topology: {description['fleet_size']} drones, {len(description['aps'])} APs, {len(description['tiers'])} quality tiers")
+    benchmark=ControllerBenchmark(description, logs=logs, level=level, serialize='--no_serialize' not in args, seed=seed,
+                                  fast_path='--no_fast_path' not in args)
+    benchmark.run(scenarios, n, copies)
+    benchmark.close()
+    benchmark.report()
+
+    if out is not None:
+        with open(out, 'w') as f:
+            json.dump(benchmark.results, f, indent=2)
+        print(f"Results -> {out}")
@@ -14,230 +14,380 @@ from ryu.controller.dpset import EventDP
 from ryu.topology.event import EventHostAdd
 
 from ryu.lib.packet import packet, ethernet, ether_types, ipv4, arp, udp
+from ryu.lib import hub
 
-from datetime import datetime as dt #date-related operations
 import time
-import threading
-import socket
 import json
+import numpy as np
+
+from LogWriter import LogWriter, ESSENTIAL, INFO, DETAIL #asynchronous batched logging
+import Notification #in-band notification format (binary, with text fallback)
+import PacketClassifier #fixed-offset pre-classifier of Packet-In frames
+from RuleShadow import RuleShadow #desired-state shadow of AP tables (diff-only updates)
+from OccupancyEstimator import OccupancyEstimator #smoothed channel occupation with hysteresis
+from CommandChannel import CommandChannel #persistent command channel towards the emulator
+import EnergyModel #fleet energy model (shared with FootballStreaming.py)
+import Topology #parametric network description (shared with FootballStreaming.py)
 
 ########################################################################################################Global Variables
 log_path="/home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/ControllerLog.txt" #file where controller saves logs of all performed operations
 mob_log="/home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/MobilityLog.txt" #file where controller saves logs related to mobility
 band_log="/home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/BandwidthLog.txt" #file where controller saves logs related to mobility
+topology_path=Topology.DEFAULT_PATH #network description generated by Topology.py (the original 8 drones / 4 APs network if it does not exist)
 
 class FleetController(app_manager.RyuApp): #######################################################Controller Application
     OFP_VERSIONS=[ofproto_v1_3.OFP_VERSION]
 
     '''Creates instance of FleetController application, initialize instance attributes
        @param *args positional arguments (passed by Ryu.app_manager)
+       @param command_channel (class or factory of the command channel towards the emulator, default CommandChannel)
+       @param str topology (network description file, default None meaning topology_path)
+       @param int log_level (verbosity of logs, default DETAIL)
+       @param OccupancyEstimator estimator (per-AP channel occupation estimator, default None meaning the controller's own)
+       @param bool fast_path (if True, Packet-Ins are pre-classified by fixed offsets, default True)
        @param **kwargs keywords arguments (passed by Ryu.app_manager)'''
-    def __init__(self, *args, **kwargs):
-        with open(log_path, "w") as log_file:
-            log_file.write(f"{dt.now()} -> Initialize controller\n")
-        with open(band_log, "w") as band_file:
-            band_file.write(f"{dt.now()} -> Bandwidth Measurement Started\n")
-            band_file.write(f"\n")
+    def __init__(self, *args, command_channel=CommandChannel, topology=None, log_level=DETAIL, estimator=None, fast_path=True, **kwargs):
+        self.__log=LogWriter(level=log_level) #asynchronous batched log writer (use level INFO to drop per-rule details in production runs)
+
+        self.__log.open(log_path, "w")
+        self.__log.log(log_path, INFO, "Initialize controller", stamp=True)
+        self.__log.open(band_log, "w")
+        self.__log.log(band_log, INFO, "Bandwidth Measurement Started", stamp=True)
+        self.__log.log(band_log, INFO, "")
 
         super(FleetController, self).__init__(*args, **kwargs)
 
+        self.__topology=Topology.load(topology or topology_path) #network description (drones, AP grid, endpoints, backbone)
+        topo=self.__topology
+
         self.__access_points={} #dictionary <AP name, <port_name, port_number>>
         self.__datapaths={} #dictionary <DPID, datapath>
-        self.__dpids = { 13:'ap1',
-                         14:'ap2',
-                         15:'ap3',
-                         16:'ap4'} #dictionary <DPID, AP name>
+        self.__dpids={ap['dpid']: ap_name for ap_name, ap in topo['aps'].items()} #dictionary <DPID, AP name>
 
         self.__drone_positions={} #dictionary <drone name, (x, y, z)> (associating drone names to current drone positions)
         self.__drone_energy={} #dictionary <drone name, float> (associating a drone to its residual energy level)
         self.__num_endpoints=0 #counter of connected endpoints
 
-        self.__hover_positions = { 'drone1': (26.25, 17, 35),
-                                   'drone2': (78.75, 17, 35),
-                                   'drone3': (78.75, 51, 35),
-                                   'drone4': (26.25, 51, 35),
-                                   'drone5': (26.25, 17, 35), #same as drone1
-                                   'drone6': (78.75, 17, 35), #same as drone2
-                                   'drone7': (78.75, 51, 35), #same as drone3
-                                   'drone8': (26.25, 51, 35), #same as drone4
-                                } #dictionary associating each drone of the fleet to its designated hovering position
-
-        self.__drone_macs = { '02:00:00:00:00:00':'drone1',
-                              '02:00:00:00:01:00':'drone2',
-                              '02:00:00:00:02:00':'drone3',
-                              '02:00:00:00:03:00':'drone4',
-                              '02:00:00:00:04:00':'drone5',
-                              '02:00:00:00:05:00':'drone6',
-                              '02:00:00:00:06:00':'drone7',
-                              '02:00:00:00:07:00':'drone8' } #dictionary <MAC address, drone name>
-
-        self.__endpoint_macs = {'00:00:00:00:00:09': 'endpoint1',
-                                '00:00:00:00:00:0a': 'endpoint2',
-                                '00:00:00:00:00:0b': 'endpoint3',
-                                '00:00:00:00:00:0c': 'endpoint4' } #dictionary <MAC address, endpoint name>
-
-        self.__broadcastAddress='192.168.1.255' #network's broadcast address
+        self.__hover_positions={dr: tuple(d['hover']) for dr, d in topo['drones'].items()} #dictionary associating each drone of the fleet to its
+                                                                                           #designated hovering position (shared by drones of the same AP)
+        self.__replacement={dr: d['replacement'] for dr, d in topo['drones'].items()} #dictionary <drone name, drone name> (spare drone taking over)
+        self.__stream_ports={d['ip']: d['stream_port'] for d in topo['drones'].values()} #dictionary <drone IPv4, L4 port where its video is received>
+
+        self.__drone_macs={d['mac']: dr for dr, d in topo['drones'].items()} #dictionary <MAC address, drone name>
+        self.__endpoint_macs={e['mac']: name for name, e in topo['endpoints'].items()} #dictionary <MAC address, endpoint name>
+
+        self.__broadcastAddress=topo['broadcast'] #network's broadcast address
         self.__base=(0.0, 0.0, 0.0) #coordinates of drones supply station
         self.__address='localhost' #address of energy management server socket
         self.__port=8080 #port number of energy management server socket
-
-        self.__ip_groups={ 'ap1': ['192.168.1.1', '192.168.1.5', '192.168.1.9'], #IPv4 of host devices (drones/endpoints) directly connected to AP1
-                           'ap2': ['192.168.1.2', '192.168.1.6', '192.168.1.10'], #IPv4 of all host devices (drones/endpoints) directly connected to AP2
-                           'ap3': ['192.168.1.3', '192.168.1.7', '192.168.1.11'], #IPv4 of all host devices (drones/endpoints) directly connected to AP3
-                           'ap4': ['192.168.1.4', '192.168.1.8', '192.168.1.12'] }  #IPv4 of all host devices (drones/endpoints) directly connected to AP4
-
-        self.__spurious_ip=['192.168.1.21', '192.168.1.22'] #these IPv4s refers to trouble-maker nodes (which will connect to AP1)]
-
-        self.__quality={ 'high' : [720, 1280, 60, 0.5], #num X pixels, num Y pixels, fps, compression rate (H.264)
-                         'low' : [480, 720, 30, 0.5] } #dictionary <str, float[]> defining streams quality parameters
-
-        self.__occupation = { 'ap1' : 0.0,
-                              'ap2' : 0.0,
-                              'ap3' : 0.0,
-                              'ap4' : 0.0 } #dictionary <str, float> associating each AP to its current channel bandwidth occupation (percentage)
-
-        self.__congested = { 'ap1' : 0,
-                             'ap2' : 0,
-                             'ap3' : 0,
-                             'ap4' : 0 } #dictionary <str, int> associating each AP to a indication of wireless channel status:
-                                         #0 = idle channel, 3,2 = occupied channel (do not change rules), 1 = occupied channel (change rules)
-
-        try: #starting thread
-            t=threading.Thread(target=self.energy_model,args=()) #thread handling drone energy consumption during flight and hovering
-            t.start()
-        except Exception as e:
-            print(e)
-
-        with open(log_path, "a") as log_file:
-            log_file.write(f"{dt.now()} -> Network broadcast address: {self.__broadcastAddress}\n")
-            log_file.write(f"{dt.now()} -> Controller initialized\n")
-            log_file.write(f"\n")
-
-    ####################################################################################################Thread Function
-    '''Thread function computing drones energy consumption models 
+        self.__commands=command_channel(self.__address, self.__port, on_ack=self.command_ack) #persistent connection to the server socket
+
+        self.__ip_groups={ ap_name: [topo['drones'][dr]['ip'] for dr in ap['drones']]+[topo['endpoints'][ap['endpoint']]['ip']]
+                           for ap_name, ap in topo['aps'].items() } #dictionary <AP name, IPv4[]> of host devices directly connected to each AP
+                                                                     #(drones first, the endpoint last)
+
+        self.__spurious_ip={ node['ip']: (node['ap'], node['port'])
+                             for node in topo['trouble'].values() } #these IPv4s refers to trouble-maker nodes, <IPv4, (AP name, port name)>
+
+        self.__backbone_ports={ap_name: ap['backbone'] for ap_name, ap in topo['aps'].items()} #dictionary <AP name, <neighbour AP name, port name>>
+                                                                                                #(backbone mesh)
+
+        self.__spurious_ports={port for ap_name, port in self.__spurious_ip.values()} #AP ports of trouble-maker nodes
+
+        self.__forwarding={} #dictionary <DPID, <destination IPv4, egress port number>> (precomputed forwarding index for unicast ARP/IPv4 traffic)
+
+        self.__proactive_unicast=True #if True, destination-based unicast ARP/IPv4 rules are installed at boot-up (reactive handling is only a fallback)
+        self.__unicast_cookie=0x75 #cookie marking proactive unicast flow rules (to collect their statistics)
+        self.__packet_in_count={ 'arp' : 0,
+                                 'ipv4' : 0,
+                                 'notification' : 0 } #dictionary <str, int> counting Packet-Ins handled by the controller per traffic type
+        self.__fast_path=fast_path #if True, Packet-In frames are pre-classified by fixed offsets (PacketClassifier.py), full parsing is only a fallback
+        self.__parse_count={ 'fast' : 0,
+                             'full' : 0 } #dictionary <str, int> counting Packet-Ins classified by fixed offsets or by full parsing
+        self.__unicast_stats={} #dictionary <DPID, <str, int>> associating each AP to statistics of its proactive unicast flow rules
+        self.__stats_interval=30 #time in between statistics requests to APs [s]
+
+        self.__occupancy_source='openflow' #'openflow': channel occupation is estimated by the controller from port and meter statistics of APs
+                                           #'notification': channel occupation is reported by drones in position notifications
+        self.__occupancy_interval=1.0 #time in between port/meter statistics requests used to estimate channel occupation [s]
+        self.__channel_rate={ap_name: 54.0 for ap_name in topo['aps']} #dictionary <str, float> associating each AP to the tx bitrate of its channel
+                                                                        #[Mbit/s] (802.11a nominal rate, updated by tx bitrates reported by drones)
+        self.__port_counters={} #dictionary <DPID, (int, float)> associating each AP to the last rx byte count of its WiFi port and its AP-side time
+        self.__meter_counters={} #dictionary <(DPID, meter ID), (int, int, float)> last input/dropped byte counts of streaming meters and their time
+        self.__meter_interval=10.0 #time in between meter/flow statistics requests used to learn the bitrate of quality tiers [s]
+        self.__meter_headroom=0.25 #meter bands are tuned to the learned bitrate of the AP's streams plus this fraction
+        self.__retune_threshold=0.1 #meter bands are modified only if the tuned rate differs from the installed one by more than this fraction
+        self.__rate_alpha=0.3 #EWMA weight of a new sample of the learned bitrate of a tier
+        self.__streaming_cookie=0x5d #cookie marking streaming flow rules (to collect their statistics)
+        self.__flow_counters={} #dictionary <(DPID, drone IPv4, L4 port), (int, float)> last byte count of streaming flow rules and their time
+        self.__tier_rates={} #dictionary <tier name, float> learned bitrate of a stream of each tier [kbps]
+        self.__meter_bands={} #dictionary <(AP name, tier name), int> installed meter band rates [kbps] (tuned rates, once learned)
+        self.__meter_rates={ap_name: {} for ap_name in topo['aps']} #dictionary <str, <int, (float, float)>> associating each AP to input/dropped
+                                                                     #rates of its streaming meters [kbps]
+
+        self.__dedup_window=64 #size of the per-drone sliding window of notification sequence numbers used to drop duplicated notifications
+        self.__notification_seqs={} #dictionary <drone name, [int, int]> associating each drone to the highest sequence number received and the
+                                    #bitmap of sequence numbers received within the window (bit i set = highest-i received)
+        self.__notification_count={} #dictionary <drone name, <str, int>> counting received/unique notifications of each drone
+
+        self.__use_bundles=True #if True, rule batches are installed through atomic ONF bundles on APs supporting them
+        self.__bundle_support={} #dictionary <DPID, bool> (False for APs which rejected a bundle, their batches fall back to ordered send + barrier)
+        self.__bundle_id=1 #next bundle ID
+        self.__pending_batches={} #dictionary <(DPID, barrier xid), dict> of rule batches waiting for barrier confirmation
+        self.__batch_latency=[] #install latencies of confirmed rule batches [s]
+        self.__failed_batches=0 #counter of rule batches with errors
+        self.__shadow=RuleShadow() #desired-state shadow of flow, group, and meter tables of APs (only deltas are sent)
+        self.__unconfirmed={} #dictionary <DPID, <int, list>> associating each AP to the shadow journals of FlowMods sent outside batches (by xid),
+                              #confirmed by the next barrier reply of the AP
+        self.__max_unconfirmed=1024 #maximum number of unconfirmed FlowMods per AP (the oldest ones are considered installed)
+        self.__ap_ready={} #dictionary <str, bool> associating each AP to the confirmation of its streaming rules
+
+        self.__tiers=topo['tiers'] #quality ladder, from the best to the worst tier (name, L4 port drones stream to, video format)
+        self.__reserved_groups={11, 12, 13} #group IDs of broadcast rules
+        self.__next_ids={'group': 1, 'meter': 1} #next free group and meter IDs
+        self.__tier_groups={tier['name']: self.allocate_id('group') for tier in self.__tiers} #dictionary <tier name, group ID>
+        self.__tier_meters={tier['name']: self.allocate_id('meter') for tier in self.__tiers} #dictionary <tier name, meter ID>
+        self.__port_tiers={tier['port']: tier['name'] for tier in self.__tiers} #dictionary <L4 port drones stream to, tier name>
+
+        self.__estimator=estimator or OccupancyEstimator(up=0.5, down=0.35, hold_up=1.0, hold_down=5.0, tau=2.0, window=30.0,
+                                                         levels=len(self.__tiers)) #per-AP channel occupation estimator (readings of all sources of an AP
+                                                                      #aggregated and smoothed, congestion level stepped with hysteresis: at level k
+                                                                      #the k best tiers are disabled)
+
+        self.__drone_status={} #dictionary <drone name, str> associating each drone to its deployment status (Base, Moving, Hovering, Returning)
+        self.__recharge={} #dictionary <drone name, float> of energy recharge thresholds (if residual energy is lower, go back to supply station) [J]
+        self.__hover_start={} #dictionary <drone name, float> associating each hovering drone to the (monotonic) time its residual energy was last updated
+        self.__energy_timers={} #dictionary <drone name, GreenThread> of per-drone deadline timers (firing when residual energy reaches the threshold)
+        self.__energy_running=False #True between network boot-up completion and network shutdown
+        self.init_energy_model() #energy model parameters
+
+        self.__monitor=hub.spawn(self.stats_monitor) #green thread periodically requesting statistics to APs
+        if self.__occupancy_source=='openflow':
+            self.__occupancy_monitor=hub.spawn(self.occupancy_monitor) #green thread polling port statistics of APs
+        self.__meter_monitor=hub.spawn(self.meter_monitor) #green thread polling meter and streaming flow statistics of APs
+
+        self.__log.log(log_path, INFO, "Network broadcast address: {}", self.__broadcastAddress, stamp=True)
+        self.__log.log(log_path, INFO, "Topology: {} drones, {} APs ({}x{}), {} endpoints, {} backbone", len(self.__hover_positions), len(self.__dpids),
+                       topo['grid'][0], topo['grid'][1], len(self.__endpoint_macs), topo['backbone'], stamp=True)
+        self.__log.log(log_path, INFO, "Quality ladder: {}", ', '.join(f"{tier['name']} (port {tier['port']}, group {self.__tier_groups[tier['name']]}, "
+                                                                      f"meter {self.__tier_meters[tier['name']]})" for tier in self.__tiers))
+        self.__log.log(log_path, INFO, "Subscriber policies: {}", ', '.join(f"{name} ({p['tier']}, queue {p['queue']}, priority {p['priority']}, "
+                                                                           f"min {p['min_rate']} kbps, max {p['max_rate'] or 'link'})"
+                                                                           for name, p in topo['policies'].items()))
+        self.__log.log(log_path, INFO, "Controller initialized", stamp=True)
+        self.__log.log(log_path, INFO, "")
+
+    '''Stops the application (called by Ryu's app_manager at shutdown): the command channel is closed and queued log records are flushed
+       @param FleetController object'''
+    def stop(self):
+        self.stop_energy_engine()
+        self.__commands.close()
+        super(FleetController, self).stop()
+        self.__log.close()
+
+    ######################################################################################################Energy Engine
+    '''Initializes drones energy consumption models (EnergyModel.py, shared with the emulator): energy needed by each drone to reach its hovering
+       position and to come back, and hover power
        @param FleetController object'''
-    def energy_model(self):
+    def init_energy_model(self):
+        drones=sorted(self.__hover_positions.keys())
+        hover=np.array([self.__hover_positions[dr] for dr in drones], dtype=float) #(N, 3) hovering positions
 
-        status = { 'drone1':'Base',
-                   'drone2':'Base',
-                   'drone3':'Base',
-                   'drone4':'Base',
-                   'drone5':'Base',
-                   'drone6':'Base',
-                   'drone7':'Base',
-                   'drone8':'Base' } #intialize drones deployment status
+        interval=10 #hovering interval whose energy is kept as safety margin in recharge thresholds [s]
 
-        interval=10 #time in between energy checking [s]
+        self.__hover_power=float(EnergyModel.hover_power())*EnergyModel.TIME_SCALE #energy required to hover for a second of emulation [J/s]
+        self.__hover_margin=self.__hover_power*interval #energy required to hover for an interval [J] (initial recharge threshold)
 
-        ###############################################################################################Drones parameters
-        gravity=9.8 #Gravitational acceleration [m/s^2]
-
-        m1 = 1  # Drone body mass [kg]
-        m2 = 0.3  # Drone battery mass [kg]
-        m3 = 0.1  # Drone camera mass [kg]
-        m = m1 + m2 + m3  # [kg]
+        self.__outbound_energy=dict(zip(drones, EnergyModel.outbound_energy(hover).tolist())) #energy to move to hovering position [J]
+        self.__return_energy=dict(zip(drones, EnergyModel.return_energy(hover).tolist())) #energy to come back to base [J]
 
-        lift_to_drag = 1.5  # Lift-to-drag ratio: typical range of aerodynamic efficiency for multi-rotor drones is 1-3
-        efficiency = 0.5  # Rotors efficiency: typical range is 0.2-0.7
+    '''Starts energy accounting when network boot-up is completed: every drone is at its supply station
+       @param FleetController object'''
+    def start_energy_engine(self):
+        if self.__energy_running:
+            return
+        self.__energy_running=True
 
-        p_avio = 15  # Power needed for avionics operations (on-board computations, communications, video-recording, gps, etc) [W]: 5-25 [W] of typical range
-        v = 5  # Drone's speed relative to the wind [m/s]: 5-15 [m/s] is a typical speed range for video drones
-        phi = 0.3  # windspeed-to-dronespeed ratio: typical range 0-0.6
+        for dr in self.__drone_positions.keys():
+            self.__drone_status[dr]='Base' #intialize drones deployment status
+            self.__recharge[dr]=self.__hover_margin #initialize drones energy recharge thresholds
+            self.energy_event(dr) #account for drones which have already moved
 
-        n = 4  # number of rotors
-        s = 0.073  # rotor's area [m^2]: 0.049-0.113 [m^2] is a typical range for quad-rotor drones
-        ro = 1.152062  # air density in Cosenza
-        drag_coeff = 1.3  # vertical drag coefficient: 1-1.5 is a typical range for quad-rotor drones
-        thr = ( ( (m*gravity) ** (3/2) / (2*n*ro*s) ** (1/2) ) + p_avio ) * interval * 20 #energy required to hover for an interval [J]
+    '''Stops energy accounting (network shutdown), cancelling pending deadline timers
+       @param FleetController object'''
+    def stop_energy_engine(self):
+        if not self.__energy_running:
+            return
+        self.__energy_running=False
 
-        recharge = { 'drone1':thr,
-                     'drone2':thr,
-                     'drone3':thr,
-                     'drone4':thr,
-                     'drone5':thr,
-                     'drone6':thr,
-                     'drone7':thr,
-                     'drone8':thr } #initialize drones energy recharge thresholds (if residual energy is lower than the threshold, go back to supply station)
+        for dr in list(self.__energy_timers.keys()):
+            self.cancel_energy_timer(dr)
+        self.__log.log(log_path, ESSENTIAL, "Network has shut down, energy engine stopped", stamp=True)
 
-        while not (len(self.__access_points.keys())==4 and len(self.__drone_positions.keys())==8 and self.__num_endpoints==4): #wait network boot-up
-            time.sleep(5) #check boot-up completion every 5 seconds
+    '''Updates drone's deployment status and energy after a position update. When a drone reaches its hovering position, the energy spent to
+       reach it is subtracted, the recharge threshold is raised by the energy needed to come back, and a deadline timer is scheduled at the time its
+       residual energy will reach the threshold while hovering
+       @param FleetController object
+       @param str dr (drone name)'''
+    def energy_event(self, dr):
+        if not self.__energy_running:
+            return
 
-        while sum(datapath is not None for datapath in self.__datapaths.values())>0: #after network boot-up
+        st=self.__drone_status[dr] #deployment status before the position update
+        pos=self.__drone_positions[dr]
 
-            for dr,st in status.items(): #for every drone
-                if self.__drone_positions[dr]==self.__base: #if the drone is currently at the base
-                    if st=='Deployed' or st=='Returning': #if the drone was 'Returning' or 'Deployed' at the previous interval
-                        status[dr]='Base' #update current drone state
+        if st=='Hovering' and pos!=self.__hover_positions[dr]: #drone is leaving its hovering position: settle hovering energy
+            self.settle_energy(dr)
+            self.cancel_energy_timer(dr)
 
-                elif self.__drone_positions[dr]==self.__hover_positions[dr]: #if the drone is at the hovering position
+        if pos==self.__base: #if the drone is currently at the base
+            self.__drone_status[dr]='Base' #update current drone state
 
-                    if st=='Base' or st=='Moving': #if the drone has just reached hovering position
-                        status[dr]='Hovering' #update current drone state
+        elif pos==self.__hover_positions[dr]: #if the drone is at the hovering position
+            if st!='Hovering': #if the drone has just reached hovering position
+                self.__drone_status[dr]='Hovering' #update current drone state
 
-                        #First movement: vertical lift (along Z-axis). Assumptions: constant speed, thrust == weight + drag, zero lift
-                        height=self.__hover_positions[dr][2] #[m] Along Z-Axis
-                        e_lift=( ( (m*gravity) + ( n*ro*s*drag_coeff * (v**2) )/2 ) * (v/efficiency) + p_avio ) * (height/v) #[J] energy for first movement
+                self.__drone_energy[dr]-=self.__outbound_energy[dr] #subtract from drone's residual energy the energy required to move to hovering position
+                self.__recharge[dr]+=self.__return_energy[dr] #update recharge threshold for drone, considering energy required to come back to base
 
-                        #Second movement: horizontal flight along X-axis. Assumptions: constant speed, thrust == drag, weight == lift
-                        distance1=self.__hover_positions[dr][0] #[m] Along X-axis
-                        e_fly1=( ( (m*gravity) / (efficiency*lift_to_drag) ) + (p_avio/ (v/(1-phi)) ) ) * ( distance1/(1-phi) ) #[J] energy for second movement
+                self.__hover_start[dr]=time.monotonic()
+                delay=max(0.0, (self.__drone_energy[dr]-self.__recharge[dr])/self.__hover_power) #time before reaching the recharge threshold [s]
+                self.__energy_timers[dr]=hub.spawn_after(delay, self.energy_deadline, dr) #per-drone deadline timer
 
-                        #Third movement: horizontal flight along Y-axis. Assumptions: constant speed, thrust == drag, weight == lift
-                        distance2=self.__hover_positions[dr][1] #[m] Along Y-axis
-                        e_fly2=( ( (m*gravity) / (efficiency*lift_to_drag) ) + (p_avio/ (v/(1-phi)) ) ) * ( distance2/(1-phi) ) #[J] energy for third movement
+                self.__log.log(mob_log, INFO, "Drone {} hovering: residual energy {} [J], recharge threshold {} [J], deadline in {:.1f} [s]",
+                               dr, self.__drone_energy[dr], self.__recharge[dr], delay, stamp=True)
 
-                        self.__drone_energy[dr]-=(e_lift+e_fly1+e_fly2) #subtract from drone's residual energy the energy required to move to hovering position
+        else: #if the drone is moving to hovering or coming back to base
+            if st=='Base':
+                self.__drone_status[dr]='Moving'
+            elif st=='Hovering':
+                self.__drone_status[dr]='Returning' #update current drone state
 
-                        #Fourth movement: like third
-                        #Fifth movement: like second
-                        #Last movement: vertical drop (along Z-axis). Assumptions: constant speed, thrust + drag == weight, zero lift
-                        e_drop=( ( (m*gravity) + (n*ro*s*drag_coeff*(v**2) )/2 ) * (v/efficiency) + p_avio ) * (height/v) #[J] energy for first movement
+    '''Deadline timer function: a hovering drone has reached its recharge threshold. The spare drone sharing its hovering position is moved to hover
+       and the drone is sent back to base
+       @param FleetController object
+       @param str dr (drone name)'''
+    def energy_deadline(self, dr):
+        self.__energy_timers.pop(dr, None)
+        if not self.__energy_running or self.__drone_status.get(dr)!='Hovering':
+            return
 
-                        recharge[dr]+=(e_fly2+e_fly1+e_drop) #update recharge threshold for drone, considering energy required to come back to base
+        self.settle_energy(dr)
 
-                    elif status[dr]=='Hovering': #if the drone was already hovering at the previous interval
-                        self.__drone_energy[dr]-=thr #subtract from drone's residual energy the energy required to hover for an interval
+        dr2=self.__replacement[dr] #spare drone (next drone of the same AP, None if the AP has a single drone)
+        commands=[]
+        if dr2 is not None:
+            self.__log.log(mob_log, ESSENTIAL, "   '---> Drone {} tasked to move from: {} to {}", dr2, self.__drone_positions[dr2], self.__hover_positions[dr2])
+            self.__log.log(mob_log, ESSENTIAL, "")
+            commands.append({"Drone": dr2, "Action": "Move to Hover",
+                             "Start Position": self.__drone_positions[dr2],
+                             "Final Position": self.__hover_positions[dr2]})
 
-                        if self.__drone_energy[dr]<recharge[dr]: #if drones residual energy is under the threshold
-                            with open(mob_log, "a") as log_file:
-                                numb=int(dr[5]) #return the sixth character of the drone name, corresponding to its number
+        self.__log.log(mob_log, ESSENTIAL, "Drone {}: residual energy {} [J] is below {} [J]", dr, self.__drone_energy[dr], self.__recharge[dr], stamp=True)
+        commands.append({"Drone": dr, "Action": "Go Back to Base",
+                         "Start Position": self.__drone_positions[dr],
+                         "Final Position": self.__base})
+        self.send_command(*commands) #both commands are sent in a single message
 
-                                if numb<5: #for drones 1-4
-                                    dr2=f'drone{numb+4}'
-                                    log_file.write(f"   '---> Drone {dr2} tasked to move from: {self.__drone_positions[dr2]} to {self.__hover_positions[dr2]}\n")
-                                    log_file.write(f"\n")
+        self.__drone_status[dr]='Returning' #update current drone state (it's returning to base)
+        self.__hover_start[dr]=None
 
-                                    self.send_command(json.dumps({"Drone": dr2, "Action": "Move to Hover",
-                                                                  "Start Position": self.__drone_positions[dr2], #######
-                                                                  "Final Position": self.__hover_positions[dr2]}))
+    '''Subtracts from a hovering drone's residual energy the energy spent hovering since its last update
+       @param FleetController object
+       @param str dr (drone name)'''
+    def settle_energy(self, dr):
+        start=self.__hover_start.get(dr)
+        if start is None:
+            return
+        now=time.monotonic()
+        self.__drone_energy[dr]-=self.__hover_power*(now-start)
+        self.__hover_start[dr]=now if self.__drone_status.get(dr)=='Hovering' else None
 
-                                else: #for drones 5-8
-                                    dr2=f'drone{numb-4}'
-                                    log_file.write(f"   '---> Drone {dr2} tasked to move from: {self.__drone_positions[dr2]} to {self.__hover_positions[dr2]}\n")
-                                    log_file.write(f"\n")
+    '''Cancels the deadline timer of a drone
+       @param FleetController object
+       @param str dr (drone name)'''
+    def cancel_energy_timer(self, dr):
+        timer=self.__energy_timers.pop(dr, None)
+        if timer is not None:
+            hub.kill(timer)
+        self.__hover_start[dr]=None
+
+    '''Green thread function periodically requesting statistics of proactive unicast flow rules to connected APs and logging how many Packet-Ins
+       they have spared to the controller
+       @param FleetController object'''
+    def stats_monitor(self):
+        while True:
+            hub.sleep(self.__stats_interval) #wait for a statistics interval
 
-                                    self.send_command(json.dumps({"Drone": dr2, "Action": "Move to Hover",
-                                                                  "Start Position": self.__drone_positions[dr2], #######
-                                                                  "Final Position": self.__hover_positions[dr2]}))
+            if self.__proactive_unicast and self.__unicast_stats:
+                for dpid, datapath in self.__datapaths.items():
+                    if datapath is None:
+                        continue
+                    parser=datapath.ofproto_parser
+                    ofproto=datapath.ofproto
+                    req=parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                                                   cookie=self.__unicast_cookie, cookie_mask=0xffffffffffffffff) #only proactive unicast rules
+                    datapath.send_msg(req)
+
+            self.__log.log(log_path, INFO, "Packet-Ins handled: {}", dict(self.__packet_in_count), stamp=True)
+            self.__log.log(log_path, INFO, "   '---> Classification: {}", dict(self.__parse_count))
+            self.__log.log(log_path, INFO, "   '---> Rule batches: {}", self.batch_stats())
+            self.__log.log(log_path, INFO, "   '---> Rule shadow: {}", self.__shadow.stats())
+            self.__log.log(log_path, INFO, "   '---> Command channel: {}", self.__commands.stats())
+            for drone, count in sorted(self.notification_stats().items()):
+                self.__log.log(log_path, INFO, "   '---> {}: {} notifications received, {} unique, {:.2f} copies per notification",
+                               drone, count['received'], count['unique'], count['copies'])
+            for dpid, stats in self.__unicast_stats.items():
+                self.__log.log(log_path, INFO, "   '---> {}: {} proactive unicast rules, {} hit, {} packets forwarded without Packet-In. "
+                                               "Avoided Packet-Ins: >= {}, <= {}. Reactive fallbacks: {}",
+                               self.__dpids[dpid], stats['rules'], stats['hit'], stats['packets'], stats['hit'], stats['packets'], stats['fallback'])
+            self.__log.log(log_path, INFO, "")
+
+            for ap_name, rates in self.__meter_rates.items():
+                for meter_id, (rate_in, rate_drop) in sorted(rates.items()):
+                    self.__log.log(band_log, INFO, "Meter {} on access point {}: {:.0f} [kbps] in, {:.0f} [kbps] dropped", meter_id, ap_name, rate_in,
+                                   rate_drop, stamp=True)
+            for ap_name, state in sorted(self.occupancy_state().items()):
+                self.__log.log(band_log, INFO, "Occupancy estimator of access point {}: {}", ap_name, state, stamp=True)
+            if any(self.__meter_rates.values()) or self.occupancy_state():
+                self.__log.log(band_log, INFO, "")
+
+    '''Green thread function periodically requesting statistics of the WiFi port of connected APs: replies are used to estimate channel occupation
+       on the controller side (port_stats_handler), without waiting for notifications
+       @param FleetController object'''
+    def occupancy_monitor(self):
+        while True:
+            hub.sleep(self.__occupancy_interval) #wait for an occupancy interval
 
-                                log_file.write(f"{dt.now()} -> Drone {dr}: residual energy {self.__drone_energy[dr]} [J] is below {recharge[dr]} [J]\n")
-                                self.send_command(json.dumps({"Drone": dr, "Action": "Go Back to Base",
-                                                              "Start Position": self.__drone_positions[dr],
-                                                              "Final Position": self.__base}))
+            for dpid, datapath in self.__datapaths.items():
+                if datapath is None:
+                    continue
+                ap_name=self.__dpids[dpid]
+                port_no=(self.__access_points.get(ap_name) or {}).get(f'{ap_name}-wlan1'.encode()) #WiFi port number
+                if port_no is None:
+                    continue
 
-                            status[dr]='Returning' #update current drone state (it's returning to base)
+                parser=datapath.ofproto_parser
+                datapath.send_msg(parser.OFPPortStatsRequest(datapath, 0, port_no))
 
-                else: #if the drone is moving to hovering or coming back to base
-                    if st=='Base':
-                        status[dr]='Moving'
-                    elif st=='Hovering':
-                        status[dr]='Returning' #update current drone state
+    '''Green thread function periodically requesting statistics of streaming meters (one per tier) and streaming flow rules of APs whose streaming
+       rules are installed: replies are used to learn the actual bitrate of each tier and to retune meter bands (meter_stats_handler, learn_rates)
+       @param FleetController object'''
+    def meter_monitor(self):
+        while True:
+            hub.sleep(self.__meter_interval) #wait for a meter interval
 
-            time.sleep(interval) #wait for a hovering interval
+            for dpid, datapath in self.__datapaths.items():
+                if datapath is None or not self.__ap_ready.get(self.__dpids[dpid]): #streaming meters are not installed
+                    continue
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f'{dt.now()} -> Network has shut down, thread terminates\n')
-        return
+                parser=datapath.ofproto_parser
+                ofproto=datapath.ofproto
+                for meter_id in self.__tier_meters.values():
+                    datapath.send_msg(parser.OFPMeterStatsRequest(datapath, 0, meter_id))
+                req=parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                                               cookie=self.__streaming_cookie, cookie_mask=0xffffffffffffffff) #only streaming rules
+                datapath.send_msg(req)
 
     #############################################################################################Event-handler Functions
     '''Handles OF FeaturesReply message from connecting OVSAP (from HANDSHAKE_DISPATCHER to CONFIG_DISPATCHER) and install table-miss flow rule on AP
@@ -250,8 +400,7 @@ class FleetController(app_manager.RyuApp): #####################################
 
         try:
             ap=self.__dpids[datapath.id] #name of current OVSAP
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Install table-miss on connected AP {ap} (DPID={dpid}, {datapath.id})\n")
+            self.__log.log(log_path, INFO, "Install table-miss on connected AP {} (DPID={}, {})", ap, dpid, datapath.id, stamp=True)
 
             ofproto=datapath.ofproto #adopted OpenFlow protocol version
             parser=datapath.ofproto_parser #to manage OF messages
@@ -265,9 +414,8 @@ class FleetController(app_manager.RyuApp): #####################################
             flag_actions=[parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, ofproto.OFPCML_NO_BUFFER)] #action: forward entire packet to controller's port
             self.add_flow(datapath, flag_match, flag_actions, priority=100) #send FlowMod message to OVSAP to install rule
 
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Install default rule for notification packest on connected AP {ap} (DPID={dpid}, {datapath.id})\n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, INFO, "Install default rule for notification packest on connected AP {} (DPID={}, {})", ap, dpid, datapath.id, stamp=True)
+            self.__log.log(log_path, INFO, "")
 
         except KeyError as e:
             print(f"{e}: Unrecognized DPID {dpid}, {datapath.id}")
@@ -288,11 +436,10 @@ class FleetController(app_manager.RyuApp): #####################################
         ports_list=dp.ports #retrieves a list of L2 ports available on current AP
 
         if enter: #if current AP is joining the network (flag True)
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> AP {ap} (DPID={dpid}, {datapath.id}) entered the network\n")
-                for port in ports_list:
-                    log_file.write(f"   '---> Port name: {port.name}, port_no: {port.port_no}, hw_addr: {port.hw_addr}\n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, INFO, "AP {} (DPID={}, {}) entered the network", ap, dpid, datapath.id, stamp=True)
+            for port in ports_list:
+                self.__log.log(log_path, DETAIL, "   '---> Port name: {}, port_no: {}, hw_addr: {}", port.name, port.port_no, port.hw_addr)
+            self.__log.log(log_path, INFO, "")
 
             self.__datapaths[datapath.id]=datapath #add datapath reference to dictionary when connecting
 
@@ -300,12 +447,24 @@ class FleetController(app_manager.RyuApp): #####################################
             for port in ports_list:
                 self.__access_points[ap][port.name]=port.port_no #add OVSAP port list to dictionary when connecting
 
+            self.build_forwarding(ap) #(re)compute forwarding index of the joining AP
+
         else: #if the AP is exiting the network (flag False)
-            with open(log_path, "a") as log_file:
-                log_file.write(f'{dt.now()} -> AP {ap} (DPID={dpid}, {datapath.id}) exiting the network\n')
+            self.__log.log(log_path, ESSENTIAL, "AP {} (DPID={}, {}) exiting the network", ap, dpid, datapath.id, stamp=True)
 
             self.__access_points[ap]=None #remove list of AP ports from dictionary
             self.__datapaths[datapath.id]=None #remove reference to datapath object from dictionary
+            self.__forwarding.pop(datapath.id, None) #drop forwarding index of the exiting AP
+            self.__port_counters.pop(datapath.id, None) #counters of the exiting AP restart when it reconnects
+            self.__estimator.forget(ap) #occupation of the exiting AP is estimated again from scratch
+            for counters in (self.__meter_counters, self.__flow_counters):
+                for key in [key for key in counters if key[0]==datapath.id]:
+                    del counters[key]
+            self.__shadow.forget(datapath.id) #tables of the exiting AP are lost
+            self.__unconfirmed.pop(datapath.id, None)
+
+            if not any(datapath is not None for datapath in self.__datapaths.values()): #all APs have left the network
+                self.stop_energy_engine()
 
     '''Add endpoints and stations (Host devices) to dictionaries when they join the network. If network boot-up is completed it triggers proactive 
        computation and installation of video streaming traffic rules
@@ -320,15 +479,11 @@ class FleetController(app_manager.RyuApp): #####################################
                 host_name=self.__drone_macs[host.mac] #name of current host
                 port_name=f"{host_name}-wlan0"
 
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"{dt.now()} -> Drone {host_name} entered the network\n")
-                    log_file.write(f"   '---> Port name: {port_name}, port_no: {0}, hw_addr: {host.mac}\n")
-                    log_file.write(f"\n")
-
-                capacity = 5000  # Battery capacity [mAh]
-                voltage = 15.4  # Battery voltage [V]
+                self.__log.log(log_path, INFO, "Drone {} entered the network", host_name, stamp=True)
+                self.__log.log(log_path, DETAIL, "   '---> Port name: {}, port_no: {}, hw_addr: {}", port_name, 0, host.mac)
+                self.__log.log(log_path, DETAIL, "")
 
-                e_battery=capacity*voltage*3.6 #Full-battery energy [J]
+                e_battery=float(EnergyModel.battery_energy()) #Full-battery energy [J]
 
                 self.__drone_positions[host_name]=self.__base #initialize drone's position
                 self.__drone_energy[host_name]=e_battery #initialize drone's residual energy
@@ -337,10 +492,9 @@ class FleetController(app_manager.RyuApp): #####################################
                 host_name=self.__endpoint_macs[host.mac] #name of current host
                 port_name=f"{host_name}-eth1"
 
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"{dt.now()} -> Endpoint {host_name} entered the network\n")
-                    log_file.write(f"   '---> Port name: {port_name}, port_no: {1}, hw_addr: {host.mac}\n")
-                    log_file.write(f"\n")
+                self.__log.log(log_path, INFO, "Endpoint {} entered the network", host_name, stamp=True)
+                self.__log.log(log_path, DETAIL, "   '---> Port name: {}, port_no: {}, hw_addr: {}", port_name, 1, host.mac)
+                self.__log.log(log_path, DETAIL, "")
 
                 self.__num_endpoints+=1 #count endpoints
 
@@ -350,48 +504,40 @@ class FleetController(app_manager.RyuApp): #####################################
         except KeyError as e:
             print(f"{e}: Unrecognized MAC {host.mac}")
 
-        if len(self.__access_points.keys())==4 and len(self.__drone_positions.keys())==8 and self.__num_endpoints==4: #if all expected nodes are connected
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Network boot-up completed \n")
-
-                for ap in self.__access_points.keys():
-                    log_file.write(f"{dt.now()} -> AP {ap}, ports: {self.__access_points[ap]}\n")
-                    if ap=='ap1':
-                        log_file.write(f"   '---> DPID: {FleetController.dpid_to_hex(13)}, Datapath: {self.__datapaths[13]}\n")
-                    elif ap=='ap2':
-                        log_file.write(f"   '---> DPID: {FleetController.dpid_to_hex(14)}, Datapath: {self.__datapaths[14]}\n")
-                    elif ap=='ap3':
-                        log_file.write(f"   '---> DPID: {FleetController.dpid_to_hex(15)}, Datapath: {self.__datapaths[15]}\n")
-                    else: #ap4
-                        log_file.write(f"   '---> DPID: {FleetController.dpid_to_hex(16)}, Datapath: {self.__datapaths[16]}\n")
-                log_file.write(f"\n")
-
-                for drone in self.__drone_positions.keys():
-                    log_file.write(f"{dt.now()} -> Drone {drone}, Position: {self.__drone_positions[drone]}\n")
-                    log_file.write(f"   '---> Residual Energy: {self.__drone_energy[drone]} [J]\n")
-                log_file.write(f"\n")
-
-                for mac in self.__endpoint_macs.keys():
-                    log_file.write(f"{dt.now()} -> Endpoint {self.__endpoint_macs[mac]}\n")
-                log_file.write(f"\n")
-
-            with open(mob_log, "w") as log_file:
-                log_file.write(f"{dt.now()} -> Initial Positions\n")
-
-                for d, p in self.__drone_positions.items():
-                    if p==self.__hover_positions[d]:
-                        status='Deployed'
-                    elif p==self.__base:
-                        status='Base'
-                    else:
-                        status='Moving'
-                    log_file.write(f"   '---> {d}:{p}. Status: {status}. Remaining energy: {self.__drone_energy[d]} [J]\n")
-                log_file.write(f"\n")
+        if len(self.__access_points.keys())==len(self.__dpids) and len(self.__drone_positions.keys())==len(self.__hover_positions) \
+                and self.__num_endpoints==len(self.__endpoint_macs): #if all expected nodes are connected
+            self.__log.log(log_path, ESSENTIAL, "Network boot-up completed ", stamp=True)
+
+            for dpid, ap in self.__dpids.items():
+                self.__log.log(log_path, INFO, "AP {}, ports: {}", ap, self.__access_points[ap], stamp=True)
+                self.__log.log(log_path, INFO, "   '---> DPID: {}, Datapath: {}", FleetController.dpid_to_hex(dpid), self.__datapaths[dpid])
+            self.__log.log(log_path, INFO, "")
+
+            for drone in self.__drone_positions.keys():
+                self.__log.log(log_path, INFO, "Drone {}, Position: {}", drone, self.__drone_positions[drone], stamp=True)
+                self.__log.log(log_path, INFO, "   '---> Residual Energy: {} [J]", self.__drone_energy[drone])
+            self.__log.log(log_path, INFO, "")
+
+            for mac in self.__endpoint_macs.keys():
+                self.__log.log(log_path, INFO, "Endpoint {}", self.__endpoint_macs[mac], stamp=True)
+            self.__log.log(log_path, INFO, "")
+
+            self.__log.open(mob_log, "w")
+            self.__log.log(mob_log, ESSENTIAL, "Initial Positions", stamp=True)
+            self.log_fleet_status(ESSENTIAL)
+
+            for ap_name in self.__access_points.keys():
+                self.build_forwarding(ap_name) #computes forwarding index of every AP (destination IPv4 -> egress port number)
+
+            self.start_energy_engine() #energy accounting is driven by position updates from now on
 
             self.proactive_streaming() #computes and installs proactively video streaming rules (group rules, meter rules, and flow rules)
             self.proactive_broadcast() #computes and installs proactively IPv4 broadcast rules (group rules and flow rules)
+            if self.__proactive_unicast:
+                self.proactive_unicast() #computes and installs proactively unicast ARP/IPv4 rules (flow rules)
 
-    '''Called when an OVSAP sends an OF Packet-In to the controller
+    '''Called when an OVSAP sends an OF Packet-In to the controller. The frame is pre-classified by fixed offsets (PacketClassifier.py) and
+       dispatched to the handler of its traffic class; unusual frames are fully parsed
        @param FleetController object
        @param EventOFPPacketIn ev'''
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
@@ -402,50 +548,165 @@ class FleetController(app_manager.RyuApp): #####################################
         msg=ev.msg #get Packet-In message associated with event
         datapath=msg.datapath #OVSAP associated with event (datapath reference)
         inport=msg.match['in_port']
-
-        pkt=packet.Packet(msg.data) #message encapsulated in packet-In
         assert datapath in self.__datapaths.values(), f"PacketIn received from unknown AP {datapath.id}"
 
-        eth=pkt.get_protocols(ethernet.ethernet)[0] #get Ethernet-like frame from encapsulated packet
-        src_mac=eth.src #get source MAC address from frame
+        frame=PacketClassifier.classify(msg.data) if self.__fast_path else None #traffic class and fields, by fixed offsets
+        if frame is None: #unusual frame (or fast path disabled)
+            frame=self.classify_packet(msg.data)
+            self.__parse_count['full']+=1
+        else:
+            self.__parse_count['fast']+=1
+        traffic, fields=frame
 
-        if eth.ethertype==ether_types.ETH_TYPE_LLDP: #if L3 protocol is LLDP
+        if traffic=='lldp':
             return #ignore LLDP packets
-        if eth.ethertype!=ether_types.ETH_TYPE_ARP and eth.ethertype!=ether_types.ETH_TYPE_IP:
-            self.logger.debug(f"Unauthorized type of traffic {eth.ethertype}")
+        elif traffic=='arp':
+            src_mac, src_ip, dst_ip=fields
+            self.__packet_in_count['arp']+=1
+            self.reactive_arp(msg, datapath, inport, src_mac, src_ip, dst_ip)
+        elif traffic=='notification':
+            src_mac, offset=fields
+            self.__packet_in_count['notification']+=1
+            self.handle_notification(msg.data, src_mac, offset)
+        elif traffic=='ipv4':
+            src_ip, dst_ip=fields
+            if dst_ip==self.__broadcastAddress:
+                return
+            self.__packet_in_count['ipv4']+=1
+            self.reactive_ipv4(msg, datapath, inport, src_ip, dst_ip)
+        else:
+            self.logger.debug(f"Unauthorized type of traffic {fields[0]}")
             return #we only provide flow rules for ARP traffic and IPv4 traffic
 
-        elif eth.ethertype==ether_types.ETH_TYPE_ARP: #if L3 protocol is ARP
-            pkt3=pkt.get_protocol(arp.arp) #get ARP packet (None if not ARP)
-            src_ip=pkt3.src_ip #get source IPv4 address from packet
-            dst_ip=pkt3.dst_ip #get destination IPv4 address from packet
-            self.reactive_arp(msg, datapath, inport, src_mac, src_ip, dst_ip)
+    '''Called when an OVSAP replies to a BarrierRequest closing a rule batch, it reports the batch install latency
+       @param FleetController object
+       @param EventOFPBarrierReply ev'''
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        datapath=ev.msg.datapath
+        unconfirmed=self.__unconfirmed.get(datapath.id, {})
+        for xid in [xid for xid in unconfirmed if xid<ev.msg.xid]: #FlowMods sent before the barrier have been processed without errors
+            self.__shadow.confirm(datapath.id, unconfirmed.pop(xid))
+
+        batch=self.__pending_batches.pop((datapath.id, ev.msg.xid), None)
+        if batch is None: #barrier of a batch which has been re-sent
+            return
 
-        else: #eth.ethertype!=ether_types.ETH_TYPE_IP (L3 protocol is IPv4)
-            pkt3=pkt.get_protocol(ipv4.ipv4) #get IPv4 packet (None if not IPv4)
-            src_ip=pkt3.src #get source IPv4 address from packet
-            dst_ip=pkt3.dst #get destination IPv4 address from packet
+        ap_name=self.__dpids.get(datapath.id)
+        latency=time.perf_counter()-batch['start']
+        self.__shadow.confirm(datapath.id, batch['journal']) #changes of rejected messages have already been rolled back
+        if batch['failed']:
+            self.__failed_batches+=1
+            self.__log.log(log_path, ESSENTIAL, "Batch '{}' on {} completed with errors after {:.1f} [ms]", batch['label'], ap_name, latency*1000, stamp=True)
+            return
 
-            dscp_value=pkt3.tos>>2 #Extract DSCP value from the TOS field of the encapsulated IPv4 packet (upper 6 bits)
-            self.logger.debug(f"IPv4 packet DSCP value: {dscp_value:06b} (decimal: {dscp_value})")
-            if dscp_value==0b000011: #Check if the DSCP value matches 000011
-                pkt4=pkt.get_protocol(udp.udp) #extract L4 datagram from message
+        self.__batch_latency.append(latency)
+        self.__log.log(log_path, INFO, "Batch '{}' confirmed by {}: {} messages installed in {:.1f} [ms]", batch['label'], ap_name, len(batch['msgs']),
+                       latency*1000, stamp=True)
+        if batch['label']=='streaming':
+            self.__ap_ready[ap_name]=True
+            self.__log.log(log_path, ESSENTIAL, "AP {} ready to forward streams", ap_name, stamp=True)
 
-                payload=msg.data #Raw packet bytes
-                udp_payload=payload[-(pkt4.total_length-8):] #UDP payload length = total - header (8 bytes)
+    '''Called when an OVSAP reports an error. If the AP does not support bundles, they are disabled for the AP and the bundled messages are re-sent
+       in order; otherwise the batch has failed and the shadow changes of the rejected messages (the whole bundle, if a bundled message is rejected)
+       are rolled back
+       @param FleetController object
+       @param EventOFPErrorMsg ev'''
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, MAIN_DISPATCHER)
+    def error_msg_handler(self, ev):
+        msg=ev.msg
+        datapath=msg.datapath
+        ap_name=self.__dpids.get(datapath.id)
+
+        for key, batch in list(self.__pending_batches.items()):
+            if key[0]!=datapath.id or msg.xid not in batch['xids']:
+                continue
 
-                decoded_paylaod=udp_payload.decode(errors="ignore")
+            ofproto=datapath.ofproto
+            on_bundle=batch['bundle'] is not None and msg.xid not in batch['direct'] #error on the bundle (which is not applied)
+            unsupported=(msg.type==ofproto.OFPET_BAD_REQUEST and msg.code in (ofproto.OFPBRC_BAD_EXPERIMENTER, ofproto.OFPBRC_BAD_TYPE)
+                         or msg.xid==batch['open']) #errors meaning that the AP does not support bundles
+            if on_bundle and unsupported:
+                self.__log.log(log_path, ESSENTIAL, "Bundle {} rejected by {} (type={}, code={}). Falling back to ordered send + barrier",
+                               batch['bundle'], ap_name, msg.type, msg.code, stamp=True)
+                self.__bundle_support[datapath.id]=False
+                del self.__pending_batches[key]
+                self.install_batch(datapath, batch['bundled'], batch['label'], resend=True, journal=batch['journal']) #messages sent outside
+                                                                                                                         #the bundle have been applied
+            else:
+                xids={bundled.xid for bundled in batch['bundled']} if on_bundle else {msg.xid} #an atomic bundle is rejected as a whole
+                rolled_back=self.__shadow.rollback(datapath.id, batch['journal'], xids)
+                self.__log.log(log_path, ESSENTIAL, "Error in batch '{}' on {}: type={}, code={} ({} shadow changes rolled back)", batch['label'],
+                               ap_name, msg.type, msg.code, rolled_back, stamp=True)
+                batch['failed']=True
+            return
 
-                position=decoded_paylaod.split('/')[0].split(':')[1]
-                occupation=decoded_paylaod.split('/')[1].split(':')[1]
+        journal=self.__unconfirmed.get(datapath.id, {}).pop(msg.xid, None) #FlowMod sent outside batches
+        rolled_back=self.__shadow.rollback(datapath.id, journal) if journal else 0
+        self.__log.log(log_path, INFO, "Error from {}: type={}, code={}, xid={} ({} shadow changes rolled back)", ap_name, msg.type, msg.code, msg.xid,
+                       rolled_back, stamp=True)
 
-                self.update_pos(src_mac, position) #update's drone's position
-                self.update_rate(datapath.id, occupation)
+    '''Called when an OVSAP replies to a FlowStatsRequest on proactive unicast flow rules, it updates counters of forwarded packets; or on streaming
+       flow rules, it learns the bitrate of quality tiers
+       @param FleetController object
+       @param EventOFPFlowStatsReply ev'''
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_handler(self, ev):
+        dpid=ev.msg.datapath.id
+        streams=[stat for stat in ev.msg.body if stat.cookie==self.__streaming_cookie] #statistics of streaming rules
+        if streams:
+            self.learn_rates(dpid, streams)
+
+        if dpid not in self.__unicast_stats:
+            return
 
-            else:
-                if dst_ip==self.__broadcastAddress:
-                    return
-                self.reactive_ipv4(msg, datapath, inport, src_ip, dst_ip)
+        flows=[stat for stat in ev.msg.body if stat.cookie==self.__unicast_cookie] #statistics of proactive unicast rules
+        self.__unicast_stats[dpid]['hit']=sum(1 for stat in flows if stat.packet_count>0) #each hit rule spared at least one Packet-In
+        self.__unicast_stats[dpid]['packets']=sum(stat.packet_count for stat in flows) #at most one Packet-In per forwarded packet was spared
+
+    '''Called when an OVSAP replies to a PortStatsRequest on its WiFi port: channel occupation is estimated from the rx byte count (as drones do from
+       the AP's interface counters) and the tx bitrate of the channel, and fed to the streaming adaptation
+       @param FleetController object
+       @param EventOFPPortStatsReply ev'''
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def port_stats_handler(self, ev):
+        dpid=ev.msg.datapath.id
+        ap_name=self.__dpids.get(dpid)
+        if ap_name is None:
+            return
+
+        for stat in ev.msg.body:
+            now=stat.duration_sec+stat.duration_nsec*1e-9 #time since the port was added to the AP [s]
+            last=self.__port_counters.get(dpid)
+            self.__port_counters[dpid]=(stat.rx_bytes, now)
+            if last is None or now<=last[1] or stat.rx_bytes<last[0]: #first sample, or port re-created
+                continue
+
+            occupation=( ( (stat.rx_bytes-last[0])*8 ) / ( (now-last[1])*(10**6) ) ) / self.__channel_rate[ap_name]
+            if self.__ap_ready.get(ap_name): #streaming groups are installed
+                self.update_rate(dpid, min(occupation, 1.0), 'openflow') #readings above the channel rate mean a saturated channel
+
+    '''Called when an OVSAP replies to a MeterStatsRequest on streaming meters, it updates input and dropped rates of the meters
+       @param FleetController object
+       @param EventOFPMeterStatsReply ev'''
+    @set_ev_cls(ofp_event.EventOFPMeterStatsReply, MAIN_DISPATCHER)
+    def meter_stats_handler(self, ev):
+        dpid=ev.msg.datapath.id
+        ap_name=self.__dpids.get(dpid)
+        if ap_name is None:
+            return
+
+        for stat in ev.msg.body:
+            now=stat.duration_sec+stat.duration_nsec*1e-9 #time since the meter was added to the AP [s]
+            dropped=sum(band.byte_band_count for band in stat.band_stats) #bytes dropped by the meter bands
+            key=(dpid, stat.meter_id)
+            last=self.__meter_counters.get(key)
+            self.__meter_counters[key]=(stat.byte_in_count, dropped, now)
+            if last is None or now<=last[2] or stat.byte_in_count<last[0]: #first sample, or meter re-created
+                continue
+
+            t=now-last[2]
+            self.__meter_rates[ap_name][stat.meter_id]=( (stat.byte_in_count-last[0])*8/(t*1000), (dropped-last[1])*8/(t*1000) ) #[kbps]
 
     ###################################################################################################Routing Functions
     '''Defines flow rules and group rules to route video streaming from drones to endpoints
@@ -461,7 +722,7 @@ class FleetController(app_manager.RyuApp): #####################################
                 if 'wlan' in port_name:
                     wireless.append(port_name)
                 elif 'eth' in port_name:
-                    if not 'eth6' in port_name: #exclude extra ethernet interface
+                    if port_name not in self.__spurious_ports: #exclude extra ethernet interface (trouble-maker host)
                         wired.append(port_name)
 
             for k,v in self.__dpids.items():
@@ -476,10 +737,9 @@ class FleetController(app_manager.RyuApp): #####################################
             dpid=ap_data['dpid']
             ap=self.__datapaths.get(dpid)
 
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Installing streaming rules for {ap_name}, {ap}\n")
-                log_file.write(f"   '---> Configurations: {ap_data}\n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, INFO, "Installing streaming rules for {}, {}", ap_name, ap, stamp=True)
+            self.__log.log(log_path, DETAIL, "   '---> Configurations: {}", ap_data)
+            self.__log.log(log_path, DETAIL, "")
 
             if not ap:
                 print(f"[ERROR] Datapath not found for {ap_name} (DPID {FleetController.dpid_to_hex(dpid)}, {dpid})")
@@ -487,149 +747,69 @@ class FleetController(app_manager.RyuApp): #####################################
 
             ofproto=ap.ofproto
             parser=ap.ofproto_parser
+            batch=[] #OpenFlow messages installing streaming rules on current AP
 
-            #####################################################################Rules from wlan1 to eth2/eth3/eth4/eth5
+            ###################################################################Rules from wlan1 to eth2/backbone ports
             for wlan_iface in ap_data['wireless']: #for each wireless interface
                 try:
                     in_port=self.__access_points[ap_name][wlan_iface.encode()] #ingress port number: WiFi Interface
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> WiFi Interface: {wlan_iface} -> in_port_ {in_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> WiFi Interface: {} -> in_port_ {}", wlan_iface, in_port)
 
                 except KeyError:
                     print(f"[ERROR] WiFi interface '{wlan_iface}' missing on {ap_name}")
                     continue
 
                 ######################################################################################Create Group Rules
-                buckets_L=[] #create bucket of action lists (low-quality)
-                buckets_H=[] #create bucket of action lists (high-quality)
-                for eth_iface in ap_data['wired']: #for each Ethernet interface
-                    try:
-                        out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
-                        action=parser.OFPActionOutput(out_port)
-
-                        if eth_iface[7]=='2': #eth2
-                            if ap_name=='ap1' or ap_name=='ap3':
-                                buckets_H.append(parser.OFPBucket(actions=[action]))
-                            else: #ap2 and ap4
-                                buckets_L.append(parser.OFPBucket(actions=[action]))
-
-                        elif eth_iface[7]=='3': #eth3
-                            if ap_name=='ap1':
-                                buckets_L.append(parser.OFPBucket(actions=[action]))
-                            else: #ap2, ap3, and ap4
-                                buckets_H.append(parser.OFPBucket(actions=[action]))
-
-                        elif eth_iface[7]=='4': #eth4
-                            if ap_name=='ap3' or ap_name=='ap4':
-                                buckets_L.append(parser.OFPBucket(actions=[action]))
-                            else: #ap1 and ap2
-                                buckets_H.append(parser.OFPBucket(actions=[action]))
-
-                        else: #eth5
-                            if ap_name=='ap4':
-                                buckets_H.append(parser.OFPBucket(actions=[action]))
-                            else: #ap1, ap2, and ap3
-                                buckets_L.append(parser.OFPBucket(actions=[action]))
-
-                        with open(log_path, "a") as log_file:
-                            log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port}\n")
-
-                    except KeyError:
-                        print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
-
-                group_id_H=1 #unique group ID
-                group_id_L=2 #unique group id
-
-                reqH=parser.OFPGroupMod( datapath=ap,
-                                        command=ofproto.OFPGC_ADD,
-                                        type_=ofproto.OFPGT_ALL,
-                                        group_id=group_id_H,
-                                        buckets=buckets_H) #group mod message
-                ap.send_msg(reqH) #controller issues group mode message to current AP
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Group rule {group_id_H} created on {ap_name}, {ap}\n")
-                    log_file.write(f"   '---> Buckets: {buckets_H}\n")
-                    log_file.write(f"\n")
-
-                reqL=parser.OFPGroupMod( datapath=ap,
-                                         command=ofproto.OFPGC_ADD,
-                                         type_=ofproto.OFPGT_ALL,
-                                         group_id=group_id_L,
-                                         buckets=buckets_L) #group mod message
-                ap.send_msg(reqL) #controller issues group mode message to current AP
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Group rule {group_id_L} created on {ap_name}, {ap}\n")
-                    log_file.write(f"   '---> Buckets: {buckets_L}\n")
-                    log_file.write(f"\n")
+                level=self.__estimator.level(ap_name) #the best tiers are disabled on a congested AP
+                for tier, buckets in zip(self.__tiers, self.tier_buckets(ap_name, parser, level)): #buckets towards endpoints subscribed to each tier
+                    group_id=self.__tier_groups[tier['name']]
+                    req=parser.OFPGroupMod( datapath=ap,
+                                            command=ofproto.OFPGC_ADD,
+                                            type_=ofproto.OFPGT_ALL,
+                                            group_id=group_id,
+                                            buckets=buckets) #group mod message
+                    batch.append(req) #group mod message for current AP
+                    self.__log.log(log_path, DETAIL, "   '---> Group rule {} ({} quality) created on {}, {}", group_id, tier['name'], ap_name, ap)
+                    self.__log.log(log_path, DETAIL, "   '---> Buckets: {}", buckets)
+                    self.__log.log(log_path, DETAIL, "")
 
                 ######################################################################################Create Meter Rules
-                supported_rateH=1 #[bps]
-                for val in self.__quality['high']:
-                    supported_rateH*=val
-                supported_rateH=int(supported_rateH/1000) #[kbps]
-
-                bandsH=[parser.OFPMeterBandDrop(rate=supported_rateH, type_=1, len_=16)]
-                meter_modH=parser.OFPMeterMod(datapath=ap, command=ofproto.OFPMC_ADD,
-                                              flags=ofproto.OFPMF_KBPS,
-                                              meter_id=1, #unique meter ID
-                                              bands=bandsH) #meter_mod message
-
-                ap.send_msg(meter_modH)
-
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Meter rule {1} created on {ap_name}, {ap}\n")
-                    log_file.write(f"   '---> Bands: {bandsH}\n")
+                for tier in self.__tiers:
+                    meter_id=self.__tier_meters[tier['name']]
+                    rate=self.__meter_bands.get((ap_name, tier['name']), Topology.tier_rate(tier)) #tuned rate, or the rate of the tier's video format
+                    bands=[parser.OFPMeterBandDrop(rate=rate, type_=1, len_=16)] #[kbps]
+                    meter_mod=parser.OFPMeterMod(datapath=ap, command=ofproto.OFPMC_ADD,
+                                                 flags=ofproto.OFPMF_KBPS,
+                                                 meter_id=meter_id, #unique meter ID
+                                                 bands=bands) #meter_mod message
 
-                supported_rateL=1 #[bps]
-                for val in self.__quality['low']:
-                    supported_rateL*=val
-                supported_rateL=int(supported_rateL/1000) #[kbps]
+                    batch.append(meter_mod)
 
-                bandsL=[parser.OFPMeterBandDrop(rate=supported_rateL, type_=1, len_=16)]
-                meter_modL=parser.OFPMeterMod(datapath=ap, command=ofproto.OFPMC_ADD,
-                                              flags=ofproto.OFPMF_KBPS,
-                                              meter_id=2, #unique meter ID
-                                              bands=bandsL) #meter_mod message
-
-                ap.send_msg(meter_modL)
-
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Meter rule {2} created on {ap_name}, {ap}\n")
-                    log_file.write(f"   '---> Bands: {bandsL}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Meter rule {} ({} quality) created on {}, {}", meter_id, tier['name'], ap_name, ap)
+                    self.__log.log(log_path, DETAIL, "   '---> Bands: {}", bands)
 
                 #######################################################################################Create Flow Rules
-                for ip in self.__ip_groups[ap_name][:2]: #for each drone IPv4 address connected to current AP
-                    match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_src=ip, ipv4_dst=self.__broadcastAddress,
-                                          ip_dscp=0b000000, ip_proto=17, udp_dst=8888) #match for high quality streams
-                    action_udp=parser.OFPActionSetField(udp_dst=int(f"123{ip[10]}"))
-                    actions=[action_udp, parser.OFPActionGroup(group_id_H)] #actions: change destination L4 Port and apply group
-                    self.add_flow(datapath=ap, match=match, actions=actions, priority=16, meter_id=1) #install streaming flow rule on current AP (high quality)
-
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                        log_file.write(f"   '---> Actions: {actions} \n")
-                        log_file.write(f"\n")
-
-                    match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_src=ip, ipv4_dst=self.__broadcastAddress,
-                                          ip_dscp=0b000000, ip_proto=17, udp_dst=7777) #match for low quality streams
-                    action_udp=parser.OFPActionSetField(udp_dst=int(f"123{ip[10]}"))
-                    actions=[action_udp, parser.OFPActionGroup(group_id_L)] #actions: change destination L4 Port and apply group
-                    self.add_flow(datapath=ap, match=match, actions=actions, priority=16, meter_id=2) #install streaming flow rule on current AP (low quality)
-
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                        log_file.write(f"   '---> Actions: {actions} \n")
-                        log_file.write(f"\n")
-
-            ######################################################################Flow Rules from eth3/eht4/eth5 to eth2
-            for i in range(3,6):
-                in_eth=f'{ap_name}-eth{i}' #input port name
-                out_eth=f'{ap_name}-eth2' #output port name (towards endpoint)
+                for ip in self.__ip_groups[ap_name][:-1]: #for each drone IPv4 address connected to current AP
+                    for tier in self.__tiers: #for each stream of the drone
+                        match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_src=ip, ipv4_dst=self.__broadcastAddress,
+                                              ip_dscp=0b000000, ip_proto=17, udp_dst=tier['port']) #match for streams of the tier
+                        action_udp=parser.OFPActionSetField(udp_dst=self.__stream_ports[ip])
+                        actions=[action_udp, parser.OFPActionGroup(self.__tier_groups[tier['name']])] #actions: change destination L4 Port and apply group
+                        self.add_flow(datapath=ap, match=match, actions=actions, priority=16, meter_id=self.__tier_meters[tier['name']],
+                                      cookie=self.__streaming_cookie, batch=batch) #install streaming flow rule on current AP
+
+                        self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+                        self.__log.log(log_path, DETAIL, "   '---> Actions: {} ", actions)
+                        self.__log.log(log_path, DETAIL, "")
+
+            ###################################################################Flow Rules from backbone ports to eth2
+            out_eth=f'{ap_name}-eth2' #output port name (towards endpoint)
+            queue=self.__topology['policies'][Topology.port_endpoints(self.__topology, ap_name)[out_eth]]['queue'] #egress queue of the endpoint
+            for in_eth in self.__backbone_ports[ap_name].values(): #input port name
 
                 try:
                     in_port=self.__access_points[ap_name][in_eth.encode()] #ingress port number: Ethernet Interface towards other AP
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Ethernet Interface: {in_eth} -> in_port_ {in_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Ethernet Interface: {} -> in_port_ {}", in_eth, in_port)
 
                 except KeyError:
                     print(f"[ERROR] Ethernet interface '{in_eth}' missing on {ap_name}")
@@ -637,20 +817,20 @@ class FleetController(app_manager.RyuApp): #####################################
 
                 try:
                     out_port=self.__access_points[ap_name][out_eth.encode()] #output port number: Ethernet Interface towards endpoint
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Action: {out_eth} -> out_port {out_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", out_eth, out_port)
 
                 except KeyError:
                     print(f"[ERROR] Ethernet Interface '{out_eth}' missing on {ap_name}")
 
                 match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_dst=self.__broadcastAddress, ip_dscp=0b000000, ip_proto=17)
-                actions=[parser.OFPActionOutput(out_port)]
-                self.add_flow(datapath=ap, match=match, actions=actions, priority=16) #install streaming flow rule on current AP
+                actions=[parser.OFPActionSetQueue(queue), parser.OFPActionOutput(out_port)] #streams from other APs share the endpoint's queue
+                self.add_flow(datapath=ap, match=match, actions=actions, priority=16, batch=batch) #install streaming flow rule on current AP
+
+                self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+                self.__log.log(log_path, DETAIL, "   '---> Actions: {} ", actions)
+                self.__log.log(log_path, DETAIL, "")
 
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                    log_file.write(f"   '---> Actions: {actions} \n")
-                    log_file.write(f"\n")
+            self.install_batch(ap, batch, 'streaming') #AP is ready to forward streams once the batch is confirmed
 
     '''Defines flow rules and group rules to route generic IPv4 broadcast traffic
        @param FleetController object'''
@@ -665,7 +845,7 @@ class FleetController(app_manager.RyuApp): #####################################
                 if 'wlan' in port_name:
                     wireless.append(port_name)
                 elif 'eth' in port_name:
-                    if not 'eth6' in port_name: #exclude extra ethernet interface
+                    if port_name not in self.__spurious_ports: #exclude extra ethernet interface (trouble-maker host)
                         wired.append(port_name)
 
             for k, v in self.__dpids.items():
@@ -680,10 +860,9 @@ class FleetController(app_manager.RyuApp): #####################################
             dpid=ap_data['dpid']
             ap=self.__datapaths.get(dpid)
 
-            with open(log_path, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Installing broadcast rules for {ap_name}, {ap}\n")
-                log_file.write(f"   '---> Configurations: {ap_data}\n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, INFO, "Installing broadcast rules for {}, {}", ap_name, ap, stamp=True)
+            self.__log.log(log_path, DETAIL, "   '---> Configurations: {}", ap_data)
+            self.__log.log(log_path, DETAIL, "")
 
             if not ap:
                 print(f"[ERROR] Datapath not found for {ap_name} (DPID {FleetController.dpid_to_hex(dpid)}, {dpid})")
@@ -691,13 +870,13 @@ class FleetController(app_manager.RyuApp): #####################################
 
             ofproto=ap.ofproto
             parser=ap.ofproto_parser
+            batch=[] #OpenFlow messages installing broadcast rules on current AP
 
-            #####################################################################Rules from wlan1 to eth2/eth3/eth4/eth5
+            ###################################################################Rules from wlan1 to eth2/backbone ports
             for wlan_iface in ap_data['wireless']: #for each wireless interface
                 try:
                     in_port=self.__access_points[ap_name][wlan_iface.encode()] #ingress port number: WiFi Interface
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> WiFi Interface: {wlan_iface} -> in_port_ {in_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> WiFi Interface: {} -> in_port_ {}", wlan_iface, in_port)
                 except KeyError:
                     print(f"[ERROR] WiFi interface '{wlan_iface}' missing on {ap_name}")
                     continue
@@ -709,8 +888,7 @@ class FleetController(app_manager.RyuApp): #####################################
                         out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
                         action=parser.OFPActionOutput(out_port)
                         buckets.append(parser.OFPBucket(actions=[action]))
-                        with open(log_path, "a") as log_file:
-                            log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port}\n")
+                        self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", eth_iface, out_port)
 
                     except KeyError:
                         print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
@@ -721,26 +899,23 @@ class FleetController(app_manager.RyuApp): #####################################
                                        type_=ofproto.OFPGT_ALL,
                                        group_id=group_id,
                                        buckets=buckets) #group mod message
-                ap.send_msg(req) #controller issues group mode message to current AP
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Group rule {group_id}:{buckets} created on {ap_name}\n")
+                batch.append(req) #group mod message for current AP
+                self.__log.log(log_path, DETAIL, "   '---> Group rule {}:{} created on {}", group_id, buckets, ap_name)
 
                 ########################################################################################Create Flow Rule
                 match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_dst=self.__broadcastAddress, ip_dscp=0b000000)
                 actions=[parser.OFPActionGroup(group_id)] #actions: apply group
-                self.add_flow(datapath=ap, match=match, actions=actions, priority=12) #install broadcast flow rule on current AP
+                self.add_flow(datapath=ap, match=match, actions=actions, priority=12, batch=batch) #install broadcast flow rule on current AP
 
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                    log_file.write(f"   '---> Actions {actions} \n")
-                    log_file.write(f"\n")
+                self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+                self.__log.log(log_path, DETAIL, "   '---> Actions {} ", actions)
+                self.__log.log(log_path, DETAIL, "")
 
-            #####################################################################Rules from eth2 to wlan1/eth3/eth4/eth5
+            ###################################################################Rules from eth2 to wlan1/backbone ports
             in_eth=f'{ap_name}-eth2' #input port name
             try:
                 in_port=self.__access_points[ap_name][in_eth.encode()] #ingress port number: Ethernet Interface towards other AP
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Ethernet Interface: {in_eth} -> in_port_ {in_port}\n")
+                self.__log.log(log_path, DETAIL, "   '---> Ethernet Interface: {} -> in_port_ {}", in_eth, in_port)
             except KeyError:
                 print(f"[ERROR] Ethernet interface '{in_eth}' missing on {ap_name}")
                 continue
@@ -752,8 +927,7 @@ class FleetController(app_manager.RyuApp): #####################################
                     out_port=self.__access_points[ap_name][wlan_iface.encode()] #output port number: WiFi Interface
                     action=parser.OFPActionOutput(out_port)
                     buckets.append(parser.OFPBucket(actions=[action]))
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Action: {wlan_iface} -> out_port {out_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", wlan_iface, out_port)
 
                 except KeyError:
                     print(f"[ERROR] Ethernet Interface '{wlan_iface}' missing on {ap_name}")
@@ -765,8 +939,7 @@ class FleetController(app_manager.RyuApp): #####################################
                     out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
                     action=parser.OFPActionOutput(out_port)
                     buckets.append(parser.OFPBucket(actions=[action]))
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", eth_iface, out_port)
 
                 except KeyError:
                     print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
@@ -777,21 +950,19 @@ class FleetController(app_manager.RyuApp): #####################################
                                    type_=ofproto.OFPGT_ALL,
                                    group_id=group_id,
                                    buckets=buckets) #group mod message
-            ap.send_msg(req) #controller issues group mode message to current AP
-            with open(log_path, "a") as log_file:
-                log_file.write(f"   '---> Group rule {group_id}:{buckets} created on {ap_name}\n")
+            batch.append(req) #group mod message for current AP
+            self.__log.log(log_path, DETAIL, "   '---> Group rule {}:{} created on {}", group_id, buckets, ap_name)
 
             ############################################################################################Create Flow Rule
             match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_dst=self.__broadcastAddress, ip_dscp=0b000000)
             actions=[parser.OFPActionGroup(group_id)] #actions: apply group
-            self.add_flow(datapath=ap, match=match, actions=actions, priority=12) #install streaming flow rule on current AP
+            self.add_flow(datapath=ap, match=match, actions=actions, priority=12, batch=batch) #install streaming flow rule on current AP
 
-            with open(log_path, "a") as log_file:
-                log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                log_file.write(f"   '---> Actions {actions} \n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+            self.__log.log(log_path, DETAIL, "   '---> Actions {} ", actions)
+            self.__log.log(log_path, DETAIL, "")
 
-            ###########################################################################From eth3/eth4/eth5 to wlan1/eth2
+            #########################################################################From backbone ports to wlan1/eth2
             wlan_iface=f'{ap_name}-wlan1' #WiFi Interface
             eth_iface=f'{ap_name}-eth2' #Ethernet Interface towards endpoint
 
@@ -805,9 +976,8 @@ class FleetController(app_manager.RyuApp): #####################################
                 action_e=parser.OFPActionOutput(out_port_e)
 
                 buckets.append(parser.OFPBucket(actions=[action_w, action_e]))
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Action: {wlan_iface} -> out_port {out_port_w}\n")
-                    log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port_e}\n")
+                self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", wlan_iface, out_port_w)
+                self.__log.log(log_path, DETAIL, "   '---> Action: {} -> out_port {}", eth_iface, out_port_e)
 
             except KeyError:
                 print(f"[ERROR] nterface missing on {ap_name}")
@@ -818,17 +988,14 @@ class FleetController(app_manager.RyuApp): #####################################
                                    type_=ofproto.OFPGT_ALL,
                                    group_id=group_id,
                                    buckets=buckets) #group mod message
-            ap.send_msg(req) #controller issues group mode message to current AP
-            with open(log_path, "a") as log_file:
-                log_file.write(f"   '---> Group rule {group_id}:{buckets} created on {ap_name}\n")
+            batch.append(req) #group mod message for current AP
+            self.__log.log(log_path, DETAIL, "   '---> Group rule {}:{} created on {}", group_id, buckets, ap_name)
 
-            for i in range(3,6): ######################################################################Create Flow Rules
-                in_eth=f'{ap_name}-eth{i}' #input port name
+            for in_eth in self.__backbone_ports[ap_name].values(): #####################################Create Flow Rules (input port name)
 
                 try:
                     in_port=self.__access_points[ap_name][in_eth.encode()] #ingress port number: Ethernet Interface towards other AP
-                    with open(log_path, "a") as log_file:
-                        log_file.write(f"   '---> Ethernet Interface: {in_eth} -> in_port_ {in_port}\n")
+                    self.__log.log(log_path, DETAIL, "   '---> Ethernet Interface: {} -> in_port_ {}", in_eth, in_port)
 
                 except KeyError:
                     print(f"[ERROR] Ethernet interface '{in_eth}' missing on {ap_name}")
@@ -837,12 +1004,84 @@ class FleetController(app_manager.RyuApp): #####################################
 
                 match=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_dst=self.__broadcastAddress, ip_dscp=0b000000)
                 actions=[parser.OFPActionGroup(group_id)] #actions: apply group
-                self.add_flow(datapath=ap, match=match, actions=actions, priority=12) #install streaming flow rule on current AP
+                self.add_flow(datapath=ap, match=match, actions=actions, priority=12, batch=batch) #install streaming flow rule on current AP
+
+                self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+                self.__log.log(log_path, DETAIL, "   '---> Actions: {} ", actions)
+                self.__log.log(log_path, DETAIL, "")
+
+            self.install_batch(ap, batch, 'broadcast')
+
+    '''Defines destination-based flow rules for unicast ARP and IPv4 traffic between host devices (drones and endpoints), using the forwarding index
+       of each AP. Rules have lower priority than reactive ones, so reactive handling remains as a fallback for unknown destinations
+       @param FleetController object'''
+    def proactive_unicast(self):
+        for dpid, index in self.__forwarding.items():
+            ap=self.__datapaths.get(dpid)
+            ap_name=self.__dpids[dpid]
+
+            if not ap:
+                print(f"[ERROR] Datapath not found for {ap_name} (DPID {FleetController.dpid_to_hex(dpid)}, {dpid})")
+                continue
+
+            self.__log.log(log_path, INFO, "Installing unicast rules for {}, {}", ap_name, ap, stamp=True)
+
+            parser=ap.ofproto_parser
+            batch=[] #OpenFlow messages installing unicast rules on current AP
+
+            for dst, out_port in index.items(): #for each known destination
+                actions=[parser.OFPActionOutput(out_port)] #actions: forward out designated exit port
+
+                match=parser.OFPMatch(eth_type=0x0806, arp_tpa=dst) #match on ARP protocol and target IPv4
+                self.add_flow(datapath=ap, match=match, actions=actions, priority=7, cookie=self.__unicast_cookie, batch=batch) #install ARP flow rule on current AP
+
+                match=parser.OFPMatch(eth_type=0x0800, ipv4_dst=dst) #match on IPv4 protocol and destination IPv4
+                self.add_flow(datapath=ap, match=match, actions=actions, priority=9, cookie=self.__unicast_cookie, batch=batch) #install IPv4 flow rule on current AP
+
+                self.__log.log(log_path, DETAIL, "   '---> Unicast rules towards {} -> out_port {} installed on {},{}", dst, out_port, ap_name, ap)
+
+            self.install_batch(ap, batch, 'unicast')
+
+            self.__unicast_stats[dpid]={ 'rules' : 2*len(index),
+                                         'hit' : 0,
+                                         'packets' : 0,
+                                         'fallback' : 0 } #initialize statistics of proactive unicast rules
+
+            self.__log.log(log_path, INFO, "")
+
+    '''Computes the forwarding index of an OVSAP, associating each known destination IPv4 address (drones, endpoints, and trouble-maker nodes) to the
+       number of the egress port leading towards it. Reactive handlers resolve Packet-Ins with a single lookup on this index
+       @param FleetController object
+       @param str ap_name'''
+    def build_forwarding(self, ap_name):
+        dpid=next((k for k, v in self.__dpids.items() if v==ap_name), None) #DPID of current OVSAP
+        ports=self.__access_points.get(ap_name) #dictionary <port name, port number> of current OVSAP
+        if dpid is None or not ports:
+            return
+
+        index={} #dictionary <destination IPv4, egress port number>
+        for dst_ap, ips in self.__ip_groups.items(): #for each AP and the host devices directly connected to it
+            for ip in ips:
+                if dst_ap==ap_name: #destination is directly connected to current AP
+                    out_port_name=f'{ap_name}-eth2' if ip==ips[-1] else f'{ap_name}-wlan1' #endpoint on Ethernet port, drones on WiFi port
+                else: #destination is reachable through the backbone
+                    out_port_name=self.__backbone_ports[ap_name][dst_ap] #egress port Ethernet (towards destination AP)
+
+                out_port=ports.get(out_port_name.encode()) #get output port number
+                if out_port is not None:
+                    index[ip]=out_port
+
+        for ip, (node_ap, port_name) in self.__spurious_ip.items(): #trouble-maker nodes are connected to the first AP
+            out_port_name=port_name if ap_name==node_ap else self.__backbone_ports[ap_name][node_ap]
+            out_port=ports.get(out_port_name.encode()) #get output port number
+            if out_port is not None:
+                index[ip]=out_port
+
+        self.__forwarding[dpid]=index
 
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-                    log_file.write(f"   '---> Actions: {actions} \n")
-                    log_file.write(f"\n")
+        self.__log.log(log_path, INFO, "Forwarding index computed for {} ({}, {})", ap_name, FleetController.dpid_to_hex(dpid), dpid, stamp=True)
+        self.__log.log(log_path, DETAIL, "   '---> {}", index)
+        self.__log.log(log_path, DETAIL, "")
 
     '''Defines flow rules for unicast ARP messages between host devices (drones and endpoints)
        @param FleetController object
@@ -856,82 +1095,19 @@ class FleetController(app_manager.RyuApp): #####################################
         dpid=ap.id
         ap_name=self.__dpids[dpid]
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"{dt.now()} -> Installing ARP rules on {ap_name}: {ap}, ({FleetController.dpid_to_hex(dpid), dpid}\n")
-            log_file.write(f"   '---> Routing ARP {src_mac} : {src} -> {dst}\n")
-            log_file.write(f"   '---> Input port number: {inport}\n")
-
-        if dst in self.__ip_groups['ap1']: #the destination node is connected to AP1
-            if ap_name=='ap1':
-                if dst!=self.__ip_groups['ap1'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint1
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint1)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap2, ap3, or ap4
-                out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP1 in all other APs)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap2']: #the destination node is connected to AP2
-            if ap_name=='ap2':
-                if dst!=self.__ip_groups['ap2'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint2
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint2)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap1':
-                out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap3':
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap_name=='ap4'
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap3']: #the destination node is connected to AP3
-            if ap_name=='ap3':
-                if dst!=self.__ip_groups['ap3'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint3
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint3)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap1' or ap_name=='ap2':
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP3)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap_name=='ap4'
-                out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP3)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap4']: #the destination node is connected to AP4
-            if ap_name=='ap4':
-                if dst!=self.__ip_groups['ap4'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint4
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint4)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap1, ap2, or ap3
-                out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP4)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__spurious_ip:
-            if dst=='192.168.1.21':
-                out_port_name=f'ap1-wlan1' #egress port WiFi
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif dst=='192.168.1.22':
-                out_port_name=f'ap1-eth6' #egress port ethernet
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
+        self.__log.log(log_path, INFO, "Installing ARP rules on {}: {}, ({}", ap_name, ap, (FleetController.dpid_to_hex(dpid), dpid), stamp=True)
+        self.__log.log(log_path, DETAIL, "   '---> Routing ARP {} : {} -> {}", src_mac, src, dst)
+        self.__log.log(log_path, DETAIL, "   '---> Input port number: {}", inport)
 
-        else:
+        out_port=self.__forwarding.get(dpid, {}).get(dst) #egress port number towards destination (single lookup on precomputed index)
+        if out_port is None:
             print(f"Invalid destination IPv4 address {dst}\n")
             return
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"   '---> Output port {out_port_name} ({out_port})\n")
+        if dpid in self.__unicast_stats:
+            self.__unicast_stats[dpid]['fallback']+=1 #Packet-In not covered by proactive unicast rules
+
+        self.__log.log(log_path, DETAIL, "   '---> Output port {}", out_port)
 
         ofproto=ap.ofproto
         parser=ap.ofproto_parser
@@ -940,9 +1116,8 @@ class FleetController(app_manager.RyuApp): #####################################
         actions=[parser.OFPActionOutput(out_port)] #actions: forward out designated exit port
         self.add_flow(datapath=ap, match=match, actions=actions, priority=8) #install flow rule on current AP
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-            log_file.write(f"\n")
+        self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+        self.__log.log(log_path, DETAIL, "")
 
         #handle message inside Packet-In with flow mod
         data=None #content of packet out message
@@ -962,82 +1137,19 @@ class FleetController(app_manager.RyuApp): #####################################
         dpid=ap.id
         ap_name=self.__dpids[dpid]
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"{dt.now()} -> Installing IPv4 rules on {ap_name}: {ap}, ({FleetController.dpid_to_hex(dpid), dpid}\n")
-            log_file.write(f"   '---> Routing IPv4 {src} -> {dst}\n")
-            log_file.write(f"   '---> Input port number: {inport}\n")
-
-        if dst in self.__ip_groups['ap1']: #the destination node is connected to AP1
-            if ap_name=='ap1':
-                if dst!=self.__ip_groups['ap1'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint1
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint1)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap2, ap3, or ap4
-                out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP1 in all other APs)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap2']: #the destination node is connected to AP2
-            if ap_name=='ap2':
-                if dst!=self.__ip_groups['ap2'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint2
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint2)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap1':
-                out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap3':
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap_name=='ap4'
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap3']: #the destination node is connected to AP3
-            if ap_name=='ap3':
-                if dst!=self.__ip_groups['ap3'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint3
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint3)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif ap_name=='ap1' or ap_name=='ap2':
-                out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP3)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap_name=='ap4'
-                out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP3)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__ip_groups['ap4']: #the destination node is connected to AP4
-            if ap_name=='ap4':
-                if dst!=self.__ip_groups['ap4'][2]: #if destination is a drone
-                    out_port_name=f'{ap_name}-wlan1' #egress port WiFi
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-                else: #destination is endpoint4
-                    out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint4)
-                    out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            else: #ap1, ap2, or ap3
-                out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP4)
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-
-        elif dst in self.__spurious_ip:
-            if dst=='192.168.1.21':
-                out_port_name=f'ap1-wlan1' #egress port WiFi
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
-            elif dst=='192.168.1.22':
-                out_port_name=f'ap1-eth6' #egress port ethernet
-                out_port=self.__access_points[ap_name][out_port_name.encode()] #get output port number
+        self.__log.log(log_path, INFO, "Installing IPv4 rules on {}: {}, ({}", ap_name, ap, (FleetController.dpid_to_hex(dpid), dpid), stamp=True)
+        self.__log.log(log_path, DETAIL, "   '---> Routing IPv4 {} -> {}", src, dst)
+        self.__log.log(log_path, DETAIL, "   '---> Input port number: {}", inport)
 
-        else:
+        out_port=self.__forwarding.get(dpid, {}).get(dst) #egress port number towards destination (single lookup on precomputed index)
+        if out_port is None:
             print(f"Invalid destination IPv4 address {dst}\n")
             return
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"   '---> Output port {out_port_name} ({out_port})\n")
+        if dpid in self.__unicast_stats:
+            self.__unicast_stats[dpid]['fallback']+=1 #Packet-In not covered by proactive unicast rules
+
+        self.__log.log(log_path, DETAIL, "   '---> Output port {}", out_port)
 
         ofproto=ap.ofproto
         parser=ap.ofproto_parser
@@ -1046,9 +1158,8 @@ class FleetController(app_manager.RyuApp): #####################################
         actions=[parser.OFPActionOutput(out_port)] #actions: forward out designated exit port
         self.add_flow(datapath=ap, match=match, actions=actions, priority=10) #install flow rule on current AP
 
-        with open(log_path, "a") as log_file:
-            log_file.write(f"   '---> Flow rule {match} installed on {ap_name},{ap}\n")
-            log_file.write(f"\n")
+        self.__log.log(log_path, DETAIL, "   '---> Flow rule {} installed on {},{}", match, ap_name, ap)
+        self.__log.log(log_path, DETAIL, "")
 
         #handle message inside Packet-In with flow mod
         data=None #content of packet out message
@@ -1057,170 +1168,243 @@ class FleetController(app_manager.RyuApp): #####################################
         out=parser.OFPPacketOut(datapath=ap, buffer_id=message.buffer_id, in_port=inport, actions=actions, data=data) #packet out message
         ap.send_msg(out) #controller send packet out to OVSAP
 
+    '''Classifies a Packet-In frame by full parsing (fallback of the fixed-offset pre-classifier, same traffic classes)
+       @param FleetController object
+       @param bytes data (frame)
+       @return (str, tuple) traffic class and fields (see PacketClassifier.classify)'''
+    def classify_packet(self, data):
+        pkt=packet.Packet(data) #message encapsulated in packet-In
+        eth=pkt.get_protocols(ethernet.ethernet)[0] #get Ethernet-like frame from encapsulated packet
+
+        if eth.ethertype==ether_types.ETH_TYPE_LLDP: #if L3 protocol is LLDP
+            return 'lldp', ()
+        elif eth.ethertype==ether_types.ETH_TYPE_ARP: #if L3 protocol is ARP
+            pkt3=pkt.get_protocol(arp.arp) #get ARP packet
+            return 'arp', (eth.src, pkt3.src_ip, pkt3.dst_ip)
+        elif eth.ethertype==ether_types.ETH_TYPE_IP: #if L3 protocol is IPv4
+            pkt3=pkt.get_protocol(ipv4.ipv4) #get IPv4 packet
+            dscp_value=pkt3.tos>>2 #Extract DSCP value from the TOS field of the encapsulated IPv4 packet (upper 6 bits)
+            pkt4=pkt.get_protocol(udp.udp) #extract L4 datagram from message
+            if dscp_value==Notification.DSCP and pkt4 is not None: #Check if the DSCP value matches 000011
+                return 'notification', (eth.src, len(data)-(pkt4.total_length-8)) #offset of UDP payload (UDP payload length = total - header)
+            return 'ipv4', (pkt3.src, pkt3.dst)
+        return 'other', (eth.ethertype,)
+
+    '''Handles a position notification: duplicated copies are dropped, then the drone's position and the channel state of its AP are updated
+       @param FleetController object
+       @param bytes data (frame)
+       @param str src_mac (MAC address of the drone)
+       @param int offset (offset of UDP payload in the frame)'''
+    def handle_notification(self, data, src_mac, offset):
+        notification=Notification.unpack_notification(data, offset) #binary notification, parsed in place
+        if notification is None:
+            notification=Notification.unpack_text(bytes(data[offset:])) #text notification (fallback)
+        if notification is None:
+            self.logger.debug(f"Malformed notification from {src_mac}")
+            return
+
+        drone_id, seq, timestamp, position, occupation, tx_bitrate=notification
+
+        drone=self.__drone_macs.get(src_mac, src_mac)
+        count=self.__notification_count.setdefault(drone, {'received': 0, 'unique': 0})
+        count['received']+=1
+        if seq is not None and self.is_duplicate(drone, seq): #copy already handled (repeated transmission, or heard by several APs)
+            return
+        count['unique']+=1
+
+        self.update_pos(src_mac, position) #update's drone's position
+
+        ap_name=self.__topology['drones'].get(drone, {}).get('ap') #AP the drone is associated with
+        if tx_bitrate and ap_name is not None:
+            self.__channel_rate[ap_name]=tx_bitrate #latest tx bitrate of the AP's channel [Mbit/s]
+        if self.__occupancy_source=='notification' and ap_name is not None:
+            self.update_rate(self.__topology['aps'][ap_name]['dpid'], occupation, drone) #readings of all drones of the AP are aggregated
+
     #####################################################################################Streaming Optimization Function
-    '''
-       @param DroneController object
+    '''Feeds a channel occupation reading of an AP to its occupancy estimator (OccupancyEstimator.py) and walks the quality ladder one tier at a time
+       when the estimator declares congestion (the best active tier is disabled, its subscribers receive the next tier) or relief (the last disabled
+       tier is restored). Flow rules and meters are kept in place, only tier groups change
+       @param FleetController object
        @param int dpid
-       @param str occupation'''
-    def update_rate(self, dpid, occupation):
+       @param float occupation (reading, between 0 and 1)
+       @param str source (reporting drone, or 'openflow' for the controller's port statistics)'''
+    def update_rate(self, dpid, occupation, source):
         ap_name=self.__dpids[dpid] #name of access point
-        ap=self.__datapaths[dpid] #datapath reference of access point
+        ap=self.__datapaths.get(dpid) #datapath reference of access point
+
+        if ap is None or not 0<=float(occupation)<=1: #avoid incorrect readings
+            return
+
+        transition=self.__estimator.update(ap_name, float(occupation), source)
+        state=self.__estimator.state(ap_name)
+        self.__log.log(band_log, DETAIL, "Occupation of Bandwidth on access point {}: {:.1f} from {}, aggregated {:.1f} ({} sources), smoothed {:.1f}",
+                       ap_name, float(occupation)*100, source, state['aggregate']*100, state['sources'], state['smoothed']*100, stamp=True)
+        if transition is None:
+            return
 
         ofproto=ap.ofproto
         parser=ap.ofproto_parser
+        level=state['level'] #number of disabled tiers
+        tier=self.__tiers[level]['name'] #best active tier
+
+        if transition=='congested': #smoothed occupation has stayed above the up threshold for the hold time, drones' video quality is reduced
+            self.__log.log(band_log, ESSENTIAL, "Congestion detected on access point {} (smoothed occupation {:.1f}). Stepping down to {} quality",
+                           ap_name, state['smoothed']*100, tier, stamp=True)
+            self.__log.log(log_path, ESSENTIAL, "Congestion detected on access point {}, {} ({}): stepping down to {} quality", ap_name, dpid, ap, tier,
+                           stamp=True)
+        else: #smoothed occupation has stayed below the down threshold for the hold time
+            self.__log.log(band_log, ESSENTIAL, "Congestion relieved on access point {} (smoothed occupation {:.1f}). Stepping up to {} quality",
+                           ap_name, state['smoothed']*100, tier, stamp=True)
+            self.__log.log(log_path, ESSENTIAL, "Congestion relieved on access point {}, {} ({}): stepping up to {} quality", ap_name, dpid, ap, tier,
+                           stamp=True)
+        self.__log.log(band_log, ESSENTIAL, "")
+
+        batch=[] #OpenFlow messages changing streaming rules, installed atomically on current AP
+        for tier, buckets in zip(self.__tiers, self.tier_buckets(ap_name, parser, level)):
+            group_id=self.__tier_groups[tier['name']]
+            req=parser.OFPGroupMod(datapath=ap,
+                                   command=ofproto.OFPGC_MODIFY,
+                                   type_=ofproto.OFPGT_ALL,
+                                   group_id=group_id,
+                                   buckets=buckets) #group mod message (unchanged groups are not sent again)
+            batch.append(req) #group mod message for current AP
 
-        groupH=1 #group id for high quality streaming
-        groupL=2 #group rule for low quality streaming
-
-        if 0<=float(occupation)<=1: #avoid incorrect readings
-            if self.__occupation[ap_name]!=float(occupation):
-                self.__occupation[ap_name]=float(occupation) #update channel occupation
-
-                with open(band_log, "a") as band_file:
-                    band_file.write(f"{dt.now()} -> Current Occupation of Bandwidth on access point {ap_name}: {float(occupation)*100}\n")
-                    band_file.write(f"\n")
-
-                    if float(occupation)>=0.5: #we assume congestion to happen after 50% bandwidth occupation, we instruct the drone to reduce video quality
-                        if self.__congested[ap_name]==0: #if the channel was not previously congested
-                            band_file.write(f"{dt.now()} -> Congestion detected on access point {ap_name}. Changing streaming rules\n")
-                            band_file.write(f"\n")
-
-                            #########################################Delete Group Rule related to high-quality streaming
-                            del_reqH=parser.OFPGroupMod(datapath=ap, command=ofproto.OFPGC_DELETE, group_id=groupH) #remove group for high quality streaming
-                            ap.send_msg(del_reqH) #controller sends GroupMod to current AP to clear previous entry for this group
-
-                            with open(log_path, "a") as log_file:
-                                log_file.write(f"{dt.now()} -> Congestion detected on access point {ap_name}, {dpid} ({ap})\n")
-                                log_file.write(f"   '---> Deleted Group {groupH}\n")
-
-                            ##########################################Delete Flow Rule related to high-quality streaming
-                            for ip in self.__ip_groups[ap_name][:2]: #for each drone IPv4 address connected to current AP
-                                with open(log_path, "a") as log_file:
-                                    log_file.write(f"   '---> Flow rule {ip}:{8888} removed on {ap_name},{ap}\n")
-
-                            #############################################Create New Group Rule for Low Quality Streaming
-                            buckets_L=[] #create bucket of action lists (low-quality)
-                            for i in range(2, 6): #for each Ethernet interface
-                                eth_iface=f'{ap_name}-eth{i}'
-                                try:
-                                    out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
-                                    action=parser.OFPActionOutput(out_port)
-                                    buckets_L.append(parser.OFPBucket(actions=[action]))
-
-                                    with open(log_path, "a") as log_file:
-                                        log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port}\n")
-
-                                except KeyError:
-                                    print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
-
-                            reqL=parser.OFPGroupMod(datapath=ap,
-                                                    command=ofproto.OFPGC_MODIFY,
-                                                    type_=ofproto.OFPGT_ALL,
-                                                    group_id=groupL,
-                                                    buckets=buckets_L) #group mod message
-                            ap.send_msg(reqL) #controller issues group mode message to current AP
-
-                            with open(log_path, "a") as log_file:
-                                log_file.write(f"   '---> Group rule {groupL} modified on {ap_name}, {ap}\n")
-                                log_file.write(f"   '---> Buckets: {buckets_L}\n")
-                                log_file.write(f"\n")
-
-                            self.__congested[ap_name]=3 #channel is congested, it has to be found idle 3 times before changing the rules again
-
-                        elif 1<=self.__congested[ap_name]<=2: #the channel is already congested, but starting to get idle
-                            self.__congested[ap_name]+=1 #increase the counter again, channel is not getting idle
-
-                    else: #channel occupation below 0.5
-                        if 2<=self.__congested[ap_name]<=3: #the channel is congested, but it is getting idle
-                            self.__congested[ap_name]-=1 #decrease counter
-
-                        elif self.__congested[ap_name]==1: #channel was congested, but now is idle
-                            band_file.write(f"{dt.now()} -> Congestion relieved on access point {ap_name}. Re-establishing streaming rules\n")
-                            band_file.write(f"\n")
-
-                            ########################################################Create New Group Rules for Streaming
-                            buckets_L=[] #create bucket of action lists (low-quality)
-                            buckets_H=[] #create bucket of action lists (high-quality)
-
-                            for i in range(2, 6): #for each Ethernet interface
-                                eth_iface=f'{ap_name}-eth{i}'
-                                try:
-                                    out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
-                                    action=parser.OFPActionOutput(out_port)
-
-                                    if eth_iface[7]=='2': #eth2
-                                        if ap_name=='ap1' or ap_name=='ap3':
-                                            buckets_H.append(parser.OFPBucket(actions=[action]))
-                                        else: #ap2 and ap4
-                                            buckets_L.append(parser.OFPBucket(actions=[action]))
-
-                                    elif eth_iface[7]=='3': #eth3
-                                        if ap_name=='ap1':
-                                            buckets_L.append(parser.OFPBucket(actions=[action]))
-                                        else: #ap2, ap3, and ap4
-                                            buckets_H.append(parser.OFPBucket(actions=[action]))
-
-                                    elif eth_iface[7]=='4': #eth4
-                                        if ap_name=='ap3' or ap_name=='ap4':
-                                            buckets_L.append(parser.OFPBucket(actions=[action]))
-                                        else: #ap1 and ap2
-                                            buckets_H.append(parser.OFPBucket(actions=[action]))
-
-                                    else: #eth5
-                                        if ap_name=='ap4':
-                                            buckets_H.append(parser.OFPBucket(actions=[action]))
-                                        else: #ap1, ap2, and ap3
-                                            buckets_L.append(parser.OFPBucket(actions=[action]))
-
-                                    with open(log_path, "a") as log_file:
-                                        log_file.write(f"   '---> Action: {eth_iface} -> out_port {out_port}\n")
-
-                                except KeyError:
-                                    print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
-
-                            reqH=parser.OFPGroupMod(datapath=ap,
-                                                    command=ofproto.OFPGC_ADD,
-                                                    type_=ofproto.OFPGT_ALL,
-                                                    group_id=groupH,
-                                                    buckets=buckets_H) #group mod message
-
-                            ap.send_msg(reqH) #controller issues group mode message to current AP
-                            with open(log_path, "a") as log_file:
-                                log_file.write(f"   '---> Group rule {groupH} re-established on {ap_name}, {ap}\n")
-                                log_file.write(f"   '---> Buckets: {buckets_H}\n")
-
-                            reqL=parser.OFPGroupMod(datapath=ap,
-                                                    command=ofproto.OFPGC_MODIFY,
-                                                    type_=ofproto.OFPGT_ALL,
-                                                    group_id=groupL,
-                                                    buckets=buckets_L) #group mod message
-                            ap.send_msg(reqL) #controller issues group mode message to current AP
-                            with open(log_path, "a") as log_file:
-                                log_file.write(f"   '---> Group rule {groupL} modified on {ap_name}, {ap}\n")
-                                log_file.write(f"   '---> Buckets: {buckets_L}\n")
-
-                            ####################################Re-establish Flow Rule related to high-quality streaming
-                            for ip in self.__ip_groups[ap_name][:2]: #for each drone IPv4 address connected to current AP
-                                in_port=self.__access_points[ap_name][f'{ap_name}-wlan1'.encode()] #ingress port number: WiFi Interface
-                                matchH=parser.OFPMatch(eth_type=0x0800, in_port=in_port, ipv4_src=ip,
-                                                       ipv4_dst=self.__broadcastAddress,
-                                                       ip_dscp=0b000000, ip_proto=17,
-                                                       udp_dst=8888) #match for high quality streams
-
-                                action_udp=parser.OFPActionSetField(udp_dst=int(f"123{ip[10]}"))
-                                actions=[action_udp, parser.OFPActionGroup(groupH)] #actions: change destination L4 Port and apply group
-                                self.add_flow(datapath=ap, match=matchH, actions=actions, priority=16, meter_id=1) #install flow rule on current AP (high quality)
-
-                                with open(log_path, "a") as log_file:
-                                    log_file.write(f"   '---> Flow rule {matchH} re-installed on {ap_name},{ap}\n")
-                                    log_file.write(f"   '---> Actions: {actions} \n")
-
-                            with open(log_path, "a") as log_file:
-                                log_file.write(f"\n")
-
-                            self.__congested[ap_name]=0 #reset counter
+            self.__log.log(log_path, DETAIL, "   '---> Group rule {} ({} quality) modified on {}, {}", group_id, tier['name'], ap_name, ap)
+            self.__log.log(log_path, DETAIL, "   '---> Buckets: {}", buckets)
+        self.__log.log(log_path, INFO, "")
+
+        self.install_batch(ap, batch, 'congestion' if transition=='congested' else 'relief')
+
+    '''Learns the bitrate of quality tiers from the byte counters of streaming flow rules of an AP (the bytes of a stream are counted before its meter),
+       and retunes the meter bands of the AP to the learned bitrate of its active streams plus headroom (OFPMC_MODIFY). Meter bands are initially set
+       from the video format of the tier, which is not related to the encoded bitrate of the streamed video
+       @param FleetController object
+       @param int dpid
+       @param OFPFlowStats[] stats (statistics of streaming flow rules)'''
+    def learn_rates(self, dpid, stats):
+        ap_name=self.__dpids.get(dpid)
+        ap=self.__datapaths.get(dpid)
+        if ap_name is None or ap is None:
+            return
+
+        active={tier['name']: [] for tier in self.__tiers} #dictionary <tier name, float[]> rates of the active streams of each tier [kbps]
+        for stat in stats:
+            tier=self.__port_tiers.get(stat.match.get('udp_dst'))
+            if tier is None:
+                continue
+            now=stat.duration_sec+stat.duration_nsec*1e-9 #time since the flow rule was installed [s]
+            key=(dpid, stat.match.get('ipv4_src'), stat.match.get('udp_dst'))
+            last=self.__flow_counters.get(key)
+            self.__flow_counters[key]=(stat.byte_count, now)
+            if last is None or now<=last[1] or stat.byte_count<last[0]: #first sample, or flow rule re-installed
+                continue
+            rate=(stat.byte_count-last[0])*8/((now-last[1])*1000) #[kbps]
+            if rate>0: #drone is streaming
+                active[tier].append(rate)
+
+        ofproto=ap.ofproto
+        parser=ap.ofproto_parser
+        batch=[] #MeterMod messages retuning meters of current AP
+
+        for tier in self.__tiers:
+            name=tier['name']
+            rates=active[name]
+            if not rates:
+                continue
+
+            sample=sum(rates)/len(rates) #average bitrate of a stream of the tier
+            learned=self.__tier_rates.get(name)
+            learned=sample if learned is None else learned+self.__rate_alpha*(sample-learned)
+            self.__tier_rates[name]=learned
+
+            target=int(learned*len(rates)*(1+self.__meter_headroom)) #the meter of the tier is shared by all streams of the AP
+            current=self.__meter_bands.get((ap_name, name), Topology.tier_rate(tier))
+            self.__log.log(band_log, INFO, "Learned bitrate of {} quality: {:.0f} [kbps] ({} streams on access point {}, {:.0f} [kbps] each)", name,
+                           learned, len(rates), ap_name, sample, stamp=True)
+            if abs(target-current)<=current*self.__retune_threshold:
+                continue
+
+            meter_id=self.__tier_meters[name]
+            bands=[parser.OFPMeterBandDrop(rate=target, type_=1, len_=16)] #[kbps]
+            batch.append(parser.OFPMeterMod(datapath=ap, command=ofproto.OFPMC_MODIFY,
+                                            flags=ofproto.OFPMF_KBPS,
+                                            meter_id=meter_id,
+                                            bands=bands)) #meter_mod message
+            self.__meter_bands[(ap_name, name)]=target
+
+            self.__log.log(band_log, ESSENTIAL, "Meter {} ({} quality) on access point {} retuned: {} -> {} [kbps]", meter_id, name, ap_name, current,
+                           target, stamp=True)
+            self.__log.log(log_path, DETAIL, "   '---> Meter rule {} modified on {}, {}: {}", meter_id, ap_name, ap, bands)
+
+        if batch:
+            self.__log.log(band_log, INFO, "")
+            self.install_batch(ap, batch, 'meters')
+
+    '''Returns the learned bitrate of a stream of each quality tier
+       @param FleetController object
+       @return <str, float> rates [kbps]'''
+    def tier_rates(self):
+        return dict(self.__tier_rates)
+
+    '''Returns the state of the occupancy estimator of every AP (smoothed and aggregated occupation, reporting sources, congestion)
+       @param FleetController object
+       @return <str, dict> states'''
+    def occupancy_state(self):
+        return self.__estimator.states()
+
+    '''Returns the tx bitrate of the channel of every AP, used to turn received bytes into channel occupation
+       @param FleetController object
+       @return <str, float> rates [Mbit/s]'''
+    def channel_rates(self):
+        return dict(self.__channel_rate)
 
     ###################################################################################################Utility Functions
+    '''Returns the group buckets forwarding the streams of an AP's drones towards endpoints: the endpoint port and the backbone ports towards the
+       other APs, split according to the tier their endpoints are subscribed to, each one enqueuing streams in the egress queue of the endpoint the
+       port leads to (subscriber policies of Topology.py)
+       @param FleetController object
+       @param str ap_name
+       @param module parser (OpenFlow parser of the AP)
+       @return OFPBucket[][] buckets of each tier (in ladder order)'''
+    def stream_buckets(self, ap_name, parser):
+        buckets=[[] for tier in self.__tiers] #buckets of each tier
+        endpoints=Topology.port_endpoints(self.__topology, ap_name)
+        for quality, ports in enumerate(Topology.stream_ports(self.__topology, ap_name)):
+            for eth_iface in ports: #for each Ethernet interface
+                try:
+                    out_port=self.__access_points[ap_name][eth_iface.encode()] #output port number: Ethernet Interface
+                    queue=self.__topology['policies'][endpoints[eth_iface]]['queue'] #egress queue of the endpoint
+                    buckets[quality].append(parser.OFPBucket(actions=[parser.OFPActionSetQueue(queue), parser.OFPActionOutput(out_port)]))
+                    self.__log.log(log_path, DETAIL, "   '---> Action: {} -> queue {}, out_port {}", eth_iface, queue, out_port)
+
+                except KeyError:
+                    print(f"[ERROR] Ethernet Interface '{eth_iface}' missing on {ap_name}")
+        return buckets
+
+    '''Returns the group buckets of each tier at a congestion level: the best tiers are disabled (empty groups, their flow rules are kept in place) and
+       their subscribers receive the best active tier
+       @param FleetController object
+       @param str ap_name
+       @param module parser (OpenFlow parser of the AP)
+       @param int level (number of disabled tiers)
+       @return OFPBucket[][] buckets of each tier (in ladder order)'''
+    def tier_buckets(self, ap_name, parser, level):
+        buckets=[[] for tier in self.__tiers]
+        for quality, subscribers in enumerate(self.stream_buckets(ap_name, parser)):
+            buckets[max(quality, level)]+=subscribers
+        return buckets
+
+    '''Allocates a group or meter ID, skipping IDs reserved to other rules
+       @param FleetController object
+       @param str kind ('group' or 'meter')
+       @return int ID'''
+    def allocate_id(self, kind):
+        new_id=self.__next_ids[kind]
+        while kind=='group' and new_id in self.__reserved_groups:
+            new_id+=1
+        self.__next_ids[kind]=new_id+1
+        return new_id
+
     '''Install flow rule in the flow table of current OVSAP (the controller sends a FlowMod message to the current AP)
        @param FleetController object
        @param Datapath datapath (reference to current AP)
@@ -1230,8 +1414,10 @@ class FleetController(app_manager.RyuApp): #####################################
        @param int idle_timeout (default 0, meaning no idle timeout)
        @param int hard_timeout (default 0, meaning no hard timeout)
        @param int buffer_id (default None, meaning no buffer ID)
-       @param int meter_id (default None, meaning no meter isntruction to apply)'''
-    def add_flow(self, datapath, match, actions, priority=0, idle_timeout=0, hard_timeout=0, buffer_id=None, meter_id=None):
+       @param int meter_id (default None, meaning no meter isntruction to apply)
+       @param int cookie (default 0, meaning no cookie)
+       @param list batch (default None, meaning the FlowMod is sent immediately; otherwise it is appended to the batch)'''
+    def add_flow(self, datapath, match, actions, priority=0, idle_timeout=0, hard_timeout=0, buffer_id=None, meter_id=None, cookie=0, batch=None):
         ofproto=datapath.ofproto #to handle OpenFlow protocol 1.3
         parser=datapath.ofproto_parser #to create and manage OpenFlow protocol
         inst=[parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)] #specify to OVSAP instructions to apply actions
@@ -1239,63 +1425,223 @@ class FleetController(app_manager.RyuApp): #####################################
         if meter_id is not None:
             inst.append(parser.OFPInstructionMeter(meter_id)) #apply meter instruction if required
 
-            with open(log_path, "a") as log_file:
-                log_file.write(f"   '---> Instructions: {inst} \n")
-                log_file.write(f"\n")
+            self.__log.log(log_path, DETAIL, "   '---> Instructions: {} ", inst)
+            self.__log.log(log_path, DETAIL, "")
 
         if buffer_id: #if a valid buffer ID has been specified by OVS AP to controller
             mod=parser.OFPFlowMod(datapath=datapath, match=match, priority=priority, idle_timeout=idle_timeout, hard_timeout=hard_timeout,
-                                    buffer_id=buffer_id, instructions=inst, command=ofproto.OFPFC_ADD) #create FlowMod message
+                                    buffer_id=buffer_id, instructions=inst, command=ofproto.OFPFC_ADD, cookie=cookie) #create FlowMod message
         else: #if NO valid buffer ID has been specified
             mod=parser.OFPFlowMod(datapath=datapath, match=match, priority=priority, idle_timeout=idle_timeout, hard_timeout=hard_timeout,
-                                    instructions=inst, command=ofproto.OFPFC_ADD) #create FlowMod message
-        datapath.send_msg(mod) #send FlowMod message to OVSAP to install new flow rule
+                                    instructions=inst, command=ofproto.OFPFC_ADD, cookie=cookie) #create FlowMod message
+        if batch is not None:
+            batch.append(mod) #FlowMod message is installed together with the rest of the batch
+        else:
+            journal=[] #shadow changes, confirmed by the next barrier reply of the AP
+            mod=self.__shadow.apply(datapath, mod, journal) #skip rule if already installed
+            if mod is not None:
+                datapath.set_xid(mod)
+                datapath.send_msg(mod) #send FlowMod message to OVSAP to install new flow rule
+                if journal:
+                    unconfirmed=self.__unconfirmed.setdefault(datapath.id, {})
+                    unconfirmed[mod.xid]=journal
+                    if len(unconfirmed)>self.__max_unconfirmed: #no barrier for a long time: no error has been reported for the oldest FlowMod
+                        self.__shadow.confirm(datapath.id, unconfirmed.pop(next(iter(unconfirmed))))
+
+    '''Installs a batch of OpenFlow messages (FlowMod, GroupMod, MeterMod) on an OVSAP. FlowMods and GroupMods are enclosed in an atomic and ordered
+       ONF bundle (OpenFlow 1.3 bundle extension) when the AP supports it, otherwise all messages are sent in order. MeterMods cannot be bundled and
+       are sent first. The batch is closed by an OFPBarrierRequest: its reply confirms that all messages have been processed by the AP. Messages
+       describe the desired state of AP tables: only their delta with respect to installed rules is sent
+       @param FleetController object
+       @param Datapath datapath (reference to current AP)
+       @param list msgs (OpenFlow messages, in installation order)
+       @param str label (purpose of the batch, used in logs)
+       @param bool resend (default False; True when a rejected batch is re-sent, its delta has already been computed)
+       @param list journal (default None; shadow changes of the re-sent batch)'''
+    def install_batch(self, datapath, msgs, label, resend=False, journal=None):
+        if not resend:
+            journal=[] #shadow changes of the batch, confirmed by its barrier reply or rolled back on errors
+            requested=len(msgs)
+            msgs=[msg for msg in (self.__shadow.apply(datapath, msg, journal) for msg in msgs) if msg is not None] #delta w.r.t. installed rules
+            if not msgs:
+                self.__log.log(log_path, INFO, "Batch '{}' for {}: {} rules already installed, nothing to send", label, self.__dpids.get(datapath.id),
+                               requested, stamp=True)
+                return
+
+        ofproto=datapath.ofproto
+        parser=datapath.ofproto_parser
+        start=time.perf_counter()
+
+        use_bundle=self.__use_bundles and self.__bundle_support.get(datapath.id, True) and hasattr(parser, 'ONFBundleCtrlMsg')
+        bundled=[msg for msg in msgs if isinstance(msg, (parser.OFPFlowMod, parser.OFPGroupMod))] if use_bundle else []
+        bundled_ids={id(msg) for msg in bundled}
+        direct=[msg for msg in msgs if id(msg) not in bundled_ids] #messages sent outside the bundle (or all messages, without bundles)
+
+        xids=set() #transaction IDs of messages belonging to the batch (to match error messages)
+        for msg in direct:
+            if msg.xid is None: #messages of a re-sent batch keep their transaction ID
+                datapath.set_xid(msg)
+            xids.add(msg.xid)
+            datapath.send_msg(msg)
+
+        bundle_id=None
+        open_xid=None
+        if bundled:
+            bundle_id=self.__bundle_id #unique bundle ID
+            self.__bundle_id+=1
+            flags=ofproto.ONF_BF_ATOMIC | ofproto.ONF_BF_ORDERED
+
+            req=parser.ONFBundleCtrlMsg(datapath, bundle_id, ofproto.ONF_BCT_OPEN_REQUEST, flags, [])
+            datapath.set_xid(req)
+            open_xid=req.xid
+            xids.add(req.xid)
+            datapath.send_msg(req) #open bundle
+
+            for msg in bundled:
+                req=parser.ONFBundleAddMsg(datapath, bundle_id, flags, msg, [])
+                datapath.set_xid(req)
+                if msg.xid is None:
+                    msg.set_xid(req.xid) #bundled message shares the transaction ID of its BundleAdd
+                xids.add(req.xid)
+                datapath.send_msg(req) #add message to bundle
+
+            req=parser.ONFBundleCtrlMsg(datapath, bundle_id, ofproto.ONF_BCT_COMMIT_REQUEST, flags, [])
+            datapath.set_xid(req)
+            xids.add(req.xid)
+            datapath.send_msg(req) #commit bundle (messages are applied all together)
+
+        barrier=parser.OFPBarrierRequest(datapath)
+        datapath.set_xid(barrier)
+        datapath.send_msg(barrier) #barrier reply confirms the installation of the whole batch
+
+        self.__pending_batches[(datapath.id, barrier.xid)]={ 'label': label,
+                                                             'msgs': msgs,
+                                                             'bundled': bundled, #messages inside the bundle (re-sent if it is rejected)
+                                                             'bundle': bundle_id,
+                                                             'open': open_xid, #xid of the bundle's OPEN request
+                                                             'direct': {msg.xid for msg in direct}, #xids of messages sent outside the bundle
+                                                             'journal': journal,
+                                                             'xids': xids,
+                                                             'failed': False,
+                                                             'start': start } #batch waiting for confirmation
+
+        self.__log.log(log_path, INFO, "Batch '{}' sent to {}: {} messages ({})", label, self.__dpids.get(datapath.id), len(msgs),
+                       f"bundle {bundle_id}, {len(direct)} unbundled" if bundle_id is not None else "ordered + barrier", stamp=True)
+
+    '''Returns statistics of rule installation batches
+       @param FleetController object
+       @return <str, float> stats'''
+    def batch_stats(self):
+        latencies=self.__batch_latency
+        return { 'confirmed': len(latencies),
+                 'pending': len(self.__pending_batches),
+                 'failed': self.__failed_batches,
+                 'avg_ms': sum(latencies)/len(latencies)*1000 if latencies else 0.0,
+                 'max_ms': max(latencies)*1000 if latencies else 0.0 }
+
+    '''Returns the APs whose streaming rules have been confirmed
+       @param FleetController object
+       @return str[] AP names'''
+    def ready_aps(self):
+        return [ap_name for ap_name, ready in self.__ap_ready.items() if ready]
+
+    '''Returns counters of Packet-Ins classified by fixed offsets ('fast') or by full parsing ('full')
+       @param FleetController object
+       @return <str, int> stats'''
+    def classification_stats(self):
+        return dict(self.__parse_count)
 
     '''It handles notifications by updating drones' current positions
         @param FleetController object
         @param str drone_mac
-        @param str position'''
+        @param (float, float, float) position'''
     def update_pos(self, drone_mac, position):
-        pos=tuple(map(float, position.split(',')))
+        pos=tuple(position)
         drone=self.__drone_macs[drone_mac]
 
         if pos!=self.__drone_positions[drone]: #if drone position has changed
 
             self.__drone_positions[drone]=pos #update current drone position
 
-            with open(mob_log, "a") as log_file:
-                log_file.write(f"{dt.now()} -> Receiving position update from {drone}: {drone_mac}\n")
-                log_file.write(f"   '---> Current position: {pos}\n")
-                log_file.write(f"\n")
+            self.__log.log(mob_log, INFO, "Receiving position update from {}: {}", drone, drone_mac, stamp=True)
+            self.__log.log(mob_log, INFO, "   '---> Current position: {}", pos)
+            self.__log.log(mob_log, INFO, "")
+            self.energy_event(drone) #update deployment status and energy accounting of the drone
+            self.log_fleet_status(INFO)
 
-                for d,p in self.__drone_positions.items():
-                    if p==self.__hover_positions[d]:
-                        status='Deployed'
-                    elif p==self.__base:
-                        status='Base'
-                    else:
-                        status='Moving'
+    '''Checks a notification sequence number against the sliding window of the source drone, and records it
+       @param FleetController object
+       @param str drone
+       @param int seq
+       @return bool True if the notification has already been received'''
+    def is_duplicate(self, drone, seq):
+        state=self.__notification_seqs.get(drone)
+        if state is None: #first notification from this drone
+            self.__notification_seqs[drone]=[seq, 1]
+            return False
+
+        highest, received=state
+        if seq-highest>=self.__dedup_window: #newer than the whole window: no notification of the window has been received
+            highest, received=seq, 1
+        elif seq>highest: #newer notification, slide the window forward
+            received=((received<<(seq-highest)) | 1) & ((1<<self.__dedup_window)-1)
+            highest=seq
+        elif highest-seq>=self.__dedup_window: #far older than the window: the drone has restarted its sequence numbers
+            highest, received=seq, 1
+        elif received & (1<<(highest-seq)): #already received
+            return True
+        else: #late notification within the window
+            received|=1<<(highest-seq)
+
+        state[0], state[1]=highest, received
+        return False
+
+    '''Returns counters of received and unique notifications of each drone, with the average number of copies received per notification
+       (useful to tune the number of copies sent by drones)
+       @param FleetController object
+       @return <str, <str, float>> stats'''
+    def notification_stats(self):
+        return { drone: { 'received': count['received'],
+                          'unique': count['unique'],
+                          'copies': count['received']/count['unique'] if count['unique'] else 0.0 }
+                 for drone, count in self.__notification_count.items() }
+
+    '''Logs current position, deployment status, and residual energy of every drone of the fleet on the mobility log
+       @param FleetController object
+       @param int level (verbosity level)'''
+    def log_fleet_status(self, level):
+        if level>self.__log.level: #skip status computation if it is not going to be logged
+            return
 
-                    log_file.write(f"   '---> {d}:{p}. Status: {status}. Remaining energy: {self.__drone_energy[d]} [J]\n")
+        for d, p in self.__drone_positions.items():
+            if self.__drone_status.get(d)=='Hovering':
+                self.settle_energy(d) #account for energy spent hovering so far
+            if p==self.__hover_positions[d]:
+                status='Deployed'
+            elif p==self.__base:
+                status='Base'
+            else:
+                status='Moving'
+            self.__log.log(mob_log, level, "   '---> {}:{}. Status: {}. Remaining energy: {} [J]", d, p, status, self.__drone_energy[d])
+        self.__log.log(mob_log, level, "")
 
-                log_file.write(f"\n")
+    '''Send mobility commands to drones over the persistent command channel, instructing them to go back to base (if the drone's battery is below the
+       recharge threshold) or to start to hover and stream video (if the drone has been spared). Commands passed together are sent in a single message,
+       and the ACK is handled asynchronously by command_ack
+       @param FleetController object
+       @param dict commands'''
+    def send_command(self, *commands):
+        self.__commands.send(*commands)
 
-    '''Send mobility command to drone over a socket connection, instructing it to go back to base (if the drone's battery is below the recharge threshold)
-       or to start to hover and stream video (if the drone has been spared)
-       @param str command'''
-    def send_command(self, command):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((self.__address, self.__port)) #connects to position server socket
-                s.sendall(command.encode()) #send moving drone command
-                ack=s.recv(1024) #wait for an ACK
-
-                jcommand = json.loads(command) #convert transmitted command in json format
-                with open(mob_log, "a") as log_file:
-                    log_file.write(f"{dt.now()} -> [ACK] Received: {ack.decode()} to {jcommand['Drone']} ")
-                    log_file.write("\n")
-        except Exception as e:
-            print(f"[ERROR] Failed to Send Command: {e}")
+    '''Called by the command channel when the server acknowledges a message
+       @param FleetController object
+       @param int msg_id
+       @param dict[] commands
+       @param dict reply
+       @param float rtt (round-trip time [s])'''
+    def command_ack(self, msg_id, commands, reply, rtt):
+        self.__log.log(mob_log, ESSENTIAL, "[ACK] Received: {} to {} (message {}, {} commands, {:.1f} [ms])", reply.get('ack'),
+                       ', '.join(command['Drone'] for command in commands), msg_id, len(commands), rtt*1000, stamp=True)
 
     '''Convert a DPID in its hexadecimal format
        @param int dpid
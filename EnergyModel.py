@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""Fleet energy model shared by FootballStreaming.py (mobility planning) and DroneController.py (runtime energy accounting). All functions evaluate the
+   whole fleet at once on NumPy arrays: hovering positions are given as an (N, 3) array, and every drone parameter can be either a scalar (same value for
+   the whole fleet) or an (N,) array (per-drone value).
+   Each drone lifts vertically to its hovering height, flies along X then along Y, hovers, and comes back along Y, X, and Z"""
+
+#################################################################################################################Imports
+import numpy as np
+
+########################################################################################################Global Variables
+GRAVITY=9.8 #Gravitational acceleration [m/s^2]
+TIME_SCALE=20 #seconds of flight accounted for each second of emulation
+
+#consdering drone DJI Mavic 3E
+DEFAULT_PARAMS={ 'capacity': 5000, #Battery capacity [mAh]
+                 'voltage': 15.4, #Battery voltage [V]
+                 'mass': 1+0.3+0.1, #Drone body + battery + camera mass [kg]
+                 'lift_to_drag': 2.5, #Lift-to-drag ratio: typical range of aerodynamic efficiency for multi-rotor drones is 1-3
+                 'efficiency': 0.5, #Rotors efficiency: typical range is 0.2-0.7
+                 'p_avio': 10, #Power needed for avionics operations (on-board computations, communications, video-recording, gps, etc) [W]: 5-25 [W]
+                 'v': 5, #Drone's speed relative to the wind [m/s]: 5-15 [m/s] is a typical speed range for video drones
+                 'phi': 0.3, #windspeed-to-dronespeed ratio: typical range 0-0.6
+                 'n': 4, #number of rotors
+                 's': 0.073, #rotor's area [m^2]: 0.049-0.113 [m^2] is a typical range for quad-rotor drones
+                 'ro': 1.152062, #air density in Cosenza
+                 'drag_coeff': 1.3 } #vertical drag coefficient: 1-1.5 is a typical range for quad-rotor drones
+
+'''Returns drone parameters as NumPy values, overriding defaults with the given ones (scalars or per-drone arrays)
+   @param dict params (default None, meaning DEFAULT_PARAMS)
+   @return <str, ndarray> params'''
+def parameters(params=None):
+    merged=dict(DEFAULT_PARAMS)
+    if params:
+        merged.update(params)
+    return {key: np.asarray(value, dtype=float) for key, value in merged.items()}
+
+'''Returns the full-battery energy of drones
+   @param dict params
+   @return ndarray energy [J]'''
+def battery_energy(params=None):
+    p=parameters(params)
+    return p['capacity']*p['voltage']*3.6
+
+'''Returns the energy spent per meter of vertical flight (lift or drop). Assumptions: constant speed, thrust == weight + drag, zero lift
+   @param dict params
+   @return ndarray energy [J/m]'''
+def vertical_energy(params=None):
+    p=parameters(params)
+    return ( ( (p['mass']*GRAVITY) + ( p['n']*p['ro']*p['s']*p['drag_coeff']*(p['v']**2) )/2 ) * (p['v']/p['efficiency']) + p['p_avio'] ) / p['v']
+
+'''Returns the energy spent per meter of horizontal flight. Assumptions: constant speed, thrust == drag, weight == lift
+   @param dict params
+   @return ndarray energy [J/m]'''
+def horizontal_energy(params=None):
+    p=parameters(params)
+    return ( ( (p['mass']*GRAVITY) / (p['efficiency']*p['lift_to_drag']) ) + (p['p_avio']/ (p['v']/(1-p['phi'])) ) ) / (1-p['phi'])
+
+'''Returns the power needed to hover at fixed altitude. Assumptions: zero speed, thrust == weight, zero drag, zero lift
+   @param dict params
+   @return ndarray power [W]'''
+def hover_power(params=None):
+    p=parameters(params)
+    return ( (p['mass']*GRAVITY)**(3/2) / (2*p['n']*p['ro']*p['s'])**(1/2) ) + p['p_avio']
+
+'''Returns the energy of each flight segment of every drone
+   @param ndarray positions ((N, 3) hovering positions)
+   @param dict params
+   @return <str, ndarray> energies [J]: lift, fly_x, fly_y (outbound), fly_y_back, fly_x_back, drop (inbound), each of shape (N,)'''
+def segment_energies(positions, params=None):
+    positions=np.asarray(positions, dtype=float).reshape(-1, 3)
+    vertical=vertical_energy(params)*positions[:, 2]
+    fly_x=horizontal_energy(params)*positions[:, 0]
+    fly_y=horizontal_energy(params)*positions[:, 1]
+    return { 'lift': vertical,
+             'fly_x': fly_x,
+             'fly_y': fly_y,
+             'fly_y_back': fly_y,
+             'fly_x_back': fly_x,
+             'drop': vertical }
+
+'''Returns the energy needed by every drone to reach its hovering position
+   @param ndarray positions ((N, 3) hovering positions)
+   @param dict params
+   @return ndarray energy [J]'''
+def outbound_energy(positions, params=None):
+    e=segment_energies(positions, params)
+    return e['lift']+e['fly_x']+e['fly_y']
+
+'''Returns the energy needed by every drone to come back to the supply station from its hovering position
+   @param ndarray positions ((N, 3) hovering positions)
+   @param dict params
+   @return ndarray energy [J]'''
+def return_energy(positions, params=None):
+    e=segment_energies(positions, params)
+    return e['fly_y_back']+e['fly_x_back']+e['drop']
+
+'''Returns the maximum hovering energy and time of every drone, given its residual energy at take-off
+   @param ndarray positions ((N, 3) hovering positions)
+   @param ndarray energy (residual energy at take-off [J], default None meaning full battery)
+   @param dict params
+   @return (ndarray, ndarray) hovering energy [J], hovering time [s]'''
+def hover_time(positions, energy=None, params=None):
+    if energy is None:
+        energy=battery_energy(params)
+    e_hover=energy-outbound_energy(positions, params)-return_energy(positions, params)
+    return e_hover, e_hover/hover_power(params)
+
+'''Returns the recharge threshold of every drone: when its residual energy falls below the threshold, the drone has to go back to the supply station
+   @param ndarray positions ((N, 3) hovering positions)
+   @param float margin (safety margin [J])
+   @param dict params
+   @return ndarray threshold [J]'''
+def recharge_thresholds(positions, margin=0.0, params=None):
+    return return_energy(positions, params)+margin
+
+'''Returns the segment durations of every drone's flight, rounded to whole seconds of emulation (the mobility pattern has one position per second)
+   @param ndarray positions ((N, 3) hovering positions)
+   @param dict params
+   @return <str, ndarray> durations [s]: lift, fly_x, fly_y, hover, each of shape (N,) (int)'''
+def flight_plan(positions, params=None):
+    positions=np.asarray(positions, dtype=float).reshape(-1, 3)
+    v=parameters(params)['v']
+    e_hover, t_h=hover_time(positions, params=params)
+    return { 'lift': np.rint(positions[:, 2]/v).astype(int),
+             'fly_x': np.rint(positions[:, 0]/v).astype(int),
+             'fly_y': np.rint(positions[:, 1]/v).astype(int),
+             'hover': np.rint(t_h/TIME_SCALE).astype(int) }
@@ -16,12 +16,19 @@
                                                           --manual is not specified, auto-association of drones to APs is enabled
                                      [--arp] Optional: pre-computes ARP tables statically in all endpoints and drones
                                      [--set_params] Optional: set tx power, antenna gain, and supported data rate in drones and APs
-                                     [--endpoint1/--endpoint2/--endpoint3/--endpoint4] Optional: receive video streams only on a specific endpoints. If an
-                                                                                                 endpoint is not specified, video streams will be received
-                                                                                                 on all endpoints at the same time
-                                     [--drone1/--drone2/--drone3/--drone4] Optional: stream video only from a specific drone. If a drone is not specified, video
-                                                                                     streams will be transmitted from all drones at the same time
-                                     [--test] Optional: generate congestion on first WiFi Channel to test streaming adaptability"""
+                                     [--endpoint1/--endpoint2/...] Optional: receive video streams only on a specific endpoints. If an
+                                                                   endpoint is not specified, video streams will be received
+                                                                   on all endpoints at the same time
+                                     [--drone1/--drone2/...] Optional: stream video only from a specific drone. If a drone is not specified, video
+                                                             streams will be transmitted from all drones at the same time
+                                     [--test] Optional: generate congestion on first WiFi Channel to test streaming adaptability
+                                     [--spawn] Optional: spawn a SendPosition.py process for every notification instead of feeding a persistent
+                                                         NotificationAgent.py process started once on each drone
+                                     [--no_qos] Optional: do not configure the egress queues of subscriber policies on APs' Ethernet ports (streams are
+                                                        then sent to the default queue)
+                                     [--topology=<file>] Optional: network description generated by Topology.py (default: Topology.DEFAULT_PATH, or the
+                                                                   original 8 drones / 4 APs network if it does not exist). The controller loads
+                                                                   the same description at start-up"""
 
 #################################################################################################################Imports
 from mn_wifi.net import Mininet_wifi
@@ -44,14 +51,22 @@ import time
 from datetime import datetime as dt
 import socket
 import json
+import asyncio
+import numpy as np
+
+import EnergyModel #fleet energy model (shared with DroneController.py)
+import Trajectory #drones mobility patterns
+import Topology #parametric network description (shared with DroneController.py)
+from LinkStats import LinkStats #bulk interface counters through rtnetlink
+from StationInfo import StationInfo #wireless link state of drones through nl80211
 
 ############################################################################################Network Deployment Functions
-'''Creates a Mininet_wifi object.
+'''Creates a Mininet_wifi object from the topology description (Topology.py).
    Deploys drones (Station objects), APs (AccessPoint objects), and endpoints (Host objects).
-   Establishes AP-endpoint links and defines WiFi channel features
+   Establishes AP-endpoint links and backbone links, and defines WiFi channel features
    @param str[] args'''
 def topology(args):
-    global net
+    global net, topo
 
     net=Mininet_wifi(topo=None, build=False,
                      controller=RemoteController,
@@ -60,7 +75,7 @@ def topology(args):
                      ac_method='ssf', #drone<->AP association control: strongest signal first
                      autoAssociation=True, allAutoAssociation=True, #if True, Mininet WiFi automatically handles drone<->AP association
                      mode="a", freq=5,
-                     ipBase="192.168.1.0/24")
+                     ipBase=f"{Topology.SUBNET}.0/24")
 
     net.client_isolation=True #drones cannot communicate without an explicit OpenFlow rule, even if associated to the same AP
 
@@ -74,108 +89,67 @@ def topology(args):
     info("************Creating Network Nodes**********\n")
 
     drones=[] #list of all drones in the network
-    for i in range(1, 9):
-        drones.append(net.addStation(name=f'drone{i}', ip=f'192.168.1.{i}/24',
+    for i, (name, drone) in enumerate(topo['drones'].items()):
+        drones.append(net.addStation(name=name, ip=f"{drone['ip']}/24",
                                      speed=1, #for drones mobility (must be an integer)
                                      position='0,0,0'))
 
         if '--bgscan' in args: #configure background scan on drones
-            drones[i-1].params['bgscan_threshold']=-65 #watch out for this value (must not be greater than the received RSSI)
-            drones[i-1].params['s_interval']=10
-            drones[i-1].params['l_interval']=30
-            drones[i-1].params['bgscan_module']='simple'
+            drones[i].params['bgscan_threshold']=-65 #watch out for this value (must not be greater than the received RSSI)
+            drones[i].params['s_interval']=10
+            drones[i].params['l_interval']=30
+            drones[i].params['bgscan_module']='simple'
 
+    trouble=topo['trouble'] #trouble-maker nodes
     if '--test' in args:
-        net.addStation(name=f'station1', ip=f'192.168.1.21/24', position=f'4,4,0')
+        net.addStation(name=trouble['station']['name'], ip=f"{trouble['station']['ip']}/24", position=f'4,4,0')
 
-    endpoints=[] #list of all client endpoints in the network
-    for i in range(9, 13):
-        endpoints.append(net.addHost(name=f'endpoint{i-9+1}', mac=f"00:00:00:00:00:{i:02x}", ip=f'192.168.1.{i}/24'))
+    endpoints={} #dictionary <endpoint name, Host> of all client endpoints in the network
+    for name, endpoint in topo['endpoints'].items():
+        endpoints[name]=net.addHost(name=name, mac=endpoint['mac'], ip=f"{endpoint['ip']}/24")
 
     if '--test' in args:
-        host2=net.addHost(name='host2', ip=f'192.168.1.22/24')
-
-    #adding 4 APs
-    if '--bgscan' not in args:
-        ap1=net.addAccessPoint(name='ap1', dpid=f"{13:016x}", ssid='ssid-ap1',
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6654,
-                               channel='36',
-                               position='0,0,0') #bottom-left corner AP
-        ap2=net.addAccessPoint(name='ap2', dpid=f"{14:016x}", ssid='ssid-ap2',
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6655,
-                               channel='40',
-                               position='105,0,0') #bottom-right corner AP
-        ap3=net.addAccessPoint(name='ap3', dpid=f"{15:016x}", ssid='ssid-ap3',
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6656,
-                               channel='44',
-                               position='105,68,0') #top-right corner AP
-        ap4=net.addAccessPoint(name='ap4', dpid=f"{16:016x}", ssid='ssid-ap4',
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6657,
-                               channel='48',
-                               position='0,68,0') #top-left corner AP
-    else:
-        ap1=net.addAccessPoint(name='ap1', dpid=f"{13:016x}",
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6654,
-                               channel='36',
-                               position='0,0,0') #bottom-left corner AP
-        ap2=net.addAccessPoint(name='ap2', dpid=f"{14:016x}",
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6655,
-                               channel='40',
-                               position='105,0,0') #bottom-right corner AP
-        ap3=net.addAccessPoint(name='ap3', dpid=f"{15:016x}",
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6656,
-                               channel='44',
-                               position='105,68,0') #top-right corner AP
-        ap4=net.addAccessPoint(name='ap4', dpid=f"{16:016x}",
-                               cls=OVSKernelAP, protocols='OpenFlow13', listenPort=6657,
-                               channel='48',
-                               position='0,68,0') #top-left corner AP
+        host2=net.addHost(name=trouble['host']['name'], ip=f"{trouble['host']['ip']}/24")
+
+    aps={} #dictionary <AP name, AccessPoint> (grid of APs covering the field)
+    for name, ap in topo['aps'].items():
+        ssid={} if '--bgscan' in args else {'ssid': f'ssid-{name}'} #with background scanning, APs share the network SSID
+        aps[name]=net.addAccessPoint(name=name, dpid=f"{ap['dpid']:016x}",
+                                     cls=OVSKernelAP, protocols='OpenFlow13', listenPort=ap['listen_port'],
+                                     channel=str(ap['channel']),
+                                     position=','.join(f'{c:g}' for c in ap['position']), **ssid)
 
     info(f"\n**********Wifi Configuration**********\n")
     net.setPropagationModel(model="logDistance", exp=2.5) ##############################################################
     net.configureWifiNodes() #create and configure L2 wireless interfaces on drones and APs
 
     #establishing Ethernet connections between APs and endpoints (must follow the call to configureWifiNodes to ensure consistent interface naming)
-    net.addLink(node1=ap1, node2=endpoints[0], port1=2, port2=1, cls=TCLink, bw=1000)
-    net.addLink(node1=ap2, node2=endpoints[1], port1=2, port2=1, cls=TCLink, bw=1000)
-    net.addLink(node1=ap3, node2=endpoints[2], port1=2, port2=1, cls=TCLink, bw=1000)
-    net.addLink(node1=ap4, node2=endpoints[3], port1=2, port2=1, cls=TCLink, bw=1000)
+    for name, endpoint in topo['endpoints'].items():
+        net.addLink(node1=aps[endpoint['ap']], node2=endpoints[name], port1=2, port2=1, cls=TCLink, bw=Topology.LINK_BW)
 
     #establishing backbone Ethernet connections between APs, forming a mesh pattern
-    net.addLink(node1=ap1, node2=ap2, port1=3, port2=3, cls=TCLink, bw=1000)
-    net.addLink(node1=ap1, node2=ap3, port1=4, port2=3, cls=TCLink, bw=1000)
-    net.addLink(node1=ap1, node2=ap4, port1=5, port2=3, cls=TCLink, bw=1000)
-
-    net.addLink(node1=ap2, node2=ap3, port1=4, port2=4, cls=TCLink, bw=1000)
-    net.addLink(node1=ap2, node2=ap4, port1=5, port2=4, cls=TCLink, bw=1000)
-
-    net.addLink(node1=ap3, node2=ap4, port1=5, port2=5, cls=TCLink, bw=1000)
+    for ap1, port1, ap2, port2 in topo['links']:
+        net.addLink(node1=aps[ap1], node2=aps[ap2], port1=port1, port2=port2, cls=TCLink, bw=Topology.LINK_BW)
 
     if '--test' in args:
-        net.addLink(node1=net.getNodeByName('ap1'), node2=host2, port1=6, port2=1, cls=TCLink, bw=1000)
+        net.addLink(node1=aps[trouble['host']['ap']], node2=host2, port1=Topology.port_number(trouble['host']['port']), port2=1, cls=TCLink, bw=Topology.LINK_BW)
 
     if '--plot' in args:
-        net.plotGraph(min_x=0, min_y=0, max_x=110, max_y=110) #visual representation of drones fleet and APs on a 2D space
+        size=max(topo['field'])+5
+        net.plotGraph(min_x=0, min_y=0, max_x=size, max_y=size) #visual representation of drones fleet and APs on a 2D space
 
 '''Manually associate drones to APs using setAssociation function'''''
 def drone_association():
-    global net
+    global net, topo
 
     print("\n")
     print("**********Associating Drones and APs**********\n")
 
     for drone in net.stations: #Force specific wireless associations between drones and APs
-        if drone.name=='drone1' or drone.name=='drone5' or drone.name=='station1':
-            ap=net.getNodeByName('ap1')
-
-        elif drone.name=='drone2' or drone.name=='drone6':
-            ap=net.getNodeByName('ap2')
-
-        elif drone.name=='drone3' or drone.name=='drone7':
-            ap=net.getNodeByName('ap3')
-
-        else: #drone4 and drone8
-            ap=net.getNodeByName('ap4')
+        if drone.name==topo['trouble']['station']['name']:
+            ap=net.getNodeByName(topo['trouble']['station']['ap'])
+        else: #each drone associates with the AP of its cell
+            ap=net.getNodeByName(topo['drones'][drone.name]['ap'])
 
         print(f"Drone {drone.name}, {drone} associating with {ap.name}, {ap}\n")
         drone.setAssociation(ap)
@@ -221,10 +195,31 @@ def set_params():
         ap.params['txrate']='54Mbps'
         #ap.cmd(f'iw dev {intf_name} set bitrates legacy-5 48 54')
 
+'''Configuring the egress queues of subscriber policies on APs' Ethernet ports: every port leading to an endpoint gets an HTB QoS (replacing the
+   TCLink shaping, with the same link rate) with the default queue 0 and the endpoint's queue, which guarantees its min_rate and caps it to its
+   max_rate with its priority. The controller sends each endpoint's streams to its queue (OFPActionSetQueue in group buckets)'''
+def configure_qos():
+    global net, topo
+
+    info(f"\n**********Configuring QoS Queues**********\n")
+    link_rate=Topology.LINK_BW*1000000 #[bit/s]
+
+    for ap_name in topo['aps']:
+        ap=net.getNodeByName(ap_name)
+        for port, endpoint in Topology.port_endpoints(topo, ap_name).items():
+            policy=topo['policies'][endpoint]
+            queue=policy['queue']
+            max_rate=policy['max_rate']*1000 if policy['max_rate']>0 else link_rate #[bit/s]
+            ap.cmd(f"ovs-vsctl -- set port {port} qos=@qos -- --id=@qos create qos type=linux-htb other-config:max-rate={link_rate} "
+                   f"queues:0=@q0 queues:{queue}=@q{queue} -- --id=@q0 create queue other-config:max-rate={link_rate} "
+                   f"-- --id=@q{queue} create queue other-config:min-rate={int(policy['min_rate']*1000)} other-config:max-rate={int(max_rate)} "
+                   f"other-config:priority={policy['priority']}")
+            print(f"{port}: queue {queue} for {endpoint} ({policy['tier']}, priority {policy['priority']})")
+
 ########################################################################Network Mobility and Energy Management Functions
 '''Handles all movements of drones'''
 def mobility():
-    global net
+    global net, topo
 
     print("\n**********Deploying drones fleet**********\n")
 
@@ -232,245 +227,253 @@ def mobility():
 
     path='/home/francesco2/Documenti/PycharmProjects/Smart2/Mobility Traces/' #path containing the mobility patterns (sequence of positions in time) of drones
 
-    get_trace(net.getNodeByName('drone1'), '{}pos1.dat'.format(path)) #each mobility pattern is a .dat file
-    get_trace(net.getNodeByName('drone2'), '{}pos2.dat'.format(path))
-    get_trace(net.getNodeByName('drone3'), '{}pos3.dat'.format(path))
-    get_trace(net.getNodeByName('drone4'), '{}pos4.dat'.format(path))
-    get_trace(net.getNodeByName('drone5'), '{}pos5.dat'.format(path))
-    get_trace(net.getNodeByName('drone6'), '{}pos6.dat'.format(path))
-    get_trace(net.getNodeByName('drone7'), '{}pos7.dat'.format(path))
-    get_trace(net.getNodeByName('drone8'), '{}pos8.dat'.format(path))
+    for drone_name in topo['drones']:
+        get_trace(net.getNodeByName(drone_name), f'{path}pos{drone_name[5:]}') #each mobility pattern is a .npy file (or a .dat file)
 
-'''Given a drone (Station object) and the path of the .dat file containing its mobility pattern, it extracts the sequence of positions and assigns it to an
+'''Given a drone (Station object) and the path of the file containing its mobility pattern, it memory-maps the sequence of positions and assigns it to
    an attribute p of the Station object
    @param Station drone
-   @param str file_'''
+   @param str file_ (path without extension: .npy file is used if available, .dat file otherwise)'''
 def get_trace(drone, file_):
-    file_=open(file_, 'r') #open .dat file
-    raw_data=file_.readlines() #extract mobility pattern line by line
-    file_.close()
-
-    drone.p=[] #initialize attribute p (list of positions)
+    drone.p=Trajectory.load_trajectory(file_) #initialize attribute p (sequence of positions)
     pos=(-1000, 0, 0)
     drone.position=pos #initialize position attribute of drone
 
-    for data in raw_data: #for each line
-        line=data.split()
-
-        x=line[0] #First Column (X coordinate)
-        y=line[1] #Second Column (Y coordinate)
-        z=line[2] #Third Column (Z coordinate)
-        pos=float(x), float(y), float(z) #create position as 3-tuple (float, float, float)
-        drone.p.append(pos) #save position into list
-
 '''This function defines a mobility pattern (sequence of position occupied in time) for each drone of the fleet, according to a pre-determined energy model
+   (EnergyModel.py, evaluated on the whole fleet at once)
    @param <str: tuple> positions'''
 def energy_model(positions):
-    ###################################################################################################Drones parameters
-    #consdering drone DJI Mavic 3E
-    capacity=5000 #Battery capacity [mAh]
-    voltage=15.4 #Battery voltage [V]
-    gravity=9.8 #Gravitational acceleration [m/s^2]
-
-    e_battery=capacity*voltage*3.6 #Full-battery energy [J]
-
-    m1=1 #Drone body mass [kg]
-    m2=0.3 #Drone battery mass [kg]
-    m3=0.1 #Drone camera mass [kg]
-    m=m1+m2+m3 #[kg]
-
-    lift_to_drag=2.5 #Lift-to-drag ratio: typical range of aerodynamic efficiency for multi-rotor drones is 1-3
-    efficiency=0.5 #Rotors efficiency: typical range is 0.2-0.7
-
-    p_avio=10 #Power needed for avionics operations (on-board computations, communications, video-recording, gps, etc) [W]: 5-25 [W] of typical range
-    v=5 #Drone's speed relative to the wind [m/s]: 5-15 [m/s] is a typical speed range for video drones
-    phi=0.3 #windspeed-to-dronespeed ratio: typical range 0-0.6
+    drones=list(positions.keys())
+    hover=np.array([positions[drone] for drone in drones], dtype=float) #(N, 3) hovering positions
 
-    n=4 #number of rotors
-    s=0.073 #rotor's area [m^2]: 0.049-0.113 [m^2] is a typical range for quad-rotor drones
-    ro=1.152062 #air density in Cosenza
-    drag_coeff=1.3 #vertical drag coefficient: 1-1.5 is a typical range for quad-rotor drones
+    e_battery=EnergyModel.battery_energy() #Full-battery energy [J]
+    e=EnergyModel.segment_energies(hover) #energy of each movement of each drone [J]
+    e_hover, t_h=EnergyModel.hover_time(hover) #maximum energy available for hovering [J], maximum hovering time [s]
+    plan=EnergyModel.flight_plan(hover) #duration of each movement of each drone [s]
 
-    ########################################################################################################Computations
-    for drone in positions.keys():
+    for i, drone in enumerate(drones):
+        distance1, distance2, height=positions[drone] #[m] Along X-axis, Y-axis, Z-axis
         print(f"Drone {drone}, target hovering position: {positions[drone]}, available energy: {e_battery} [J]")
-
-        #First movement: vertical lift (along Z-axis). Assumptions: constant speed, thrust == weight + drag, zero lift
-        height=positions[drone][2] #[m] Along Z-Axis
-        e_lift= ( ( (m*gravity) + ( n*ro*s*drag_coeff*(v**2) )/2 ) * (v/efficiency) + p_avio ) * (height/v) #[J] energy for first movement
-        print(f"    '---> {drone} first movement: (0,0,0) -> (0,0,{height}). Consumed energy: {e_lift} [J]")
-
-        #Second movement: horizontal flight along X-axis. Assumptions: constant speed, thrust == drag, weight == lift
-        distance1=positions[drone][0] #[m] Along X-axis
-        e_fly1=( ( (m*gravity) / (efficiency*lift_to_drag) ) + (p_avio/ (v/(1-phi)) ) ) * (distance1 / (1-phi) ) #[J] energy for second movement
-        print(f"    '---> {drone} second movement: (0,0,{height}) -> ({distance1},0,{height}). Consumed energy: {e_fly1} [J]")
-
-        #Third movement: horizontal flight along Y-axis. Assumptions: constant speed, thrust == drag, weight == lift
-        distance2=positions[drone][1] #[m] Along Y-axis
-        e_fly2=( ( (m*gravity) / (efficiency*lift_to_drag) ) + (p_avio/ (v/(1-phi)) ) ) * (distance2 / (1 - phi)) #[J] energy for third movement
-        print(f"    '---> {drone} third movement: ({distance1},0,{height}) -> ({distance1},{distance2},{height}). Consumed energy: {e_fly2} [J]")
-
-        #Fourth movement: like third
-        e_fly3=e_fly2 #[J] energy for fourth movement
-        print(f"    '---> {drone} fourth movement (after hovering): ({distance1},{distance2},{height}) -> ({distance1},0,{height}). Consumed energy: {e_fly3} [J]")
-
-        #Fifth movement: like second
-        e_fly4=e_fly1 #[J] energy for fifth movement
-        print(f"    '---> {drone} fifth movement (after hovering): ({distance1},0,{height}) -> (0,0,{height}). Consumed energy: {e_fly4} [J]")
-
-        #Last movement: vertical drop (along Z-axis). Assumptions: constant speed, thrust + drag == weight, zero lift
-        e_drop=( ( (m*gravity) + ( n*ro*s*drag_coeff*(v**2) ) /2 ) * (v/efficiency) + p_avio ) * (height/v) #[J] energy for first movement
-        print(f"    '---> {drone} sixth movement (after hovering): (0,0,{height}) -> (0,0,0). Consumed energy: {e_drop} [J]")
-
-        #Hovering at fixed altitude. Assumptions: zero speed, thrust == weight, zero drag, zero lift
-        e_hover=e_battery-e_lift-e_fly1-e_fly2-e_fly3-e_fly4-e_drop #[J] maximum energy available for hovering
-        t_h=e_hover / ( ( (m*gravity)**(3/2) / (2*n*ro*s)**(1/2) ) + p_avio ) #[s] maximum hovering time
-        print(f"    '---> {drone} maximum available hovering energy: {e_hover} [J]. Maximum hovering time: {t_h} [s]")
-
-        total_time=round(height/v)+round(distance1/v)+round(distance2/v)+round(t_h/20)+round(distance1/v)+round(distance2/v)+round(height/v) #total flight time [s]
-        print(f"    '---> {round(height/v)}+{round(distance1/v)}+{round(distance2/v)}+{round(t_h/20)}+{round(distance2/v)}+{round(distance1/v)}"
-              f"+{round(height/v)} [s]. Total = {total_time} [s]\n")
-
-        write_dat(drone, height, distance1, distance2, v, round(t_h/20)) #compute mobility pattern according to energy consumption model
-
-'''Write the .dat file with the mobility pattern for a given drone (it contains the series of positions occupied by the drone during the simulation).
+        print(f"    '---> {drone} first movement: (0,0,0) -> (0,0,{height}). Consumed energy: {e['lift'][i]} [J]")
+        print(f"    '---> {drone} second movement: (0,0,{height}) -> ({distance1},0,{height}). Consumed energy: {e['fly_x'][i]} [J]")
+        print(f"    '---> {drone} third movement: ({distance1},0,{height}) -> ({distance1},{distance2},{height}). Consumed energy: {e['fly_y'][i]} [J]")
+        print(f"    '---> {drone} fourth movement (after hovering): ({distance1},{distance2},{height}) -> ({distance1},0,{height}). Consumed energy: {e['fly_y_back'][i]} [J]")
+        print(f"    '---> {drone} fifth movement (after hovering): ({distance1},0,{height}) -> (0,0,{height}). Consumed energy: {e['fly_x_back'][i]} [J]")
+        print(f"    '---> {drone} sixth movement (after hovering): (0,0,{height}) -> (0,0,0). Consumed energy: {e['drop'][i]} [J]")
+        print(f"    '---> {drone} maximum available hovering energy: {e_hover[i]} [J]. Maximum hovering time: {t_h[i]} [s]")
+
+        lift, fly_x, fly_y, t_hover=plan['lift'][i], plan['fly_x'][i], plan['fly_y'][i], plan['hover'][i]
+        total_time=lift+fly_x+fly_y+t_hover+fly_x+fly_y+lift #total flight time [s]
+        print(f"    '---> {lift}+{fly_x}+{fly_y}+{t_hover}+{fly_y}+{fly_x}+{lift} [s]. Total = {total_time} [s]\n")
+
+        write_trace(drone, height, distance1, distance2, float(EnergyModel.DEFAULT_PARAMS['v']), int(t_hover)) #compute mobility pattern according to energy consumption model
+
+'''Write the mobility pattern for a given drone (the series of positions occupied by the drone during the simulation) as binary .npy file, exported
+   also as .dat file
    @param str drone
    @param int height
    @param int distance_x
    @param int distance_y
    @param float v
    @param int t_h'''
-def write_dat(drone, height, distance_x, distance_y, v, t_h):
-    numb=int(re.search(r'\d+', drone).group()) #extract drone number
-    dat_name=f"pos{numb}.dat"
-    path='/home/francesco2/Documenti/PycharmProjects/Smart2/Mobility Traces/'+f'{dat_name}'
-    print(f"{drone} - Mobility Pattern in {path}")
-
-    with open(path, "w") as log_file:
-        log_file.write(f"0 0 0\n") #write first position into .dat file
-
-    lift_time=round(height/v) #[s] time required to reach the height (it must be an integer number of seconds)
-    step=height/lift_time #[m] distance covered in each second of movement
-    lift_pos=[] #intermediate positions during lift
-    for i in range(1, lift_time+1): #for the time required to lift to height
-        lift_pos.append(0+i*step) #each second corresponds to an occupied position
-
-    fly_x_time=round(distance_x/v) #[s] time required to reach the X position (it must be an integer number of seconds)
-    step=distance_x/fly_x_time #[m] distance covered in each second of movement
-    x_pos=[] #intermediate positions during horizontal flight along X axis
-    for i in range(1, fly_x_time+1): #for the time required to reach X position
-        x_pos.append(0+i*step) #each second corresponds to an occupied position
-
-    fly_y_time=round(distance_y/v) #[s] time required to reach the Y position (it must be an integer number of seconds)
-    step=distance_y/fly_y_time #[m] distance covered in each second of movement
-    y_pos=[] #intermediate positions during horizontal flight along Y axis
-    for i in range(1, fly_y_time+1): #for the time required to reach Y position
-        y_pos.append(0+i*step) #each second corresponds to an occupied position
-
-    y_pos_inv=y_pos[-2::-1] #retracing steps to come back to Y=0
-    y_pos_inv.append(0)
-
-    x_pos_inv=x_pos[-2::-1] #retracing steps to come back to X=0
-    x_pos_inv.append(0)
-
-    drop_pos=lift_pos[-2::-1] #retracing steps to come back to Z=0
-    drop_pos.append(0)
+def write_trace(drone, height, distance_x, distance_y, v, t_h):
+    global topo
 
-    print(f"    '---> {lift_pos}")
-    print(f"    '---> {drop_pos}")
-    print(f"    '---> {x_pos}")
-    print(f"    '---> {x_pos_inv}")
-    print(f"    '---> {y_pos}")
-    print(f"    '---> {y_pos_inv}\n")
-
-    with open(path, "w") as log_file:
-        if numb in range(1, 5): #for drones 1 to 4 (immediately deployed)
-            for p in lift_pos:
-                log_file.write(f"0 0 {p}\n") #write lifting positions
-
-            for p in x_pos:
-                log_file.write(f"{p} 0 {height}\n") #write flight positions along X axis
-
-            for p in y_pos:
-                log_file.write(f"{distance_x} {p} {height}\n") #write flight positions along Y axis
-
-            for t in range(t_h):
-                log_file.write(f"{distance_x} {distance_y} {height}\n") #repeat hovering position for hovering time
-
-            for p in y_pos_inv:
-                log_file.write(f"{distance_x} {p} {height}\n") #write backward flight positions along Y axis
-
-            for p in x_pos_inv:
-                log_file.write(f"{p} 0 {height}\n") #write backward flight positions along X axis
-
-            for p in drop_pos:
-                log_file.write(f"0 0 {p}\n") #write descend positions
-
-        else: #for drones 5 to 8 (spare drones)
-            for t in range(t_h):
-                log_file.write(f"0 0 0\n") #stay at supply station for hovering time
-
-            for p in lift_pos:
-                log_file.write(f"0 0 {p}\n") #write lifting positions
+    numb=int(re.search(r'\d+', drone).group()) #extract drone number
+    path='/home/francesco2/Documenti/PycharmProjects/Smart2/Mobility Traces/'+f'pos{numb}'
+    print(f"{drone} - Mobility Pattern in {path}.npy")
 
-            for p in x_pos:
-                log_file.write(f"{p} 0 {height}\n") #write flight positions along X axis
+    wave=topo['drones'][drone]['wave'] #drones of the first wave are deployed, the following waves replace them one after the other
+    waves=len(topo['aps'][topo['drones'][drone]['ap']]['drones'])
+    trajectory=Trajectory.build_trajectory(height, distance_x, distance_y, v, t_h, spare=0<wave==waves-1, wait=wave*t_h) #last wave keeps hovering
+    print(f"    '---> {len(trajectory)} positions, from {tuple(trajectory[0])} to {tuple(trajectory[-1])}\n")
 
-            for p in y_pos:
-                log_file.write(f"{distance_x} {p} {height}\n") #write flight positions along Y axis
+    Trajectory.save_trajectory(path, trajectory, dat=True) #.dat file is kept for compatibility
 
-'''Thread target function. Server Socket listening for mobility commands from the controller'''
+'''Thread target function. Runs the asyncio event loop of the command server until stop_server() is called'''
 def start_server():
-    global net, HOST, PORT, log_path, stop_event
+    global server_loop, server_shutdown
 
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_sock:
-        server_sock.bind((HOST, PORT))
-        server_sock.listen() #open server socket
-
-        with open(log_path, "w") as log_file:
-            log_file.write(f"{dt.now()} -> [READY] Server listening on {HOST}:{PORT}...\n")
-            log_file.write(f"\n")
-
-        while not stop_event.is_set(): #for the whole simulation (while True)
-            conn, addr=server_sock.accept() #wait for incoming connections
-
-            with conn: #if connection is established
-                with open(log_path, "a") as log_file:
-                    log_file.write(f"{dt.now()} -> [CONNECTED] Connection from {addr}\n")
-
-                    data=conn.recv(1024)
-                    if data: #if data is received
-                        command=data.decode() #obtain command from received data
-                        jcommand=json.loads(command) #convert received command in json format
-
-                        log_file.write(f"   '---> Received command: {command}\n")
-                        log_file.write(f"   '---> Drone: {jcommand['Drone']}\n")
-                        log_file.write(f"   '---> Action: {jcommand['Action']}\n")
-                        log_file.write(f"   '---> Start Position: {jcommand['Start Position']}\n")
-                        log_file.write(f"   '---> Final Position: {jcommand['Final Position']}\n")
-                        log_file.write(f"\n")
+    server_loop=asyncio.new_event_loop()
+    asyncio.set_event_loop(server_loop)
+    server_shutdown=asyncio.Event() #set (from the main thread, through the event loop) when the CLI exits
+    try:
+        server_loop.run_until_complete(command_server())
+    finally:
+        server_loop.close()
+
+'''Signals the command server to shut down (it can be called from any thread)'''
+def stop_server():
+    global server_loop, server_shutdown
+
+    if server_loop is not None and not server_loop.is_closed():
+        server_loop.call_soon_threadsafe(server_shutdown.set)
+
+'''Coroutine. Server socket listening for mobility commands from the controller. Each connection is persistent and served by its own coroutine: the
+   controller sends newline-delimited JSON messages, each carrying an id and a batch of commands, and receives an ACK line for each of them'''
+async def command_server():
+    global HOST, PORT, log_path, server_shutdown, command_latency
+
+    sessions={} #dictionary <str, set> associating each command channel session to the ids of its messages already handled (messages re-sent
+                #after a reconnection are only acknowledged)
+    clients={} #dictionary <Task, StreamWriter> of tasks serving connected clients
+
+    with open(log_path, "a") as log_file: #commands of previous simulations are kept
+        server=await asyncio.start_server(lambda reader, writer: serve_client(reader, writer, sessions, clients, log_file),
+                                          HOST, PORT, reuse_address=True)
+        log_file.write(f"{dt.now()} -> [READY] Server listening on {HOST}:{PORT}...\n")
+        log_file.write(f"\n")
+        log_file.flush()
+
+        async with server:
+            await server_shutdown.wait() #serve clients until the CLI exits
+            server.close() #stop accepting connections
+
+            for writer in list(clients.values()): #close connections still open (their tasks read EOF and terminate)
+                writer.close()
+            await asyncio.gather(*clients.keys(), return_exceptions=True)
+
+        handled=sum(count for latency, count in command_latency)
+        total=sum(latency for latency, count in command_latency)
+        log_file.write(f"{dt.now()} -> [CLOSED] Server stopped. {len(command_latency)} messages, {handled} commands, "
+                       f"handling latency {total/max(handled, 1)*1e6:.0f} [us] per command\n\n")
+
+'''Coroutine. Serves a connection from the controller, acknowledging each message as soon as it has been handled. Messages are newline-delimited;
+   a complete JSON object left without newline for legacy_timeout is a legacy single command, whose client is waiting for its ACK
+   @param StreamReader reader
+   @param StreamWriter writer
+   @param <str, set> sessions (ids of messages already handled in each session)
+   @param <Task, StreamWriter> clients
+   @param file log_file'''
+async def serve_client(reader, writer, sessions, clients, log_file):
+    global legacy_timeout
+
+    addr=writer.get_extra_info('peername')
+    clients[asyncio.current_task()]=writer
+    log_file.write(f"{dt.now()} -> [CONNECTED] Connection from {addr}\n")
+
+    connection_ids=set() #ids of messages without session already handled on this connection
+    buffer=b'' #received bytes not yet handled
+    try:
+        while True:
+            try:
+                data=await asyncio.wait_for(reader.read(4096), legacy_timeout if buffer else None) #wait for the rest of a partial message
+            except asyncio.TimeoutError:
+                if is_message(buffer): #legacy client: a single JSON command without newline, waiting for the ACK
+                    await answer(buffer, writer, sessions, connection_ids, log_file)
+                    buffer=b''
+                continue
 
-                    conn.sendall(b"ACK") #send ACK to signal correct command reception
+            if not data: #connection closed by the controller
+                break
+            buffer+=data
+            while b'\n' in buffer:
+                line, buffer=buffer.split(b'\n', 1)
+                if line.strip():
+                    await answer(line, writer, sessions, connection_ids, log_file)
+
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        log_file.write(f"{dt.now()} -> [ERROR] Connection from {addr}: {e}\n")
+
+    finally:
+        clients.pop(asyncio.current_task(), None)
+        writer.close()
+        log_file.write(f"{dt.now()} -> [DISCONNECTED] {addr}\n\n")
+        log_file.flush()
+
+'''Coroutine. Handles a message and sends its ACK
+   @param bytes line (message)
+   @param StreamWriter writer
+   @param <str, set> sessions
+   @param set connection_ids (ids of messages without session already handled on the connection)
+   @param file log_file'''
+async def answer(line, writer, sessions, connection_ids, log_file):
+    global command_latency
+
+    start=time.perf_counter()
+    ack, count=handle_message(line.strip(), sessions, connection_ids, log_file)
+    command_latency.append((time.perf_counter()-start, count))
+    writer.write(ack) #send ACK to signal correct command reception
+    await writer.drain()
+    log_file.flush()
+
+'''Returns True if bytes received without newline are a whole JSON object (a legacy single command)
+   @param bytes data
+   @return bool'''
+def is_message(data):
+    try:
+        return isinstance(json.loads(data.decode()), dict)
+    except ValueError:
+        return False
+
+'''Parses a message received from the controller, logs its commands, and returns the corresponding ACK
+   @param bytes data (JSON message: {"session": str, "id": int, "commands": [...]}, or a single command)
+   @param <str, set> sessions (ids of messages already handled in each session)
+   @param set connection_ids (ids of messages without session already handled on the connection)
+   @param file log_file
+   @return (bytes ack, int number of commands)'''
+def handle_message(data, sessions, connection_ids, log_file):
+    try:
+        message=json.loads(data.decode()) #convert received message in json format
+    except ValueError as e:
+        log_file.write(f"{dt.now()} -> [ERROR] Malformed message {data}: {e}\n")
+        return b'{"id": null, "ack": "NACK"}\n', 0
+
+    if 'id' not in message: #legacy message: a single command, acknowledged with a plain ACK
+        log_command(message, log_file)
+        return b"ACK", 1
+
+    commands=message.get('commands', [])
+    if 'session' in message:
+        handled_ids=sessions.setdefault(message['session'], set()) #ids restart at 1 in every session (controller restart)
+    else:
+        handled_ids=connection_ids #ids without session are only unique within a connection
+    if message['id'] not in handled_ids: #messages re-sent after a reconnection are not handled twice
+        handled_ids.add(message['id'])
+        log_file.write(f"{dt.now()} -> Received message {message['id']} ({len(commands)} commands)\n")
+        for command in commands:
+            log_command(command, log_file)
+
+    return (json.dumps({'id': message['id'], 'ack': 'ACK', 'count': len(commands)})+'\n').encode(), len(commands)
+
+'''Logs a mobility command received from the controller
+   @param dict command
+   @param file log_file'''
+def log_command(command, log_file):
+    log_file.write(f"   '---> Received command: {json.dumps(command)}\n")
+    log_file.write(f"   '---> Drone: {command.get('Drone')}\n")
+    log_file.write(f"   '---> Action: {command.get('Action')}\n")
+    log_file.write(f"   '---> Start Position: {command.get('Start Position')}\n")
+    log_file.write(f"   '---> Final Position: {command.get('Final Position')}\n")
+    log_file.write(f"\n")
 
 #########################################################################################Network Transmissions Functions
 '''Thread target function. Given a source drone, it periodically sends a notification of its current position
    @param str drone_name
    @param str drone_ipv4
-   @param str broadcast_address'''
-def send_position(drone_name, drone_ipv4, broadcast_address):
-    global net, stop_event
+   @param str broadcast_address
+   @param str[] args'''
+def send_position(drone_name, drone_ipv4, broadcast_address, args):
+    global net, topo, stop_event, code_path, notify_copies, notify_latency, link_stats, station_info
 
     drone=net.getNodeByName(drone_name) #Mininet-emulated source Drone (Station reference)
+    notify_latency[drone_name]=[] #notification latencies [s] measured on the emulator side
+
+    agent=None #persistent notification agent (process running in the drone's namespace)
+    if '--spawn' not in args: #start notification agent once, it is fed with position/occupation updates through a pipe
+        with open(f'{code_path}logFiles/{drone_name}_notification.log', 'w') as log_file:
+            agent=drone.popen(['python3', f'{code_path}NotificationAgent.py', f'--drone={drone_name}', f'--src={drone_ipv4}',
+                               f'--dst={broadcast_address}', f'--copies={notify_copies}', f'--spawned={time.time()}'],
+                              stdin=subprocess.PIPE, stdout=log_file, stderr=subprocess.STDOUT, universal_newlines=True)
 
     time.sleep(20) #initial waiting time
 
     pos=','.join(map(str, drone.position)) #current drone position (converted from tuple to string)
     rx_bytes=0 #byte received on AP wlan interface
+    seq=0 #sequence number of notifications
 
     #print(f"Drone {drone_name} ({drone_ipv4}). Current position: {pos} {type(pos)}\n")
-    drone.popen(f'sudo python3 /home/francesco2/Documenti/PycharmProjects/Smart2/SendPosition.py '
-              f'--drone={drone_name} --src={drone_ipv4} --dst={broadcast_address} --pos={pos} ' #send notification
-              f'> /home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/{drone_name}_notification.log 2>&1 &', shell=True) #record notification on a log file
+    notify(drone, agent, drone_ipv4, broadcast_address, pos, 0.0, 0.0, seq) #send notification
 
     t=20 #[s] time interval in between position notification
 
@@ -482,53 +485,89 @@ def send_position(drone_name, drone_ipv4, broadcast_address):
         else:
             pos=','.join(map(str, drone.position)) #update current drone position (converted from tuple to string)
 
-            numb=int(drone_name[5]) #drone number
-            if numb<=4: #drone 1-4
-                ap_name=f'ap{numb}' #obtain AP name from drone's number
-            else: #drone 5-8
-                ap_name=f'ap{numb-4}' #obtain AP name from drone's number
+            ap_name=topo['drones'][drone_name]['ap'] #AP covering the drone's cell
 
-            with open(f'/sys/class/net/{ap_name}-wlan1/statistics/rx_bytes', 'r') as f:
-                cur_rx_bytes=int(f.read().strip()) #obtain count of received bytes of AP's wlan interface
-
-            proc=drone.popen(f'iw dev {drone_name}-wlan0 link', stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True) #read drone's WiFi stats
-            result_b, error_b=proc.communicate() #command output (bytes)
-            result=result_b.decode('utf-8') #command output (string)
+            cur_rx_bytes=link_stats.get(f'{ap_name}-wlan1', 'rx_bytes', max_age=1.0) #obtain count of received bytes of AP's wlan interface
+                                                                                    #(a dump younger than 1 s taken by another drone is reused)
+            if cur_rx_bytes is None:
+                print(f"[ERROR] Interface {ap_name}-wlan1 not found\n")
+                continue
 
-            match=re.search(r'tx bitrate:\s+([0-9.]+)\s+MBit/s', result) #search for current allowed transmission rate
             tx_bitrate=1
-            if match:
-                tx_bitrate=float(match.group(1)) #fetch tx rate
+            if station_info is not None: #link state of all drones from one nl80211 station dump per AP, shared by threads of the same cycle
+                station=station_info.get(topo['drones'][drone_name]['mac'], max_age=1.0)
+                if station is not None and station['rx_bitrate']:
+                    tx_bitrate=station['rx_bitrate'] #drone's tx bitrate is the AP's rx bitrate from the drone
+            else:
+                proc=drone.popen(f'iw dev {drone_name}-wlan0 link', stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True) #read drone's WiFi stats
+                result_b, error_b=proc.communicate() #command output (bytes)
+                result=result_b.decode('utf-8') #command output (string)
+
+                match=re.search(r'tx bitrate:\s+([0-9.]+)\s+MBit/s', result) #search for current allowed transmission rate
+                if match:
+                    tx_bitrate=float(match.group(1)) #fetch tx rate
 
             occupation=( ( (cur_rx_bytes-rx_bytes)*8 ) / (t* (10**6)) ) / tx_bitrate #compute channel bandwidth occupation from byte count and tx rate
 
             rx_bytes=cur_rx_bytes #update received bytes count
+            seq+=1 #next sequence number
 
             #print(f"Drone {drone_name} ({drone_ipv4}). Current position: {pos} {type(pos)}. Available bandwidth: {tx_bitrate}. Occupation: {occupation}\n")
-            drone.popen(f'sudo python3 /home/francesco2/Documenti/PycharmProjects/Smart2/SendPosition.py '
-                      f'--drone={drone_name} --src={drone_ipv4} --dst={broadcast_address} --pos={pos} --occ={occupation}' #send notification
-                      f'> /home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/{drone_name}_notification.log 2>&1 &', shell=True) #record notifications
+            notify(drone, agent, drone_ipv4, broadcast_address, pos, occupation, tx_bitrate, seq) #send notification
 
-'''Thread target function. Start/close video streaming from drones, also start/stop streaming reception on endpoints
+    if agent is not None:
+        agent.stdin.close() #agent terminates when its input is closed
+        agent.wait()
+
+'''Sends a position/occupation notification from a drone, either by feeding the drone's persistent notification agent or (with --spawn) by spawning
+   a SendPosition.py process. The time spent by the emulator to issue the notification is recorded in notify_latency
+   @param Station drone
+   @param Popen agent (None when spawning SendPosition.py)
+   @param str drone_ipv4
+   @param str broadcast_address
+   @param str pos (x,y,z)
+   @param float occupation
+   @param float tx_bitrate
+   @param int seq (sequence number, kept by the emulator so that it survives restarts of the agent)'''
+def notify(drone, agent, drone_ipv4, broadcast_address, pos, occupation, tx_bitrate, seq):
+    global code_path, notify_copies, notify_latency
+
+    start=time.perf_counter()
+    if agent is not None:
+        try:
+            agent.stdin.write(json.dumps({"pos": [float(c) for c in pos.split(',')], "occ": occupation, "rate": tx_bitrate,
+                                          "seq": seq})+'\n')
+            agent.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            print(f"[ERROR] Notification agent of {drone.name} not available: {e}")
+            return
+    else:
+        proc=drone.popen(f'sudo python3 {code_path}SendPosition.py '
+                         f'--drone={drone.name} --src={drone_ipv4} --dst={broadcast_address} --pos={pos} --occ={occupation} '
+                         f'--rate={tx_bitrate} --seq={seq} --copies={notify_copies}' #send notification
+                         f'>> {code_path}logFiles/{drone.name}_notification.log 2>&1', shell=True) #record notifications
+        proc.wait() #wait for the notification to be sent, to measure its latency
+    notify_latency[drone.name].append(time.perf_counter()-start)
+
+'''Thread target function. Start/close video streaming from drones (one stream per tier of the quality ladder), also start/stop streaming
+   reception on endpoints
    @param str drone_name
-   @param str videoH (high quality file video)
-   @param str videoL (low quality file video)
+   @param dict[] tiers (quality ladder: video file and L4 port of each tier)
    @param str broadcast_addr
-   @param int portH
-   @param int portL
    @param str[] args'''
-def send_video(drone_name, videoH, videoL, broadcast_addr, portH, portL, args):
-    global net, drone_positions, base_pos, rec_streams, stream_dst_port, stop_event
+def send_video(drone_name, tiers, broadcast_addr, args):
+    global net, topo, drone_positions, base_pos, rec_streams, stop_event
 
     drone=net.getNodeByName(drone_name) #Mininet-emulated source Drone (Station reference)
     pos=drone.position #current drone position (tuple)
 
-    procH=None #initialize process object
-    procL=None #initialize process object
+    stream=lambda tier: drone.popen(f"vlc-wrapper {tier['video']} --sout '#udp{{dst={broadcast_addr}:{tier['port']}}}' :no-sout-all :sout-keep",
+                                    shell=True) #stream video process of a tier
+
+    procs=[] #streaming processes (one per tier)
     if pos!=base_pos: #if the drone is in not at the supply base
         #print(f'{drone.name} transmitting video\n')
-        procH=drone.popen(f"vlc-wrapper {videoH} --sout '#udp{{dst={broadcast_addr}:{portH}}}' :no-sout-all :sout-keep", shell=True) #stream video process
-        procL=drone.popen(f"vlc-wrapper {videoL} --sout '#udp{{dst={broadcast_addr}:{portL}}}' :no-sout-all :sout-keep", shell=True) #stream video process
+        procs=[stream(tier) for tier in tiers]
 
     t=20 #[s] time interval in between position notification
 
@@ -540,22 +579,21 @@ def send_video(drone_name, videoH, videoL, broadcast_addr, portH, portL, args):
             #print(f'drone {drone_name} has moved\n')
             #print(f'{drone.name} transmitting video\n')
 
-            if drone_name=='drone5': #force drone5 to connect to AP1 when deployed
+            if drone_name=='drone5': #force drone5 to connect to its AP when deployed
                 time.sleep(2)
                 drone.popen(f'iw dev {drone_name}-wlan0 disconnect', shell=True)
                 time.sleep(2)
-                drone.popen(f'iw dev {drone_name}-wlan0 connect ssid-ap1', shell=True)
+                drone.popen(f"iw dev {drone_name}-wlan0 connect ssid-{topo['drones'][drone_name]['ap']}", shell=True)
                 #ap=net.getNodeByName('ap1')
                 #drone.setAssociation(ap)
                 #drones[i].popen(f'iw dev drone{i+1}-wlan0 set bitrates legacy-5 12 54', shell=True)
 
-            procH=drone.popen(f"vlc-wrapper {videoH} --sout '#udp{{dst={broadcast_addr}:{portH}}}' :no-sout-all :sout-keep", shell=True) #stream from drone
-            procL=drone.popen(f"vlc-wrapper {videoL} --sout '#udp{{dst={broadcast_addr}:{portL}}}' :no-sout-all :sout-keep", shell=True) #stream from drone
+            procs=[stream(tier) for tier in tiers] #stream from drone
 
             if any('--endpoint' in arg for arg in args):
                 endpoint_name=next((arg[2:] for arg in args if '--endpoint' in arg), None)
                 endpoint=net.getNodeByName(endpoint_name) #receive only on a specific endpoint
-                k=stream_dst_port+int(drone_name[5])-1 #L4 destination port where to receive from the current drone
+                k=topo['drones'][drone_name]['stream_port'] #L4 destination port where to receive from the current drone
 
                 #print(f'{endpoint.name} waiting for video on {endpoint.IP()}:{k}\n')
                 rec_proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{k}', shell=True) #receive from current drone on current endpoint
@@ -563,7 +601,7 @@ def send_video(drone_name, videoH, videoL, broadcast_addr, portH, portL, args):
 
             else: #receive on all endpoints
                 for endpoint in net.hosts:
-                    k=stream_dst_port+int(drone_name[5])-1 #L4 destination port where to receive from the current drone
+                    k=topo['drones'][drone_name]['stream_port'] #L4 destination port where to receive from the current drone
 
                     #print(f'{endpoint.name} waiting for video on {endpoint.IP()}:{k}\n')
                     rec_proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{k}', shell=True) ##receive from current drone on all endpoints
@@ -577,20 +615,20 @@ def send_video(drone_name, videoH, videoL, broadcast_addr, portH, portL, args):
 
         elif drone.position==base_pos and pos!=base_pos: #if the drone has come back to base
             pos=drone.position
-            procH.terminate() #stop streaming (high quality)
-            procL.terminate() #stop streaming (low quality)
+            for proc in procs:
+                proc.terminate() #stop streaming (every tier)
 
             if any('--endpoint' in arg for arg in args):
                 endpoint_name=next((arg[2:] for arg in sys.argv if '--endpoint' in arg), None)
                 endpoint=net.getNodeByName(endpoint_name)
 
-                k=stream_dst_port+int(drone_name[5])-1
+                k=topo['drones'][drone_name]['stream_port']
                 rec_proc=rec_streams[endpoint.name][k]
                 rec_proc.terminate() #stop receiver process associated to drone on designated endpoint
 
             else:
                 for endpoint in net.hosts:
-                    k=stream_dst_port+int(drone_name[5])-1
+                    k=topo['drones'][drone_name]['stream_port']
 
                     rec_proc=rec_streams[endpoint.name][k]
                     rec_proc.terminate() #stop receiver process associated to drone on all endpoints
@@ -603,34 +641,37 @@ def send_video(drone_name, videoH, videoL, broadcast_addr, portH, portL, args):
 if __name__ == '__main__':
     setLogLevel('info')
 
-    drone_positions = {
-                     'drone1': (26.25, 17, 35),
-                     'drone2': (78.75, 17, 35),
-                     'drone3': (78.75, 51, 35),
-                     'drone4': (26.25, 51, 35),
-                     'drone5': (26.25, 17, 35), #same as drone1
-                     'drone6': (78.75, 17, 35), #same as drone2
-                     'drone7': (78.75, 51, 35), #same as drone3
-                     'drone8': (26.25, 51, 35), #same as drone4
-                } #dictionary associating each drone of the fleet to its designated hovering position
+    topology_path=next((arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--topology=')), Topology.DEFAULT_PATH)
+    topo=Topology.load(topology_path) #network description (the controller loads the same description at start-up)
+
+    drone_positions={drone: tuple(d['hover']) for drone, d in topo['drones'].items()} #dictionary associating each drone of the fleet to its
+                                                                                       #designated hovering position (drones of the same AP share it)
 
     base_pos=(0.0, 0.0, 0.0) #drone supply base position
 
     HOST='localhost' #IPv4 address of server socket where mobility commands are received from the controller
     PORT=8080 #L4 port number of server socket where mobility commands are received from the controller
     log_path="/home/francesco2/Documenti/PycharmProjects/Smart2/logFiles/CommandsLog.txt" #file where controller mobility commands are memorized
+    code_path="/home/francesco2/Documenti/PycharmProjects/Smart2/" #path containing SendPosition.py and NotificationAgent.py
+    notify_copies=5 #number of copies of each notification sent by drones (duplicates are dropped by the controller)
+    server_loop=None #event loop of the command server
+    server_shutdown=None #asyncio event signalling the command server to stop
+    legacy_timeout=0.2 #time a JSON command without newline is left waiting before it is handled as a legacy single command [s]
+    command_latency=[] #list of (handling latency [s], number of commands) of messages received by the command server
+    notify_latency={} #dictionary <str drone name, float[]> of notification latencies measured on the emulator side [s]
+    link_stats=LinkStats() #rtnetlink collector of AP interface counters, shared by send position threads
+    try:
+        station_info=StationInfo([f'{ap_name}-wlan1' for ap_name in topo['aps']]) #nl80211 provider of drones' link state, shared by send position threads
+    except OSError as e:
+        print(f"[WARNING] nl80211 not available ({e}), reading drones' link state with iw\n")
+        station_info=None
 
-    broadcast_address='192.168.1.255' #drone network broadcast address
-    stream_src_portH=8888 #L4 port where drones stream the video (high quality)
-    stream_src_portL=7777 #L4 port where drones stream the video (low quality)
-    stream_dst_port=1231 #L4 base port where endpoints receive the video
-
-    #video_pathH='high_quality.mp4' #high quality video file
-    #video_pathL='low_quality.mp4' #low quality video file
-    video_pathH='OnePiece_Ep_0223_SUB_ITA.mp4' #high quality video file
-    video_pathL='low_res.mp4' #low quality video file
+    broadcast_address=topo['broadcast'] #drone network broadcast address
+    tiers=topo['tiers'] #quality ladder: every drone streams one video per tier, on the tier's L4 port
 
     print(f'Running Configurations: {sys.argv}\n')
+    print(f"Topology: {topo['fleet_size']} drones, {len(topo['aps'])} APs ({topo['grid'][0]}x{topo['grid'][1]}), {len(topo['links'])} backbone links, "
+          f"{len(topo['tiers'])} quality tiers\n")
 
     energy_model(drone_positions) #function defining mobility patterns for each drone according to an energy model
     topology(sys.argv) #function creating the network
@@ -646,14 +687,15 @@ if __name__ == '__main__':
     try:
         t=threading.Thread(target=start_server) #starts server socket where mobility commands from the controller are received
         t.start() #start thread running server socket
+        threads.append(t)
 
     except Exception as e:
         print(e)
 
     try: #starting send position threads
         for drone in net.stations: #for each drone (Station reference)
-            if drone.name!='station1':
-                t=threading.Thread(target=send_position, args=(drone.name, drone.IP(), broadcast_address)) #create thread sending drone position notifications
+            if drone.name!=topo['trouble']['station']['name']:
+                t=threading.Thread(target=send_position, args=(drone.name, drone.IP(), broadcast_address, sys.argv)) #create thread sending drone position notifications
                 t.start() #start sending thread
                 threads.append(t)
 
@@ -661,21 +703,18 @@ if __name__ == '__main__':
         print(e)
 
     #Dictionary associating each endpoint with receiving processes, identified by their L4 port number
-    rec_streams = { 'endpoint1':{},
-                    'endpoint2':{},
-                    'endpoint3':{},
-                    'endpoint4':{} } #dictionary <str endpoint name, <int port number, receiving streaming process>
+    rec_streams={endpoint: {} for endpoint in topo['endpoints']} #dictionary <str endpoint name, <int port number, receiving streaming process>
+    deployed=[d['stream_port'] for d in topo['drones'].values() if d['wave']==0] #L4 ports of the videos streamed by the deployed drones
 
     if any('--endpoint' in arg for arg in sys.argv):
         endpoint_name=next((arg[2:] for arg in sys.argv if '--endpoint' in arg), None)
 
         endpoint=net.getNodeByName(endpoint_name) #receive only on a given endpoint
 
-        for i in range(4):
-            port_number=stream_dst_port+i
+        for port_number in deployed:
             print(f'{endpoint.name} waiting for video on {endpoint.IP()}:{port_number}\n')
 
-            proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{port_number}', shell=True) #receive on 4 different ports on the designated endpoint
+            proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{port_number}', shell=True) #receive from each deployed drone on the designated endpoint
             rec_streams[endpoint_name][port_number]=proc
         print(f"\n")
 
@@ -684,24 +723,23 @@ if __name__ == '__main__':
 
     else:
         for endpoint in net.hosts: #receive on all endpoints
-            if endpoint.name=='host2':
+            if endpoint.name==topo['trouble']['host']['name']:
                 continue
 
             if any('--drone' in arg for arg in sys.argv): #if we transmit only from a given drone
                 drone_name=next((arg[2:] for arg in sys.argv if '--drone' in arg), None)
 
-                port_number=stream_dst_port+int(drone_name[5])-1
+                port_number=topo['drones'][drone_name]['stream_port']
                 print(f'{endpoint.name} waiting for video on {endpoint.IP()}:{port_number}\n')
 
                 proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{port_number}', shell=True) #receive only on a given port on each endpoint
                 rec_streams[endpoint.name][port_number]=proc
 
             else: #if we transmit from all deployed drones at the same time
-                for i in range(4):
-                    port_number=stream_dst_port+i
+                for port_number in deployed:
                     print(f'{endpoint.name} waiting for video on {endpoint.IP()}:{port_number}\n')
 
-                    proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{port_number}', shell=True) #receive on 4 different ports on each endpoint
+                    proc=endpoint.popen(f'vlc-wrapper udp://@{broadcast_address}:{port_number}', shell=True) #receive from each deployed drone on each endpoint
                     rec_streams[endpoint.name][port_number]=proc
                 print(f"\n")
 
@@ -728,6 +766,9 @@ if __name__ == '__main__':
     if '--set_params' in sys.argv:
         set_params()
 
+    if '--no_qos' not in sys.argv:
+        configure_qos()
+
     info(f"\n**********Replaying Mobility**********\n")
     ReplayingMobility(net) #function executing the mobility pattern for each drone
 
@@ -739,25 +780,23 @@ if __name__ == '__main__':
 
             drone=net.getNodeByName(drone_name) #stream video from a single drone
 
-            t=threading.Thread(target=send_video, args=(drone.name, video_pathH, video_pathL, broadcast_address,
-                                                        stream_src_portH, stream_src_portL, sys.argv)) #create thread sending video stream
+            t=threading.Thread(target=send_video, args=(drone.name, tiers, broadcast_address, sys.argv)) #create thread sending video stream
             t.start() #start sending thread
             threads.append(t)
 
-            drone_2_name=f'drone{int(drone_name[5])+4}'
-            drone2=net.getNodeByName(drone_2_name) #stream video from spare drone after first drone goes back to base
+            drone_2_name=topo['drones'][drone_name]['replacement']
+            if drone_2_name is not None:
+                drone2=net.getNodeByName(drone_2_name) #stream video from spare drone after first drone goes back to base
 
-            t2=threading.Thread(target=send_video, args=(drone2.name, video_pathH, video_pathL, broadcast_address,
-                                                         stream_src_portH, stream_src_portL, sys.argv)) #create thread sending video stream
-            t2.start() #start sending thread
-            threads.append(t2)
+                t2=threading.Thread(target=send_video, args=(drone2.name, tiers, broadcast_address, sys.argv)) #create thread sending video stream
+                t2.start() #start sending thread
+                threads.append(t2)
 
         else:
             for drone in net.stations: #for each drone (Station reference)
-                if drone.name=='station1':
+                if drone.name==topo['trouble']['station']['name']:
                     continue
-                t=threading.Thread(target=send_video, args=(drone.name, video_pathH, video_pathL, broadcast_address,
-                                                            stream_src_portH, stream_src_portL, sys.argv)) #thread sending video stream
+                t=threading.Thread(target=send_video, args=(drone.name, tiers, broadcast_address, sys.argv)) #thread sending video stream
                 t.start() #start sending thread
                 threads.append(t)
 
@@ -767,9 +806,9 @@ if __name__ == '__main__':
     if '--test' in sys.argv:
         time.sleep(5*60)
         print("Starting stress test, overloading WiFi Channel of AP1\n")
-        station1=net.getNodeByName('station1')
+        station1=net.getNodeByName(topo['trouble']['station']['name'])
         #station1.cmd("vlc-wrapper high_quality.mp4 --sout '#udp{dst=192.168.1.22:9999}' :no-sout-all :sout-keep")
-        evil_proc=station1.popen("hping3 -c 1000000 -d 10000 -i u2000 192.168.1.22", shell=True)
+        evil_proc=station1.popen(f"hping3 -c 1000000 -d 10000 -i u2000 {topo['trouble']['host']['ip']}", shell=True)
         time.sleep(3*60)
         print("Stress test concluded\n")
         evil_proc.terminate()
@@ -777,9 +816,18 @@ if __name__ == '__main__':
     CLI(net) #opens Mininet CLI
 
     stop_event.set() #signal the threads to stop
+    stop_server() #signal the command server to stop
     print(f'Stopping threads: {stop_event}\n')
     for t in threads:
         t.join() #wait for all threads to finish
+    link_stats.close()
+    if station_info is not None:
+        station_info.close()
+
+    for drone_name, latencies in notify_latency.items(): #notification latency summary (persistent agent, or spawned SendPosition.py with --spawn)
+        if latencies:
+            print(f"Drone {drone_name}: {len(latencies)} notifications, latency avg {sum(latencies)/len(latencies)*1000:.1f} [ms], "
+                  f"max {max(latencies)*1000:.1f} [ms]")
 
     net.stop()
 
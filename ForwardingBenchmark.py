@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""Usage:
+   python3 ForwardingBenchmark.py [--lookups=<N>] Optional: number of timed egress port resolutions (default: LOOKUPS)
+                                  [--repeat=<N>] Optional: timed runs of each method, the best one is reported (default: REPEAT)
+                                  [--seed=<N>] Optional: seed of the random (DPID, destination) pairs (default: 0)
+
+   Micro-benchmark of the egress port resolution of reactive ARP/IPv4 Packet-Ins in DroneController.py, without Ryu. The original 8 drones / 4 APs
+   network (Topology.py defaults) is resolved in two ways:
+      - chain: the if/elif chain over the IPv4 groups of APs used by reactive_arp and reactive_ipv4 before the forwarding index (membership tests on
+        the lists of IPv4 addresses, port name .encode() and lookup on the AP's ports for every Packet-In)
+      - index: the per-AP forwarding index of build_forwarding (DPID -> destination IPv4 -> egress port number), a single lookup
+   Both methods are first checked to return the same egress port for every AP and destination, then timed on random (DPID, destination) pairs of
+   drones and endpoints. Only the resolution is timed: the handling rate of whole Packet-Ins (parsing, FlowMod and PacketOut) is measured by the
+   arp and unicast scenarios of ControllerBenchmark.py"""
+
+#################################################################################################################Imports
+import sys
+import time
+import random
+
+import Topology #parametric network description
+
+########################################################################################################Global Variables
+LOOKUPS=100000 #default number of timed resolutions
+REPEAT=5 #default number of timed runs of each method
+
+'''Returns the ports of every AP, as created by FootballStreaming.py (port name -> port number)
+   @param dict description
+   @return <str, <bytes, int>> ports of each AP'''
+def access_points(description):
+    ports={}
+    for ap_name, ap in description['aps'].items():
+        ports[ap_name]={f'{ap_name}-wlan1'.encode(): 1, f'{ap_name}-eth2'.encode(): 2}
+        ports[ap_name].update({port.encode(): Topology.port_number(port) for port in ap['backbone'].values()})
+    return ports
+
+'''Resolves the egress port of a destination with the if/elif chain of the original reactive handlers (original 4 APs network only)
+   @param <str, str[]> ip_groups (IPv4 addresses of the drones and the endpoint of each AP, endpoint last)
+   @param <str, <bytes, int>> ports (ports of each AP)
+   @param str ap_name
+   @param str dst (destination IPv4 address)
+   @return int out_port (None for unknown destinations)'''
+def chain_lookup(ip_groups, ports, ap_name, dst):
+    if dst in ip_groups['ap1']: #the destination node is connected to AP1
+        if ap_name=='ap1':
+            if dst!=ip_groups['ap1'][2]: #if destination is a drone
+                out_port_name=f'{ap_name}-wlan1' #egress port WiFi
+            else: #destination is endpoint1
+                out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint1)
+        else: #ap2, ap3, or ap4
+            out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP1 in all other APs)
+
+    elif dst in ip_groups['ap2']: #the destination node is connected to AP2
+        if ap_name=='ap2':
+            if dst!=ip_groups['ap2'][2]: #if destination is a drone
+                out_port_name=f'{ap_name}-wlan1' #egress port WiFi
+            else: #destination is endpoint2
+                out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint2)
+        elif ap_name=='ap1':
+            out_port_name=f'{ap_name}-eth3' #egress port Ethernet (towards AP2)
+        elif ap_name=='ap3':
+            out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
+        else: #ap_name=='ap4'
+            out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP2)
+
+    elif dst in ip_groups['ap3']: #the destination node is connected to AP3
+        if ap_name=='ap3':
+            if dst!=ip_groups['ap3'][2]: #if destination is a drone
+                out_port_name=f'{ap_name}-wlan1' #egress port WiFi
+            else: #destination is endpoint3
+                out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint3)
+        elif ap_name=='ap1' or ap_name=='ap2':
+            out_port_name=f'{ap_name}-eth4' #egress port Ethernet (towards AP3)
+        else: #ap_name=='ap4'
+            out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP3)
+
+    elif dst in ip_groups['ap4']: #the destination node is connected to AP4
+        if ap_name=='ap4':
+            if dst!=ip_groups['ap4'][2]: #if destination is a drone
+                out_port_name=f'{ap_name}-wlan1' #egress port WiFi
+            else: #destination is endpoint4
+                out_port_name=f'{ap_name}-eth2' #egress Ethernet port (towards endpoint4)
+        else: #ap1, ap2, or ap3
+            out_port_name=f'{ap_name}-eth5' #egress port Ethernet (towards AP4)
+
+    else:
+        return None
+
+    return ports[ap_name][out_port_name.encode()] #get output port number
+
+'''Builds the forwarding index of every AP, as build_forwarding does in DroneController.py
+   @param dict description
+   @param <str, str[]> ip_groups
+   @param <str, <bytes, int>> ports
+   @return <int, <str, int>> forwarding index (DPID -> destination IPv4 -> egress port number)'''
+def forwarding_index(description, ip_groups, ports):
+    forwarding={}
+    for ap_name, ap in description['aps'].items():
+        index={}
+        for dst_ap, ips in ip_groups.items():
+            for ip in ips:
+                if dst_ap==ap_name: #destination is directly connected to current AP
+                    out_port_name=f'{ap_name}-eth2' if ip==ips[-1] else f'{ap_name}-wlan1'
+                else: #destination is reachable through the backbone
+                    out_port_name=ap['backbone'][dst_ap]
+                index[ip]=ports[ap_name][out_port_name.encode()]
+        forwarding[ap['dpid']]=index
+    return forwarding
+
+'''Returns the best resolution rate of a method over several timed runs
+   @param function resolve (called with DPID and destination IPv4 address)
+   @param (int, str)[] pairs (DPID and destination of each resolution)
+   @param int repeat
+   @return float resolutions per second'''
+def rate(resolve, pairs, repeat):
+    best=float('inf')
+    for run in range(repeat):
+        start=time.perf_counter()
+        for dpid, dst in pairs:
+            resolve(dpid, dst)
+        best=min(best, time.perf_counter()-start)
+    return len(pairs)/best
+
+####################################################################################################################Main
+if __name__ == '__main__':
+    args=sys.argv[1:]
+    lookups=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--lookups=')), LOOKUPS))
+    repeat=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--repeat=')), REPEAT))
+    seed=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--seed=')), 0))
+
+    description=Topology.describe() #the if/elif chain only describes the original network
+    ports=access_points(description)
+    ip_groups={ ap_name: [description['drones'][dr]['ip'] for dr in ap['drones']]+[description['endpoints'][ap['endpoint']]['ip']]
+                for ap_name, ap in description['aps'].items() } #IPv4 addresses of the drones and the endpoint of each AP, as in DroneController.py
+    dpids={ap['dpid']: ap_name for ap_name, ap in description['aps'].items()} #dictionary <DPID, AP name>
+    forwarding=forwarding_index(description, ip_groups, ports)
+
+    destinations=[ip for ips in ip_groups.values() for ip in ips]
+    mismatches=[(ap_name, dst) for dpid, ap_name in dpids.items() for dst in destinations
+                if chain_lookup(ip_groups, ports, ap_name, dst)!=forwarding[dpid][dst]]
+    if mismatches:
+        sys.exit(f"Egress ports differ: {mismatches}")
+
+    rand=random.Random(seed)
+    pairs=[(rand.choice(list(dpids)), rand.choice(destinations)) for i in range(lookups)]
+    chain=rate(lambda dpid, dst: chain_lookup(ip_groups, ports, dpids[dpid], dst), pairs, repeat)
+    index=rate(lambda dpid, dst: forwarding.get(dpid, {}).get(dst), pairs, repeat)
+
+    print(f"{len(dpids)} APs, {len(destinations)} destinations: same egress ports with both methods")
+    print(f"{lookups} random resolutions, best of {repeat} runs:")
+    print(f"   if/elif chain: {chain/1e6:.2f} M lookups/s")
+    print(f"   index lookup:  {index/1e6:.2f} M lookups/s ({index/chain:.1f}x)")
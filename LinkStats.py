@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""Bulk collector of interface counters through rtnetlink: a single RTM_GETLINK dump returns the 64-bit statistics (IFLA_STATS64) of every interface
+   of the current network namespace, instead of opening one /sys/class/net/<if>/statistics/<counter> file per counter. Counter names are the same
+   as the sysfs ones (rx_bytes, tx_bytes, rx_packets, ..., collisions, rx_over_errors, ...).
+   Used by Results.py (telemetry sampling) and FootballStreaming.py (channel occupation of APs). APs' interfaces live in the root namespace"""
+
+#################################################################################################################Imports
+import os
+import socket
+import struct
+import threading
+import time
+
+########################################################################################################Global Variables
+NETLINK_ROUTE=0
+RTM_NEWLINK=16
+RTM_GETLINK=18
+NLM_F_REQUEST=0x1
+NLM_F_DUMP=0x300
+NLMSG_ERROR=2
+NLMSG_DONE=3
+IFLA_IFNAME=3
+IFLA_STATS64=23
+
+NLMSG_HEADER=struct.Struct('=IHHII') #length, type, flags, sequence number, port ID
+IFINFOMSG=struct.Struct('=BxHiII') #family, device type, index, flags, change mask
+RTATTR=struct.Struct('=HH') #length, type
+
+COUNTERS=( 'rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes', 'rx_errors', 'tx_errors', 'rx_dropped', 'tx_dropped', 'multicast', 'collisions',
+           'rx_length_errors', 'rx_over_errors', 'rx_crc_errors', 'rx_frame_errors', 'rx_fifo_errors', 'rx_missed_errors',
+           'tx_aborted_errors', 'tx_carrier_errors', 'tx_fifo_errors', 'tx_heartbeat_errors', 'tx_window_errors',
+           'rx_compressed', 'tx_compressed', 'rx_nohandler' ) #fields of struct rtnl_link_stats64, in order (newer kernels may append fields)
+
+'''Sends a netlink dump request and yields the messages of the reply, until NLMSG_DONE
+   @param socket sock (bound netlink socket)
+   @param int msg_type (request type)
+   @param int seq (sequence number of the request)
+   @param bytes payload (request payload, after the netlink header)
+   @return (int, bytes, int, int) message type, data, payload start offset, message end offset (generator)'''
+def dump_messages(sock, msg_type, seq, payload):
+    sock.sendto(NLMSG_HEADER.pack(NLMSG_HEADER.size+len(payload), msg_type, NLM_F_REQUEST | NLM_F_DUMP, seq, 0)+payload, (0, 0))
+
+    while True:
+        data=sock.recv(65536)
+        offset=0
+        while offset+NLMSG_HEADER.size<=len(data):
+            length, reply_type, flags, msg_seq, pid=NLMSG_HEADER.unpack_from(data, offset)
+            if length<NLMSG_HEADER.size:
+                break
+            if msg_seq==seq:
+                if reply_type==NLMSG_DONE:
+                    return
+                if reply_type==NLMSG_ERROR:
+                    error=-struct.unpack_from('=i', data, offset+NLMSG_HEADER.size)[0]
+                    if error==0: #acknowledgement
+                        return
+                    raise OSError(error, f"netlink request {msg_type} failed: {os.strerror(error)}")
+                yield reply_type, data, offset+NLMSG_HEADER.size, offset+length
+            offset+=(length+3) & ~3 #messages are aligned to 4 bytes
+
+'''Returns the attributes (struct rtattr / struct nlattr) between two offsets
+   @param bytes data
+   @param int start (offset of the first attribute)
+   @param int end (end of the attributes)
+   @return <int, bytes> attributes (type -> value; the nested flag is cleared from types)'''
+def attributes(data, start, end):
+    attrs={}
+    offset=start
+    while offset+RTATTR.size<=end:
+        length, attr_type=RTATTR.unpack_from(data, offset)
+        if length<RTATTR.size:
+            break
+        attrs[attr_type & 0x3fff]=data[offset+RTATTR.size:offset+length]
+        offset+=(length+3) & ~3 #attributes are aligned to 4 bytes
+    return attrs
+
+class LinkStats: ############################################################################################Link Stats
+    '''Creates a LinkStats object, opening its rtnetlink socket'''
+    def __init__(self):
+        self.__sock=socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        self.__sock.bind((0, 0))
+        self.__seq=0 #sequence number of the last dump request
+        self.__lock=threading.Lock() #dumps are serialized (the collector can be shared by several threads)
+        self.__cache=({}, 0.0) #last dump and its (monotonic) time
+        self.dumps=0 #counter of dumps
+
+    '''Returns the statistics of all interfaces with a single RTM_GETLINK dump
+       @param LinkStats object
+       @return <str, <str, int>> stats (interface name -> counter name -> value)'''
+    def dump(self):
+        with self.__lock:
+            self.__seq+=1
+            stats={}
+            for msg_type, data, start, end in dump_messages(self.__sock, RTM_GETLINK, self.__seq, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)):
+                if msg_type==RTM_NEWLINK:
+                    name, counters=self.parse_link(data, start, end)
+                    if name is not None:
+                        stats[name]=counters
+
+            self.dumps+=1
+            self.__cache=(stats, time.monotonic())
+            return stats
+
+    '''Parses an RTM_NEWLINK message, returning the interface name and its 64-bit counters
+       @param LinkStats object
+       @param bytes data
+       @param int start (offset of the ifinfomsg header)
+       @param int end (end of the message)
+       @return (str, <str, int>) interface name (None if missing), counters'''
+    def parse_link(self, data, start, end):
+        attrs=attributes(data, start+IFINFOMSG.size, end)
+        name=attrs[IFLA_IFNAME].rstrip(b'\0').decode() if IFLA_IFNAME in attrs else None
+        value=attrs.get(IFLA_STATS64, b'')
+        counters=dict(zip(COUNTERS, struct.unpack_from(f'={len(value)//8}Q', value)))
+        return name, counters
+
+    '''Returns the statistics of all interfaces, reusing the last dump if it is recent enough (threads sampling at the same time share a dump)
+       @param LinkStats object
+       @param float max_age (maximum age of the reused dump [s], default 0 meaning always dump)
+       @return <str, <str, int>> stats'''
+    def snapshot(self, max_age=0.0):
+        stats, stamp=self.__cache
+        if max_age>0 and time.monotonic()-stamp<=max_age:
+            return stats
+        return self.dump()
+
+    '''Returns a counter of an interface
+       @param LinkStats object
+       @param str interface
+       @param str counter (e.g. rx_bytes)
+       @param float max_age (maximum age of the reused dump [s], default 0 meaning always dump)
+       @return int value (None if the interface does not exist)'''
+    def get(self, interface, counter, max_age=0.0):
+        return self.snapshot(max_age).get(interface, {}).get(counter)
+
+    '''Closes the rtnetlink socket
+       @param LinkStats object'''
+    def close(self):
+        self.__sock.close()
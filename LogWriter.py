@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""Asynchronous batched log writer. Event handlers enqueue log records (format string + arguments) and return immediately, while a single background
+   thread keeps log files open, formats records, and writes them in batches. Records above the configured verbosity level are dropped before being
+   enqueued"""
+
+#################################################################################################################Imports
+from datetime import datetime as dt #date-related operations
+import threading
+import queue
+import time
+
+########################################################################################################Global Variables
+ESSENTIAL=0 #verbosity level: network-wide events (boot-up, congestion, mobility commands)
+INFO=1 #verbosity level: per-event summaries (Packet-Ins, notifications, installed rule sets)
+DETAIL=2 #verbosity level: per-rule details (matches, actions, buckets, bands, instructions)
+
+class LogWriter: ############################################################################################Log Writer
+    '''Creates a LogWriter object and starts its background writer thread
+       @param int level (verbosity level, records with higher level are dropped)
+       @param int batch_size (number of pending records triggering a write)
+       @param float flush_interval (maximum time a record can stay pending [s])
+       @param int max_queued (maximum number of queued records, further records are dropped until the writer catches up)'''
+    def __init__(self, level=DETAIL, batch_size=512, flush_interval=1.0, max_queued=100000):
+        self.level=level #current verbosity level
+        self.batch_size=batch_size
+        self.flush_interval=flush_interval
+
+        self.__queue=queue.Queue(maxsize=max_queued) #queue of records: (path, mode, timestamp, format string, arguments)
+        self.__files={} #dictionary <str path, file object> of log files kept open by the writer thread
+        self.__failed={} #dictionary <str path, str> of log files which cannot be opened or written (their records are dropped)
+        self.__records=0 #counter of records written
+        self.__batches=0 #counter of batches written
+        self.__dropped=0 #counter of records dropped (queue full, or log file not writable)
+        self.__closed=False
+
+        self.__thread=threading.Thread(target=self.writer, args=(), daemon=True) #thread writing records to log files
+        self.__thread.start()
+
+    '''Enqueue a log record, formatted as fmt.format(*args) by the writer thread
+       @param LogWriter object
+       @param str path (log file)
+       @param int level (verbosity level of the record)
+       @param str fmt (format string, a newline is appended)
+       @param args (format arguments)
+       @param bool stamp (if True, the line is prefixed with the time of the call)'''
+    def log(self, path, level, fmt, *args, stamp=False):
+        if level>self.level or self.__closed: #record is too verbose for current level
+            return
+        try:
+            self.__queue.put_nowait((path, None, time.time() if stamp else None, fmt, args))
+        except queue.Full: #writer is not keeping up (handlers are never blocked by logging)
+            self.__dropped+=1
+
+    '''Enqueue the (re)opening of a log file. With mode "w", the log file is truncated before writing the following records. Like records, the
+       request is dropped if the queue is full (the following records are then appended to the file)
+       @param LogWriter object
+       @param str path
+       @param str mode'''
+    def open(self, path, mode="a"):
+        if self.__closed:
+            return
+        try:
+            self.__queue.put_nowait((path, mode, None, None, None))
+        except queue.Full: #writer is not keeping up (handlers are never blocked by logging)
+            self.__dropped+=1
+
+    '''Flush pending records and stop the writer thread (further records are ignored)
+       @param LogWriter object'''
+    def close(self):
+        if self.__closed:
+            return
+        self.__closed=True
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+
+    '''Thread function. Collects records from the queue and writes them in batches, when either batch_size records are pending or flush_interval
+       seconds have passed since the last write
+       @param LogWriter object'''
+    def writer(self):
+        pending={} #dictionary <str path, str[]> of formatted lines waiting to be written
+        count=0 #number of pending lines
+        last_flush=time.monotonic()
+        running=True
+
+        while running:
+            try:
+                record=self.__queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record=False #no new record, only check flush deadline
+
+            if record is None: #close() has been called
+                running=False
+
+            elif record:
+                path, mode, stamp, fmt, args=record
+
+                if mode is not None: #(re)open log file
+                    self.flush(pending)
+                    count=0
+                    if path in self.__files:
+                        self.__files.pop(path).close()
+                    self.open_file(path, mode)
+
+                else:
+                    try:
+                        line=fmt.format(*args) if args else fmt
+                    except Exception as e:
+                        line=f"[LOG ERROR] {e}: {fmt}"
+                    if stamp is not None:
+                        line=f"{dt.fromtimestamp(stamp)} -> {line}"
+                    pending.setdefault(path, []).append(line)
+                    count+=1
+
+            if count>=self.batch_size or not running or (count>0 and time.monotonic()-last_flush>=self.flush_interval):
+                self.flush(pending)
+                count=0
+                last_flush=time.monotonic()
+
+        for path, file_ in self.__files.items():
+            try:
+                file_.close()
+            except OSError as e:
+                self.report(path, e)
+
+    '''Opens a log file in the writer thread. A file which cannot be opened is reported once and its records are dropped, the writer keeps serving
+       the other files
+       @param LogWriter object
+       @param str path
+       @param str mode
+       @return file object (None if the file cannot be opened)'''
+    def open_file(self, path, mode):
+        try:
+            self.__files[path]=open(path, mode)
+            self.__failed.pop(path, None) #file can be written again (e.g. its directory has been created)
+            return self.__files[path]
+        except OSError as e:
+            self.report(path, e)
+            return None
+
+    '''Reports a log file which cannot be opened or written (once per file)
+       @param LogWriter object
+       @param str path
+       @param OSError error'''
+    def report(self, path, error):
+        if path not in self.__failed:
+            print(f"[ERROR] Log writer: cannot write {path}: {error}. Its records are dropped")
+        self.__failed[path]=str(error)
+
+    '''Write pending lines to their log files
+       @param LogWriter object
+       @param <str, str[]> pending'''
+    def flush(self, pending):
+        if not pending:
+            return
+        for path, lines in pending.items():
+            if not lines:
+                continue
+            file_=self.__files.get(path)
+            if file_ is None and path not in self.__failed:
+                file_=self.open_file(path, "a")
+            if file_ is None: #file not writable
+                self.__dropped+=len(lines)
+                continue
+            try:
+                file_.write("\n".join(lines)+"\n")
+                file_.flush()
+                self.__records+=len(lines)
+            except OSError as e:
+                self.report(path, e)
+                self.__dropped+=len(lines)
+                try:
+                    self.__files.pop(path).close()
+                except OSError:
+                    pass
+        self.__batches+=1
+        pending.clear()
+
+    '''Returns writer statistics
+       @param LogWriter object
+       @return <str, int> stats'''
+    def stats(self):
+        return { 'records': self.__records,
+                 'batches': self.__batches,
+                 'queued': self.__queue.qsize(),
+                 'dropped': self.__dropped,
+                 'failed': dict(self.__failed) }
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""In-band notification format shared by SendPosition.py (drones) and DroneController.py (controller).
+   Binary layout (version 2, network byte order, 48 bytes):
+      magic 'DN' (2s) | version (B) | drone id (B) | sequence number (I) | timestamp (d) | x, y, z (3d) | occupation (f) | tx bitrate [Mbit/s] (f)
+   Coordinates are float64, so positions computed from the network description (e.g. hovering positions) reach the controller unchanged and can be
+   compared exactly. Version 1 (float32 coordinates, 36 bytes) is still parsed
+   Text layout (fallback): pos:x,y,z/occ:f"""
+
+#################################################################################################################Imports
+import struct
+import socket
+import time
+
+########################################################################################################Global Variables
+MAGIC=b'DN' #first bytes of a binary notification
+VERSION=2 #current version of the binary layout
+LAYOUT=struct.Struct('!2sBBIddddff') #binary notification layout
+LAYOUTS={1: struct.Struct('!2sBBIdfffff'), VERSION: LAYOUT} #binary layouts which can be parsed, by version
+DSCP=0b000011 #DSCP value marking notification packets
+
+'''Builds a binary notification
+   @param int drone_id
+   @param int seq (sequence number)
+   @param (float, float, float) position
+   @param float occupation
+   @param float tx_bitrate [Mbit/s]
+   @param float timestamp (default None, meaning current time)
+   @return bytes payload'''
+def pack_notification(drone_id, seq, position, occupation, tx_bitrate, timestamp=None):
+    if timestamp is None:
+        timestamp=time.time()
+    x, y, z=position
+    return LAYOUT.pack(MAGIC, VERSION, drone_id, seq & 0xffffffff, timestamp, x, y, z, occupation, tx_bitrate)
+
+'''Parses a binary notification in place, starting at a given offset of a buffer (e.g. the data of a Packet-In message)
+   @param bytes buffer
+   @param int offset (offset of UDP payload in buffer)
+   @return (drone_id, seq, timestamp, (x, y, z), occupation, tx_bitrate) or None if buffer does not contain a valid binary notification'''
+def unpack_notification(buffer, offset=0):
+    if len(buffer)-offset<4 or buffer[offset:offset+2]!=MAGIC:
+        return None
+    layout=LAYOUTS.get(buffer[offset+2]) #layout of the notification's version
+    if layout is None or len(buffer)-offset<layout.size:
+        return None
+
+    magic, version, drone_id, seq, timestamp, x, y, z, occupation, tx_bitrate=layout.unpack_from(buffer, offset)
+    return drone_id, seq, timestamp, (x, y, z), occupation, tx_bitrate
+
+'''Builds a text notification (legacy format)
+   @param str position (x,y,z)
+   @param float occupation
+   @return str payload'''
+def pack_text(position, occupation):
+    return f'pos:{position}/occ:{occupation}'
+
+'''Parses a text notification (legacy format). Drone id, sequence number, timestamp and tx bitrate are not carried by text notifications
+   @param bytes payload
+   @return (None, None, None, (x, y, z), occupation, None) or None if payload is not a valid text notification'''
+def unpack_text(payload):
+    try:
+        decoded_payload=payload.decode(errors="ignore")
+        position=decoded_payload.split('/')[0].split(':')[1]
+        occupation=decoded_payload.split('/')[1].split(':')[1]
+        return None, None, None, tuple(map(float, position.split(','))), float(occupation), None
+    except (IndexError, ValueError):
+        return None
+
+'''Computes the IPv4 header checksum
+   @param bytes header
+   @return int checksum'''
+def ipv4_checksum(header):
+    total=sum(struct.unpack(f'!{len(header)//2}H', header))
+    while total>>16:
+        total=(total & 0xffff)+(total>>16)
+    return ~total & 0xffff
+
+'''Builds a complete Ethernet/IPv4/UDP broadcast frame carrying a notification, marked with the notification DSCP value
+   @param bytes src_mac (6 bytes)
+   @param str src_ip
+   @param str dst_ip
+   @param bytes payload
+   @param int sport (default 53, as Scapy UDP default)
+   @param int dport (default 53, as Scapy UDP default)
+   @return bytes frame'''
+def build_frame(src_mac, src_ip, dst_ip, payload, sport=53, dport=53):
+    eth=b'\xff'*6+src_mac+b'\x08\x00' #broadcast destination, IPv4 ethertype
+    udp=struct.pack('!HHHH', sport, dport, 8+len(payload), 0)+payload #UDP checksum is optional on IPv4
+    ip=struct.pack('!BBHHHBBH4s4s', 0x45, DSCP<<2, 20+len(udp), 0, 0, 64, 17, 0,
+                   socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+    ip=ip[:10]+struct.pack('!H', ipv4_checksum(ip))+ip[12:]
+    return eth+ip+udp
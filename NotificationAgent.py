@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""Usage:
+   python3 NotificationAgent.py --drone=<name> --src=<IPv4> --dst=<IPv4> [--copies=<n>] [--spawned=<epoch>]
+
+Long-lived notification agent, started once inside the namespace of a Mininet-emulated drone. It reads position/occupation updates from its standard
+input (one JSON object per line: {"pos": [x, y, z], "occ": f, "rate": f, "seq": n}) and sends the corresponding in-band notification to the controller through a
+raw packet socket opened at startup, avoiding a shell + sudo + interpreter + Scapy start for every notification. Sequence numbers are
+given by the emulator, so a respawned agent goes on with the drone's sequence (without "seq", the agent counts from 0)"""
+
+#################################################################################################################Imports
+import argparse #parsing CLI arguments
+import fcntl
+import json
+import re
+import socket
+import struct
+import sys
+import time
+
+import Notification #in-band notification format
+
+########################################################################################################Global Variables
+SIOCGIFHWADDR=0x8927 #ioctl request returning the hardware address of an interface
+
+'''Returns the MAC address of a local L2 interface (queried through ioctl, so that it works inside the network namespace of the drone)
+   @param socket sock
+   @param str iface
+   @return bytes mac (6 bytes)'''
+def get_mac(sock, iface):
+    info=fcntl.ioctl(sock.fileno(), SIOCGIFHWADDR, struct.pack('256s', iface[:15].encode()))
+    return info[18:24]
+
+'''Parse command-line arguments, open a raw packet socket on the drone's WiFi interface, then send a notification for every update read from stdin'''
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Sends in-band position/occupation notifications from a Mininet-emulated drone') #argument parser for CLI parameters
+    parser.add_argument('--drone', type=str, help='Name of this drone')
+    parser.add_argument('--src', type=str, help='IPv4 address of this drone')
+    parser.add_argument('--dst', type=str, help='IPv4 destination address')
+    parser.add_argument('--copies', type=int, default=5, help='Number of copies of each notification (to deal with losses due to wireless medium)')
+    parser.add_argument('--spawned', type=float, default=None, help='Time at which the agent has been spawned (epoch) to measure startup latency')
+    args=parser.parse_args() #parsed arguments
+
+    out_intf=f'{args.drone}-wlan0' #L2 interface on drone
+    drone_id=int(re.search(r'\d+', args.drone).group()) #extract drone number
+
+    sock=socket.socket(socket.AF_PACKET, socket.SOCK_RAW) #raw packet socket, kept open for the whole simulation
+    sock.bind((out_intf, 0))
+    src_mac=get_mac(sock, out_intf)
+
+    ready=time.time()
+    if args.spawned is not None:
+        print(f"[READY] Drone {args.drone}:{out_intf} ({args.src}). Startup latency: {(ready-args.spawned)*1000:.1f} [ms]", flush=True)
+    else:
+        print(f"[READY] Drone {args.drone}:{out_intf} ({args.src})", flush=True)
+
+    seq=0 #sequence number of notifications (the emulator's one when given, so that it does not restart with the agent)
+    sent=0 #counter of notifications sent
+    for line in sys.stdin: #for every update received from the emulator
+        try:
+            update=json.loads(line)
+            position=tuple(map(float, update['pos']))
+            occupation=float(update.get('occ', 0.0))
+            tx_bitrate=float(update.get('rate', 0.0))
+            seq=int(update.get('seq', seq))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[ERROR] Malformed update {line.strip()}: {e}", flush=True)
+            continue
+
+        start=time.perf_counter()
+        payload=Notification.pack_notification(drone_id, seq, position, occupation, tx_bitrate)
+        frame=Notification.build_frame(src_mac, args.src, args.dst, payload)
+        for i in range(args.copies): #send the notification several times to deal with losses due to wireless medium
+            sock.send(frame)
+        latency=(time.perf_counter()-start)*1e6
+
+        print(f"Notification {seq}. Position: {position}. Bandwidth occupation: {occupation}. Tx bitrate: {tx_bitrate}. "
+              f"Notification latency: {latency:.0f} [us]", flush=True)
+        seq+=1
+        sent+=1
+
+    sock.close()
+    print(f"[CLOSED] Drone {args.drone}: {sent} notifications sent", flush=True)
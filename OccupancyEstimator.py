@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""Per-AP estimator of WiFi channel occupation used by DroneController.py for congestion adaptation. Readings of the same AP coming from different
+   sources (the drones associated with it, or the controller's own port statistics) are aggregated over a time window (mean of the latest reading of
+   every source), and the aggregate is smoothed with a time-based EWMA (time constant tau, so that readings arriving every second and every 20 seconds
+   are weighted consistently). Congestion is declared with hysteresis: the smoothed occupation has to stay above the up threshold for hold_up seconds,
+   and relief requires it to stay below the down threshold for hold_down seconds, so noisy readings do not make group rules flap.
+   Each AP has a congestion level (0 = idle, up to levels-1): every declared congestion raises the level by one step and every declared relief lowers
+   it by one step, so a quality ladder is walked one tier at a time (after a step, the hold time has to elapse again before the next one)"""
+
+#################################################################################################################Imports
+import math
+import time
+
+class OccupancyEstimator: ########################################################################Occupancy Estimator
+    '''Creates an OccupancyEstimator object
+       @param float up (smoothed occupation above which the channel becomes congested, default 0.5)
+       @param float down (smoothed occupation below which a congested channel becomes idle, default 0.35)
+       @param float hold_up (time the smoothed occupation has to stay above up before congestion is declared [s], default 1)
+       @param float hold_down (time the smoothed occupation has to stay below down before relief is declared [s], default 5)
+       @param float tau (EWMA time constant [s], default 2)
+       @param float window (readings older than window are not aggregated [s], default 30)
+       @param int levels (number of congestion levels, default 2: idle and congested)'''
+    def __init__(self, up=0.5, down=0.35, hold_up=1.0, hold_down=5.0, tau=2.0, window=30.0, levels=2):
+        if not 0<=down<=up<=1:
+            raise ValueError(f"Thresholds must satisfy 0 <= down ({down}) <= up ({up}) <= 1")
+        self.up=up
+        self.down=down
+        self.hold_up=hold_up
+        self.hold_down=hold_down
+        self.tau=tau
+        self.window=window
+        self.levels=max(1, levels)
+        self.__states={} #dictionary <AP name, dict> of estimator states
+
+    '''Adds a reading to the estimator of an AP and returns the resulting transition, if any
+       @param OccupancyEstimator object
+       @param str ap_name
+       @param float occupation (reading, between 0 and 1)
+       @param str source (reporting drone, or the controller's port statistics)
+       @param float now (monotonic time of the reading [s], default None meaning now)
+       @return str transition ('congested': level raised, 'relieved': level lowered, or None)'''
+    def update(self, ap_name, occupation, source, now=None):
+        now=time.monotonic() if now is None else now
+        st=self.__states.setdefault(ap_name, { 'readings': {}, #dictionary <source, (occupation, time)> (latest reading of every source)
+                                               'aggregate': 0.0,
+                                               'smoothed': None,
+                                               'updated': None, #time of the last update
+                                               'level': 0, #congestion level
+                                               'since': None, #time the smoothed occupation crossed a threshold with a step still available
+                                               'step': 0, #direction of the pending step (1 = congestion, -1 = relief)
+                                               'transitions': 0 })
+
+        readings=st['readings']
+        readings[source]=(occupation, now)
+        for src in [src for src, (value, stamp) in readings.items() if now-stamp>self.window]:
+            del readings[src] #source stopped reporting
+        st['aggregate']=sum(value for value, stamp in readings.values())/len(readings)
+
+        if st['smoothed'] is None: #first reading
+            st['smoothed']=st['aggregate']
+        else:
+            alpha=1-math.exp(-max(0.0, now-st['updated'])/self.tau) if self.tau>0 else 1.0 #weight of the new aggregate
+            st['smoothed']+=alpha*(st['aggregate']-st['smoothed'])
+        st['updated']=now
+
+        if st['smoothed']>=self.up and st['level']<self.levels-1:
+            step, hold=1, self.hold_up
+        elif st['smoothed']<self.down and st['level']>0:
+            step, hold=-1, self.hold_down
+        else:
+            st['since']=None
+            return None
+        if st['since'] is None or st['step']!=step:
+            st['since'], st['step']=now, step
+        if now-st['since']<hold:
+            return None
+
+        st['level']+=step
+        st['since']=None
+        st['transitions']+=1
+        return 'congested' if step>0 else 'relieved'
+
+    '''Returns whether an AP is congested
+       @param OccupancyEstimator object
+       @param str ap_name
+       @return bool congested'''
+    def congested(self, ap_name):
+        return self.level(ap_name)>0
+
+    '''Returns the congestion level of an AP
+       @param OccupancyEstimator object
+       @param str ap_name
+       @return int level (0 = idle)'''
+    def level(self, ap_name):
+        return self.__states.get(ap_name, {}).get('level', 0)
+
+    '''Returns the estimator state of an AP
+       @param OccupancyEstimator object
+       @param str ap_name
+       @return dict state (smoothed and aggregated occupation, number of reporting sources, congestion level, pending transition, transitions;
+               None if the AP has no readings)'''
+    def state(self, ap_name):
+        st=self.__states.get(ap_name)
+        if st is None:
+            return None
+        return { 'smoothed': st['smoothed'],
+                 'aggregate': st['aggregate'],
+                 'sources': len(st['readings']),
+                 'level': st['level'],
+                 'pending': st['since'] is not None, #the smoothed occupation is beyond a threshold, waiting for the hold time
+                 'transitions': st['transitions'] }
+
+    '''Returns the estimator states of all APs
+       @param OccupancyEstimator object
+       @return <str, dict> states'''
+    def states(self):
+        return {ap_name: self.state(ap_name) for ap_name in self.__states}
+
+    '''Drops the state of an AP (e.g. when it leaves the network)
+       @param OccupancyEstimator object
+       @param str ap_name'''
+    def forget(self, ap_name):
+        self.__states.pop(ap_name, None)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+"""Fast-path pre-classifier of Packet-In frames used by DroneController.py. Instead of building a full ryu.lib.packet.Packet for every Packet-In, it
+   peeks at the fields the controller needs by fixed offsets on the raw frame (Ethernet II, no VLAN tag):
+      ethertype (12) | ARP: sender/target IPv4 (28/38) | IPv4: IHL and TOS (14/15), protocol (23), src/dst (26/30), UDP header (14+IHL)
+   and returns the traffic class with its fields. Frames it cannot classify safely (truncated, VLAN-tagged, non-Ethernet ARP, IPv6-like version
+   fields, fragmented notifications) are left to full parsing, which returns the same classes"""
+
+#################################################################################################################Imports
+import socket
+import struct
+
+import Notification #in-band notification format (DSCP value)
+
+########################################################################################################Global Variables
+ETH_TYPE_IP=0x0800
+ETH_TYPE_ARP=0x0806
+ETH_TYPE_LLDP=0x88cc
+IPPROTO_UDP=17
+
+ETH_HEADER=14 #Ethernet II header length (no VLAN tag)
+ARP_SIZE=28 #ARP payload length for Ethernet/IPv4
+IPV4_HEADER=20 #minimum IPv4 header length
+UDP_HEADER=8
+
+ARP_FIXED=struct.Struct('!HHBB') #hardware type, protocol type, hardware length, protocol length
+ETHERTYPE=struct.Struct('!H')
+IPV4_FRAGMENT=struct.Struct('!H') #flags and fragment offset
+
+'''Classifies a frame by fixed offsets
+   @param bytes data (frame of a Packet-In message)
+   @return (str, tuple) traffic class and fields, or None if the frame has to be fully parsed:
+           ('lldp', ()), ('arp', (src_mac, src_ip, dst_ip)), ('notification', (src_mac, offset of UDP payload)), ('ipv4', (src_ip, dst_ip)),
+           ('other', (ethertype,))'''
+def classify(data):
+    if len(data)<ETH_HEADER:
+        return None
+    ethertype=ETHERTYPE.unpack_from(data, 12)[0]
+
+    if ethertype==ETH_TYPE_LLDP:
+        return 'lldp', ()
+
+    if ethertype==ETH_TYPE_ARP:
+        if len(data)<ETH_HEADER+ARP_SIZE or ARP_FIXED.unpack_from(data, ETH_HEADER)!=(1, ETH_TYPE_IP, 6, 4): #not Ethernet/IPv4 ARP
+            return None
+        return 'arp', (data[6:12].hex(':'), socket.inet_ntoa(data[28:32]), socket.inet_ntoa(data[38:42]))
+
+    if ethertype==ETH_TYPE_IP:
+        if len(data)<ETH_HEADER+IPV4_HEADER or data[14]>>4!=4:
+            return None
+        ihl=(data[14] & 0x0f)*4 #IPv4 header length (with options)
+        if ihl<IPV4_HEADER:
+            return None
+
+        if data[15]>>2==Notification.DSCP: #DSCP value marking position notifications
+            offset=ETH_HEADER+ihl+UDP_HEADER #offset of UDP payload
+            if data[23]!=IPPROTO_UDP or IPV4_FRAGMENT.unpack_from(data, 20)[0] & 0x3fff or len(data)<offset: #not a whole UDP datagram
+                return None
+            return 'notification', (data[6:12].hex(':'), offset)
+        return 'ipv4', (socket.inet_ntoa(data[26:30]), socket.inet_ntoa(data[30:34]))
+
+    if ethertype<0x0600 or ethertype==0x8100 or ethertype==0x88a8: #802.3 length field or VLAN tag: the inner type needs full parsing
+        return None
+    return 'other', (ethertype,)
@@ -3,16 +3,31 @@
 """Usage:
    python3 Results.py [--ex1] Optional: collect telemetries for first experiment (transmit from 1 drone, receive on 4 endpoints)
                       [--ex2] Optional: collect telemetries for second experiment (transmit from 4 drones, receive on 1 endpoint + stress test on
-                                        first wireless channel"""
+                                        first wireless channel
+                      [--duration=<s>] Optional: sampling duration (default: 600 [s], or the duration of the selected experiment)
+                      [--interval=<s>] Optional: sampling interval, sub-second values are allowed (default: INTERVAL)
+                      [--interfaces=<if1,if2,...>] Optional: interfaces to sample (default: INTERFACES)
+                      [--counters=<c1,c2,...>] Optional: counters of /sys/class/net/<if>/statistics to sample on every interface (default: rx_bytes
+                                                         on wlan interfaces, tx_bytes on eth interfaces)
+                      [--sysfs] Optional: read counter files with pread instead of fetching all counters with a single rtnetlink dump per sweep
+                      [--plot=<dir>] Optional: do not sample, regenerate plots from the telemetry stored in a directory by a previous run
+
+   All interfaces are sampled by a single sampler: each sweep fetches the counters of all interfaces with one rtnetlink dump (LinkStats.py), or
+   re-reads counter files opened once with pread (--sysfs), on a monotonic deadline schedule (no drift between interfaces or over time). The first sweep is only a baseline, rates are computed on the measured time between sweeps.
+   Samples are kept in preallocated ring buffers and appended to disk during the run, as .npz chunks in a new directory of TELEMETRY_PATH (one per
+   run, with a meta.json file describing the series): a crash only loses the samples of the last chunk, and memory does not grow with duration"""
 
 #################################################################################################################Imports
 import os
 import sys
 import time
-import threading
+import json
+from datetime import datetime as dt
 import numpy as np
 import matplotlib.pyplot as plt
 
+from LinkStats import LinkStats #bulk interface counters through rtnetlink
+
 ########################################################################################################Global Variables
 INTERFACES = [ "ap1-wlan1", "ap2-wlan1", "ap3-wlan1", "ap4-wlan1",
                "ap1-eth2", "ap2-eth2", "ap3-eth2", "ap4-eth2"]
@@ -21,11 +36,19 @@ INTERVAL=20
 CAPACITY_MBPS_WLAN=54
 CAPACITY_MBPS_ETH=1000
 
-data_throughput={}
-norm_throughput={}
-timestamps={}
+RESULTS_PATH="/home/francesco2/Documenti/PycharmProjects/Smart2/Results/" #directory where plots are saved
+TELEMETRY_PATH=f"{RESULTS_PATH}telemetry/" #directory where the samples of each run are stored
+BUFFER_SWEEPS=256 #capacity of the ring buffers [sweeps]
+CHUNK_SWEEPS=64 #sweeps per chunk written to disk
+FLUSH_INTERVAL=30 #maximum time in between chunk writes [s]
+
+data_throughput={} #dictionary <series label, ndarray> of rates: Mbps for byte counters, units per second for other counters
+norm_throughput={} #dictionary <series label, ndarray> of byte rates normalized to interface capacity [%]
+timestamps={} #dictionary <series label, ndarray> of sweep times since the baseline sweep [s] (shared by all series)
 
-def get_stat_path(interface):
+def get_stat_path(interface, counter=None):
+    if counter is not None:
+        return f"/sys/class/net/{interface}/statistics/{counter}"
     if "wlan" in interface:
         return f"/sys/class/net/{interface}/statistics/rx_bytes"
     elif "eth" in interface:
@@ -33,49 +56,238 @@ def get_stat_path(interface):
     else:
         raise ValueError(f"Not-recognized interface: {interface}")
 
-def monitor_interface(interface, duration, interval):
-    rates=[]
-    norm=[]
-    times=[]
+def get_capacity(interface):
+    if "wlan" in interface:
+        return CAPACITY_MBPS_WLAN
+    elif "eth" in interface:
+        return CAPACITY_MBPS_ETH
+    return None
+
+'''Returns the series to sample: one per interface (default counter) or one per interface and counter
+   @param str[] interfaces
+   @param str[] counters (default None, meaning the default counter of each interface)
+   @return (str, str, str)[] series (label, interface, counter file path)'''
+def get_series(interfaces, counters=None):
+    if not counters:
+        return [(iface, iface, get_stat_path(iface)) for iface in interfaces]
+    return [(f"{iface}/{counter}", iface, get_stat_path(iface, counter)) for iface in interfaces for counter in counters]
+
+class TelemetrySampler: ###############################################################################Telemetry Sampler
+    '''Creates a TelemetrySampler object, sampling a set of interface counters in a single thread
+       @param (str, str, str)[] series (label, interface, counter file path)
+       @param float interval (time in between sweeps [s])
+       @param bool netlink (default True: all counters are fetched with a single rtnetlink dump per sweep; False: counter files are read)'''
+    def __init__(self, series, interval, netlink=True):
+        self.series=series
+        self.interval=interval
+        self.__fds=[None]*len(series) #file descriptor of each counter file, kept open for the whole sampling
+        self.__links=None #rtnetlink collector (LinkStats.py)
+        self.netlink=netlink
+        self.missed=0 #counter of deadlines skipped because a sweep was late
+
+    '''Opens all counter files (or the rtnetlink collector), waiting for missing interfaces to be created
+       @param TelemetrySampler object'''
+    def open(self):
+        if self.netlink:
+            try:
+                self.__links=LinkStats()
+            except OSError as e:
+                print(f"[WARNING] rtnetlink not available ({e}), reading counter files\n")
+                self.netlink=False
+
+        if self.netlink:
+            missing={iface for label, iface, path in self.series}-set(self.__links.dump())
+            while missing:
+                print(f"{', '.join(sorted(missing))} still do(es) not exist\n")
+                time.sleep(5)
+                missing-=set(self.__links.dump())
+            print(f"Proceeding Telemetry with {', '.join(label for label, iface, path in self.series)} (rtnetlink)\n")
+            return
+
+        for i, (label, iface, path) in enumerate(self.series):
+            while not os.path.exists(path):
+                print(f"{path} still does not exist\n")
+                time.sleep(5)
+            self.__fds[i]=os.open(path, os.O_RDONLY)
+        print(f"Proceeding Telemetry with {', '.join(label for label, iface, path in self.series)}\n")
+
+    '''Closes all counter files
+       @param TelemetrySampler object'''
+    def close(self):
+        if self.__links is not None:
+            self.__links.close()
+            self.__links=None
+        for i, fd in enumerate(self.__fds):
+            if fd is not None:
+                os.close(fd)
+                self.__fds[i]=None
+
+    '''Reads all counters in one pass, timestamping the sweep once (unreadable counters, e.g. of a removed interface, are NaN from then on)
+       @param TelemetrySampler object
+       @return (float, ndarray) sweep time (monotonic [s]), counter values'''
+    def sweep(self):
+        now=time.monotonic()
+        values=np.full(len(self.series), np.nan)
+        if self.__links is not None: #one rtnetlink round trip for all interfaces
+            stats=self.__links.dump()
+            for i, (label, iface, path) in enumerate(self.series):
+                value=stats.get(iface, {}).get(os.path.basename(path)) #counter names are the same as sysfs file names
+                if value is not None:
+                    values[i]=value
+            return now, values
+
+        for i, fd in enumerate(self.__fds):
+            if fd is None:
+                continue
+            try:
+                values[i]=int(os.pread(fd, 32, 0)) #sysfs attributes are regenerated when read at offset 0
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] Failed reading for {self.series[i][0]}: {e}")
+                os.close(fd)
+                self.__fds[i]=None
+        return now, values
+
+    '''Samples all counters for a duration: a baseline sweep, then a sweep at every deadline (start + k*interval). If a sweep is late by more than
+       an interval, missed deadlines are skipped. Every sweep is appended to the store
+       @param TelemetrySampler object
+       @param float duration [s]
+       @param TelemetryStore store'''
+    def run(self, duration, store):
+        start, prev=self.sweep() #baseline: first rates are not computed against zero
+        prev_time=start
+
+        k=1
+        while k*self.interval<=duration:
+            deadline=start+k*self.interval
+            delay=deadline-time.monotonic()
+            if delay>0:
+                time.sleep(delay)
+
+            now, values=self.sweep()
+            store.append(now-start, values-prev, now-prev_time)
+            prev, prev_time=values, now
+
+            late=int((time.monotonic()-start)/self.interval) #last deadline already passed
+            self.missed+=max(0, late-k)
+            k=max(k+1, late+1)
+
+class TelemetryStore: ###################################################################################Telemetry Store
+    '''Creates a TelemetryStore object: preallocated ring buffers of sweeps (time, counter deltas, measured interval), appended to disk in chunks
+       while sampling
+       @param str path (run directory, created if needed)
+       @param (str, str, str)[] series (label, interface, counter file path)
+       @param float interval (nominal sampling interval [s])
+       @param int capacity (ring buffer capacity [sweeps], default BUFFER_SWEEPS)
+       @param int chunk (sweeps per chunk, default CHUNK_SWEEPS)
+       @param float flush_interval (maximum time in between chunk writes [s], default FLUSH_INTERVAL)'''
+    def __init__(self, path, series, interval, capacity=BUFFER_SWEEPS, chunk=CHUNK_SWEEPS, flush_interval=FLUSH_INTERVAL):
+        self.path=path
+        self.chunk=min(chunk, capacity)
+        self.flush_interval=flush_interval
+
+        self.__times=np.zeros(capacity) #ring buffers (the last capacity sweeps are kept in memory)
+        self.__deltas=np.zeros((capacity, len(series)))
+        self.__intervals=np.zeros(capacity)
+        self.__count=0 #sweeps appended so far
+        self.__flushed=0 #sweeps written to disk so far
+        self.__chunks=0 #chunks written so far
+        self.__last_flush=time.monotonic()
+
+        os.makedirs(path, exist_ok=True)
+        meta={ 'series': [{'label': label, 'interface': iface, 'path': stat_path} for label, iface, stat_path in series],
+               'interval': interval,
+               'start': dt.now().isoformat() }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    '''Appends a sweep, writing a chunk when enough sweeps are pending or the last write is too old
+       @param TelemetryStore object
+       @param float t (time since baseline sweep [s])
+       @param ndarray deltas (counter deltas since previous sweep)
+       @param float interval (measured time since previous sweep [s])'''
+    def append(self, t, deltas, interval):
+        i=self.__count%len(self.__times)
+        self.__times[i]=t
+        self.__deltas[i]=deltas
+        self.__intervals[i]=interval
+        self.__count+=1
+
+        if self.__count-self.__flushed>=self.chunk or time.monotonic()-self.__last_flush>=self.flush_interval:
+            self.flush()
 
-    path=get_stat_path(interface)
+    '''Writes pending sweeps to a new chunk file (written to a temporary file and renamed, so a chunk is either complete or missing)
+       @param TelemetryStore object'''
+    def flush(self):
+        self.__last_flush=time.monotonic()
+        if self.__count==self.__flushed:
+            return
 
-    while not os.path.exists(path):
-        print(f"{path} still does not exist\n")
-        time.sleep(5)
-    print(f'Proceeding Telemetry with {interface}\n')
+        index=np.arange(self.__flushed, self.__count)%len(self.__times) #pending sweeps, in order (they may wrap around the ring)
+        name=os.path.join(self.path, f'chunk_{self.__chunks:05d}')
+        with open(f'{name}.tmp', 'wb') as f:
+            np.savez(f, times=self.__times[index], deltas=self.__deltas[index], intervals=self.__intervals[index])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{name}.tmp', f'{name}.npz')
 
-    prev_val=0
-    start_time=time.time()
-    while (time.time()-start_time)<=duration:
-        time.sleep(interval)
+        self.__chunks+=1
+        self.__flushed=self.__count
 
-        try:
-            with open(path, "r") as f:
-                curr_val=int(f.read())
-        except Exception as e:
-            print(f"[ERROR] Failed reading for {interface}: {e}")
-            break
+    '''Writes the last pending sweeps
+       @param TelemetryStore object'''
+    def close(self):
+        self.flush()
 
-        delta=curr_val-prev_val
+'''Loads the telemetry stored by a run
+   @param str path (run directory)
+   @return (dict, ndarray, ndarray, ndarray) meta, times [s] (K,), counter deltas (K, S), measured intervals [s] (K,)'''
+def load_telemetry(path):
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        meta=json.load(f)
 
-        throughput=(delta*8/interval)/1_000_000 #Mbps
+    chunks=sorted(name for name in os.listdir(path) if name.startswith('chunk_') and name.endswith('.npz'))
+    times, deltas, intervals=[], [], []
+    for name in chunks:
+        with np.load(os.path.join(path, name)) as chunk:
+            times.append(chunk['times'])
+            deltas.append(chunk['deltas'])
+            intervals.append(chunk['intervals'])
 
-        if 'wlan' in interface:
-            throughput_norm=(throughput/CAPACITY_MBPS_WLAN)*100 #percentage
-        elif 'eth' in interface:
-            throughput_norm=(throughput/CAPACITY_MBPS_ETH)*100 #percentage
+    n=len(meta['series'])
+    if not chunks:
+        return meta, np.zeros(0), np.zeros((0, n)), np.zeros(0)
+    return meta, np.concatenate(times), np.concatenate(deltas).reshape(-1, n), np.concatenate(intervals)
 
-        elapsed=time.time()-start_time
-        rates.append(throughput)
-        norm.append(throughput_norm)
-        times.append(elapsed)
+'''Computes rates of stored telemetry into data_throughput, norm_throughput and timestamps
+   @param str path (run directory)
+   @return (str, str, str)[] series (label, interface, counter file path)'''
+def compute_rates(path):
+    meta, times, deltas, intervals=load_telemetry(path)
+    series=[(s['label'], s['interface'], s['path']) for s in meta['series']]
 
-        prev_val=curr_val
+    for i, (label, iface, stat_path) in enumerate(series):
+        rate=deltas[:, i]/intervals #counter units per second
+        capacity=get_capacity(iface)
+        if stat_path.endswith('_bytes'):
+            rate=rate*8/1_000_000 #Mbps
+            if capacity is not None:
+                norm_throughput[label]=(rate/capacity)*100 #percentage
+        data_throughput[label]=rate
+        timestamps[label]=times
+    return series
 
-    data_throughput[interface]=np.array(rates)
-    norm_throughput[interface]=np.array(norm)
-    timestamps[interface]=np.array(times)
+def monitor_interfaces(series, duration, interval, path, netlink=True):
+    sampler=TelemetrySampler(series, interval, netlink)
+    store=TelemetryStore(path, series, interval)
+    sampler.open()
+    try:
+        sampler.run(duration, store)
+    finally:
+        sampler.close()
+        store.close() #samples collected before an interruption are kept on disk
+    if sampler.missed:
+        print(f"[WARNING] {sampler.missed} sampling deadlines missed\n")
+    print(f"Telemetry stored in {path}\n")
 
 def plot_results(group_name, interfaces, data_dict, ylabel, filename):
     linestyles = ['-', '--', '-.', ':']
@@ -94,38 +306,43 @@ def plot_results(group_name, interfaces, data_dict, ylabel, filename):
     plt.legend()
     plt.grid(True)
     plt.tight_layout()
-    plt.savefig(f"/home/francesco2/Documenti/PycharmProjects/Smart2/Results/{filename}.png")
+    plt.savefig(f"{RESULTS_PATH}{filename}.png")
     plt.close()
 
 if __name__ == "__main__":
-    threads=[]
+    option=lambda name, default: next((arg.split('=', 1)[1] for arg in sys.argv if arg.startswith(f'--{name}=')), default)
 
+    DURATION=600
     if '--ex1' in sys.argv:
         DURATION=600 #first experiment
     elif '--ex2' in sys.argv:
         DURATION=700 #second experiment
+    DURATION=float(option('duration', DURATION))
+    interval=float(option('interval', INTERVAL))
+    interfaces=option('interfaces', ','.join(INTERFACES)).split(',')
+    counters=option('counters', None)
+    counters=counters.split(',') if counters else None
 
-    for iface in INTERFACES:
-        t=threading.Thread(target=monitor_interface, args=(iface, DURATION, INTERVAL))
-        t.start()
-        threads.append(t)
+    run_path=option('plot', None) #plots are regenerated from a previous run
+    if run_path is None:
+        run_path=f"{TELEMETRY_PATH}{dt.now():%Y%m%d-%H%M%S}"
+        monitor_interfaces(get_series(interfaces, counters), DURATION, interval, run_path, netlink='--sysfs' not in sys.argv)
+        print(f"Sampling Finished\n")
 
-    for t in threads:
-        t.join()
-        print(f"Thread Finished\n")
+    series=compute_rates(run_path)
 
-    wlan_ifaces=[i for i in INTERFACES if "wlan" in i]
+    wlan_ifaces=[label for label, iface, path in series if "wlan" in iface]
     for wintf in wlan_ifaces:
         print(f"WLAN Interface: {wintf}\n")
         print(f"Received Throughput: {data_throughput[wintf]}\n")
-        print(f"Normalized Received Throughput: {norm_throughput[wintf]}\n")
+        print(f"Normalized Received Throughput: {norm_throughput.get(wintf)}\n")
         print(f"\n")
 
-    eth_ifaces=[i for i in INTERFACES if "eth" in i]
+    eth_ifaces=[label for label, iface, path in series if "eth" in iface]
     for intf in eth_ifaces:
         print(f"Eth Interface: {intf}\n")
         print(f"Transmitted Throughput: {data_throughput[intf]}\n")
-        print(f"Normalized Transmitted Throughput: {norm_throughput[intf]}\n")
+        print(f"Normalized Transmitted Throughput: {norm_throughput.get(intf)}\n")
         print(f"\n")
 
     plot_results("wlan", wlan_ifaces, data_throughput, "Received Throughput [Mbps]", "wlan_throughput")
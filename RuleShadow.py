@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+"""Desired-state shadow of the flow, group, and meter tables of OVSAPs. The controller keeps describing the rules each AP should contain (as OpenFlow
+   FlowMod/GroupMod/MeterMod messages), and the shadow turns every message into the minimal delta with respect to what has already been installed:
+   rules identical to installed ones are dropped, ADDs of existing rules become MODIFYs, and MODIFYs of missing groups/meters become ADDs.
+   Changes of sent messages are staged in a journal (so that later deltas already account for them) and become installed state only when the AP
+   confirms them with a barrier reply; changes of messages rejected by the AP are rolled back"""
+
+MISSING=object() #placeholder of a table entry which does not exist (before its addition or after its deletion)
+
+class RuleShadow: ##########################################################################################Rule Shadow
+    '''Creates an empty RuleShadow object'''
+    def __init__(self):
+        self.__tables={} #dictionary <DPID, <str, dict>> associating each AP to its flow, group, and meter tables
+        self.__requested=0 #counter of messages requested by the controller
+        self.__sent=0 #counter of messages actually sent to APs
+        self.__modified=0 #counter of ADD messages turned into MODIFY messages
+        self.__staged={} #dictionary <DPID, <int, list>> of table changes waiting for confirmation, in order ([seq, table, key, previous, new, msg])
+        self.__seq=0 #sequence number of the next table change
+        self.__rolled_back=0 #counter of table changes rolled back
+        self.__current=None #(DPID, journal, message) of the message being applied
+
+    '''Returns the delta message for a requested FlowMod, GroupMod or MeterMod, and records the resulting table state. Other messages are returned
+       unchanged
+       @param RuleShadow object
+       @param Datapath datapath (reference to destination AP)
+       @param OFPMsgBase msg
+       @param list journal (default None, meaning the table state is recorded as confirmed; otherwise table changes are staged and appended to
+              the journal, until they are confirmed or rolled back)
+       @return OFPMsgBase msg (None if the requested rule is already installed)'''
+    def apply(self, datapath, msg, journal=None):
+        parser=datapath.ofproto_parser
+        tables=self.__tables.setdefault(datapath.id, {'flows': {}, 'groups': {}, 'meters': {}})
+        self.__current=(datapath.id, journal, msg) #AP, journal and message of the table changes being recorded
+
+        if isinstance(msg, parser.OFPFlowMod):
+            delta=self.flow_delta(datapath, tables, msg)
+        elif isinstance(msg, parser.OFPGroupMod):
+            delta=self.group_delta(datapath, tables, msg)
+        elif isinstance(msg, parser.OFPMeterMod):
+            delta=self.entry_delta(tables['meters'], msg.meter_id, (msg.flags, str(msg.bands)), msg,
+                                   datapath.ofproto.OFPMC_ADD, datapath.ofproto.OFPMC_MODIFY, datapath.ofproto.OFPMC_DELETE)
+        else:
+            return msg
+
+        self.__requested+=1
+        if delta is not None:
+            self.__sent+=1
+        return delta
+
+    '''Sets a table entry (or deletes it, if the new value is MISSING), staging the change when the message has a journal
+       @param RuleShadow object
+       @param dict table
+       @param key (flow rule key or group/meter ID)
+       @param new (entry value, or MISSING)'''
+    def record(self, table, key, new):
+        previous=table.get(key, MISSING)
+        if new is MISSING:
+            table.pop(key, None)
+        else:
+            table[key]=new
+
+        dpid, journal, msg=self.__current
+        if journal is not None:
+            change=[self.__seq, table, key, previous, new, msg]
+            self.__staged.setdefault(dpid, {})[self.__seq]=change
+            journal.append(change)
+            self.__seq+=1
+
+    '''Returns the delta message for a FlowMod. Flow rules are identified by table, priority and match
+       @param RuleShadow object
+       @param Datapath datapath
+       @param <str, dict> tables
+       @param OFPFlowMod msg
+       @return OFPFlowMod msg (None if already installed)'''
+    def flow_delta(self, datapath, tables, msg):
+        ofproto=datapath.ofproto
+        parser=datapath.ofproto_parser
+        flows=tables['flows'] #dictionary <(table, priority, match), (spec, set of referenced group IDs)>
+        key=(msg.table_id, msg.priority, str(sorted(msg.match.items())))
+
+        if msg.command==ofproto.OFPFC_DELETE_STRICT:
+            if key in flows:
+                self.record(flows, key, MISSING)
+            return msg
+        if msg.command==ofproto.OFPFC_DELETE: #non-strict deletion may remove several rules, the shadow of the table is no longer reliable
+            for key in list(flows):
+                self.record(flows, key, MISSING)
+            return msg
+
+        spec=(str(msg.instructions), msg.cookie, msg.idle_timeout, msg.hard_timeout)
+        groups={action.group_id for inst in msg.instructions for action in getattr(inst, 'actions', None) or []
+                if isinstance(action, parser.OFPActionGroup)} #groups used by the rule (their deletion removes the rule)
+        current=flows.get(key)
+        if current is not None and current[0]==spec: #rule already installed
+            return None
+
+        self.record(flows, key, (spec, groups))
+        if current is not None and current[0][1:]==spec[1:] and msg.command==ofproto.OFPFC_ADD:
+            msg.command=ofproto.OFPFC_MODIFY_STRICT #only instructions change: modify rule in place, keeping its counters
+            self.__modified+=1
+        return msg
+
+    '''Returns the delta message for a GroupMod. Deleting a group also removes the flow rules using it from the shadow
+       @param RuleShadow object
+       @param Datapath datapath
+       @param <str, dict> tables
+       @param OFPGroupMod msg
+       @return OFPGroupMod msg (None if already installed)'''
+    def group_delta(self, datapath, tables, msg):
+        ofproto=datapath.ofproto
+        if msg.command==ofproto.OFPGC_DELETE:
+            flows=tables['flows']
+            for key in [key for key, (spec, groups) in flows.items() if msg.group_id in groups or msg.group_id==ofproto.OFPG_ALL]:
+                self.record(flows, key, MISSING)
+            if msg.group_id==ofproto.OFPG_ALL:
+                for group_id in list(tables['groups']):
+                    self.record(tables['groups'], group_id, MISSING)
+
+        return self.entry_delta(tables['groups'], msg.group_id, (msg.type, str(msg.buckets)), msg,
+                                ofproto.OFPGC_ADD, ofproto.OFPGC_MODIFY, ofproto.OFPGC_DELETE)
+
+    '''Returns the delta message for an entry of the group or meter table, identified by its ID
+       @param RuleShadow object
+       @param <int, tuple> table
+       @param int entry_id
+       @param tuple spec (description of the entry)
+       @param OFPMsgBase msg
+       @param int add (ADD command)
+       @param int modify (MODIFY command)
+       @param int delete (DELETE command)
+       @return OFPMsgBase msg (None if already installed)'''
+    def entry_delta(self, table, entry_id, spec, msg, add, modify, delete):
+        if msg.command==delete:
+            if entry_id in table:
+                self.record(table, entry_id, MISSING)
+            return msg
+
+        current=table.get(entry_id)
+        if current==spec: #entry already installed
+            return None
+
+        self.record(table, entry_id, spec)
+
+        command=add if current is None else modify #ADD a missing entry, MODIFY an existing one
+        if command!=msg.command:
+            msg.command=command
+            if command==modify:
+                self.__modified+=1
+        return msg
+
+    '''Drops the shadow of an AP (e.g. when it disconnects, since its tables are lost)
+       @param RuleShadow object
+       @param int dpid'''
+    def forget(self, dpid):
+        self.__tables.pop(dpid, None)
+        self.__staged.pop(dpid, None)
+
+    '''Confirms the table changes of a journal (the AP has processed its messages)
+       @param RuleShadow object
+       @param int dpid
+       @param list journal'''
+    def confirm(self, dpid, journal):
+        staged=self.__staged.get(dpid, {})
+        for change in journal:
+            staged.pop(change[0], None)
+        journal.clear()
+
+    '''Rolls back the table changes of a journal (the AP has rejected its messages), newest first. A change overwritten by a later staged change
+       is not restored: the later change will restore the previous entry instead, if it is rolled back too
+       @param RuleShadow object
+       @param int dpid
+       @param list journal
+       @param set xids (default None, meaning all changes of the journal; otherwise only changes of the messages with these transaction IDs)
+       @return int number of changes rolled back'''
+    def rollback(self, dpid, journal, xids=None):
+        staged=self.__staged.get(dpid, {})
+        changes=[change for change in journal if xids is None or change[5].xid in xids]
+        for change in reversed(changes):
+            seq, table, key, previous, new, msg=change
+            staged.pop(seq, None)
+            later=next((later for later in staged.values() if later[0]>seq and later[1] is table and later[2]==key), None)
+            if later is not None:
+                later[3]=previous #entry changed again by a later message
+            elif table.get(key, MISSING) is new:
+                if previous is MISSING:
+                    table.pop(key, None)
+                else:
+                    table[key]=previous
+            journal.remove(change)
+        self.__rolled_back+=len(changes)
+        return len(changes)
+
+    '''Returns shadow statistics
+       @param RuleShadow object
+       @return <str, int> stats'''
+    def stats(self):
+        return { 'requested': self.__requested,
+                 'sent': self.__sent,
+                 'skipped': self.__requested-self.__sent,
+                 'modified': self.__modified,
+                 'unconfirmed': sum(len(staged) for staged in self.__staged.values()),
+                 'rolled_back': self.__rolled_back,
+                 'flows': sum(len(tables['flows']) for tables in self.__tables.values()),
+                 'groups': sum(len(tables['groups']) for tables in self.__tables.values()),
+                 'meters': sum(len(tables['meters']) for tables in self.__tables.values()) }
@@ -8,6 +8,9 @@ from scapy.sendrecv import sendp #send packets on L2 interfaces
 
 import argparse #parsing CLI arguments
 import logging #regulate verbosity of Python runtime output
+import re
+
+import Notification #in-band notification format (binary, with text fallback)
 
 ######################################################################################Elephant Flows Detection Algorithm
 logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
@@ -21,20 +24,30 @@ if __name__ == '__main__':
     parser.add_argument('--dst', type=str, help='IPv4 destination address')
     parser.add_argument('--pos', type=str, help='Current position of this drone')
     parser.add_argument('--occ', type=float, default=0.0, help='Current bandwidth occupation on AP')
+    parser.add_argument('--rate', type=float, default=0.0, help='Current tx bitrate of this drone [Mbit/s]')
+    parser.add_argument('--seq', type=int, default=0, help='Sequence number of this notification')
+    parser.add_argument('--copies', type=int, default=5, help='Number of copies of this notification (to deal with losses due to wireless medium)')
+    parser.add_argument('--format', type=str, default='binary', choices=['binary', 'text'], help='Notification payload format')
     args=parser.parse_args() #parsed arguments
 
     out_intf=f'{args.drone}-wlan0' #L2 interface on server
-    DSCP_MARK=0b000011<<2 #DS (or TOS equivalently) header field 00001100 (used to mark notification packets)
+    DSCP_MARK=Notification.DSCP<<2 #DS (or TOS equivalently) header field 00001100 (used to mark notification packets)
 
-    load=f'pos:{args.pos}/occ:{args.occ}'
+    if args.format=='binary': #fixed-layout binary payload
+        drone_id=int(re.search(r'\d+', args.drone).group()) #extract drone number
+        position=tuple(map(float, args.pos.split(',')))
+        load=Notification.pack_notification(drone_id, args.seq, position, args.occ, args.rate)
+    else: #legacy text payload
+        load=Notification.pack_text(args.pos, args.occ)
 
     flag_packet=Ether(dst='ff:ff:ff:ff:ff:ff')/IP(src=args.src, dst=args.dst)/UDP()/Raw(load=load)
     flag_packet[IP].tos=DSCP_MARK #mark signal packet by setting value of IPv4 DS field (DS field is equivalent to TOS field)
 
-    for i in range(5): #send the notification 5 times to deal with losses due to wireless medium
+    for i in range(args.copies): #send the notification several times to deal with losses due to wireless medium
         sendp(flag_packet, iface=out_intf) #transmit marked packet on drone's L2 exit interface
 
-    print(f"Drone {args.drone}:{out_intf} ({args.src}). Current position: {args.pos}. Bandwidth occupation: {args.occ}\n")
+    print(f"Drone {args.drone}:{out_intf} ({args.src}). Current position: {args.pos}. Bandwidth occupation: {args.occ}. Tx bitrate: {args.rate}. "
+          f"Sequence number: {args.seq}\n")
     print(f"Packet: {flag_packet.show()}\n")
     print(f"Payload: {flag_packet[Raw].load}\n")
     print(f"\n")
\ No newline at end of file
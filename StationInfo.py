@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""Wireless link state of stations through nl80211 (generic netlink): a single station dump (NL80211_CMD_GET_STATION) on an AP interface returns
+   tx/rx bitrate, signal, and inactivity of every station associated with it, instead of running `iw dev <station>-wlan0 link` in the namespace
+   of each station. Dumps of all AP interfaces are taken in one pass and cached, so link state of the whole fleet is collected once per cycle.
+   Bitrates and signal are seen from the AP: the tx bitrate of a station towards its AP is the AP's rx bitrate from the station.
+   Used by FootballStreaming.py (APs' interfaces live in the root namespace)"""
+
+#################################################################################################################Imports
+import socket
+import struct
+import threading
+import time
+
+from LinkStats import RTATTR, dump_messages, attributes #netlink messages and attributes
+
+########################################################################################################Global Variables
+NETLINK_GENERIC=16
+GENL_ID_CTRL=0x10
+CTRL_CMD_GETFAMILY=3
+CTRL_ATTR_FAMILY_ID=1
+CTRL_ATTR_FAMILY_NAME=2
+
+NL80211_CMD_GET_STATION=17
+NL80211_CMD_NEW_STATION=19
+NL80211_ATTR_IFINDEX=3
+NL80211_ATTR_MAC=6
+NL80211_ATTR_STA_INFO=21
+
+NL80211_STA_INFO_INACTIVE_TIME=1 #[ms] (u32)
+NL80211_STA_INFO_SIGNAL=7 #[dBm] (s8)
+NL80211_STA_INFO_TX_BITRATE=8 #nested rate info
+NL80211_STA_INFO_SIGNAL_AVG=13 #[dBm] (s8)
+NL80211_STA_INFO_RX_BITRATE=14 #nested rate info
+NL80211_STA_INFO_CONNECTED_TIME=16 #[s] (u32)
+NL80211_RATE_INFO_BITRATE=1 #[100 kbit/s] (u16)
+NL80211_RATE_INFO_BITRATE32=5 #[100 kbit/s] (u32)
+
+GENLMSG_HEADER=struct.Struct('=BBH') #command, version, reserved
+
+'''Returns a bitrate from an nl80211 rate info attribute
+   @param bytes value (nested rate info)
+   @return float bitrate [Mbit/s] (None if missing)'''
+def bitrate(value):
+    rate=attributes(value, 0, len(value))
+    if NL80211_RATE_INFO_BITRATE32 in rate:
+        return struct.unpack_from('=I', rate[NL80211_RATE_INFO_BITRATE32])[0]/10
+    if NL80211_RATE_INFO_BITRATE in rate:
+        return struct.unpack_from('=H', rate[NL80211_RATE_INFO_BITRATE])[0]/10
+    return None
+
+class StationInfo: ######################################################################################Station Info
+    '''Creates a StationInfo object, opening its generic netlink socket and resolving the nl80211 family
+       @param str[] interfaces (AP interfaces whose stations are dumped, e.g. ap1-wlan1)'''
+    def __init__(self, interfaces):
+        self.interfaces=list(interfaces)
+        self.__sock=socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.__sock.bind((0, 0))
+        self.__seq=0 #sequence number of the last dump request
+        self.__lock=threading.Lock() #dumps are serialized (the provider is shared by send position threads)
+        self.__cache=({}, 0.0) #last dump and its (monotonic) time
+        self.dumps=0 #counter of dumps (one per AP interface)
+        self.__family=self.resolve('nl80211')
+
+    '''Returns the ID of a generic netlink family
+       @param StationInfo object
+       @param str name
+       @return int family ID'''
+    def resolve(self, name):
+        family=None
+        with self.__lock:
+            self.__seq+=1
+            for msg_type, data, start, end in dump_messages(self.__sock, GENL_ID_CTRL, self.__seq, GENLMSG_HEADER.pack(CTRL_CMD_GETFAMILY, 1, 0)):
+                attrs=attributes(data, start+GENLMSG_HEADER.size, end)
+                if attrs.get(CTRL_ATTR_FAMILY_NAME, b'').rstrip(b'\0').decode()==name: #the whole dump is read, leaving no reply in the socket
+                    family=struct.unpack_from('=H', attrs[CTRL_ATTR_FAMILY_ID])[0]
+        if family is None:
+            raise OSError(f"generic netlink family {name} not available")
+        return family
+
+    '''Returns the link state of all stations associated with the AP interfaces, with one station dump per interface
+       @param StationInfo object
+       @return <str, dict> stations (station MAC address -> interface, tx_bitrate [Mbit/s], rx_bitrate [Mbit/s], signal [dBm], signal_avg [dBm],
+               inactive [ms], connected [s]; missing values are None)'''
+    def dump(self):
+        with self.__lock:
+            stations={}
+            for interface in self.interfaces:
+                try:
+                    ifindex=socket.if_nametoindex(interface)
+                except OSError: #interface not created yet
+                    continue
+
+                self.__seq+=1
+                request=GENLMSG_HEADER.pack(NL80211_CMD_GET_STATION, 0, 0)+RTATTR.pack(RTATTR.size+4, NL80211_ATTR_IFINDEX)+struct.pack('=I', ifindex)
+                for msg_type, data, start, end in dump_messages(self.__sock, self.__family, self.__seq, request):
+                    if data[start]!=NL80211_CMD_NEW_STATION:
+                        continue
+                    attrs=attributes(data, start+GENLMSG_HEADER.size, end)
+                    if NL80211_ATTR_MAC not in attrs:
+                        continue
+                    mac=':'.join(f'{b:02x}' for b in attrs[NL80211_ATTR_MAC][:6])
+                    stations[mac]=self.parse_station(interface, attrs.get(NL80211_ATTR_STA_INFO, b''))
+                self.dumps+=1
+
+            self.__cache=(stations, time.monotonic())
+            return stations
+
+    '''Parses the station info attribute of a station
+       @param StationInfo object
+       @param str interface (AP interface the station is associated with)
+       @param bytes value (nested station info)
+       @return dict station'''
+    def parse_station(self, interface, value):
+        info=attributes(value, 0, len(value))
+        u32=lambda attr: struct.unpack_from('=I', info[attr])[0] if attr in info else None
+        s8=lambda attr: struct.unpack_from('=b', info[attr])[0] if attr in info else None
+        return { 'interface': interface,
+                 'tx_bitrate': bitrate(info[NL80211_STA_INFO_TX_BITRATE]) if NL80211_STA_INFO_TX_BITRATE in info else None, #AP -> station
+                 'rx_bitrate': bitrate(info[NL80211_STA_INFO_RX_BITRATE]) if NL80211_STA_INFO_RX_BITRATE in info else None, #station -> AP
+                 'signal': s8(NL80211_STA_INFO_SIGNAL),
+                 'signal_avg': s8(NL80211_STA_INFO_SIGNAL_AVG),
+                 'inactive': u32(NL80211_STA_INFO_INACTIVE_TIME),
+                 'connected': u32(NL80211_STA_INFO_CONNECTED_TIME) }
+
+    '''Returns the link state of all stations, reusing the last dump if it is recent enough (threads of the same cycle share a dump)
+       @param StationInfo object
+       @param float max_age (maximum age of the reused dump [s], default 0 meaning always dump)
+       @return <str, dict> stations'''
+    def snapshot(self, max_age=0.0):
+        stations, stamp=self.__cache
+        if max_age>0 and time.monotonic()-stamp<=max_age:
+            return stations
+        return self.dump()
+
+    '''Returns the link state of a station
+       @param StationInfo object
+       @param str mac (station MAC address)
+       @param float max_age (maximum age of the reused dump [s], default 0 meaning always dump)
+       @return dict station (None if the station is not associated with any AP interface)'''
+    def get(self, mac, max_age=0.0):
+        return self.snapshot(max_age).get(mac.lower())
+
+    '''Closes the generic netlink socket
+       @param StationInfo object'''
+    def close(self):
+        self.__sock.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+"""Usage:
+   python3 Topology.py [--fleet=<drones>] [--grid=<rows>x<cols>] [--field=<width>x<length>] [--height=<meters>] [--tiers=<file>] [--policy=<file>]
+                       [--out=<file>]
+
+   Parametric description of the emulated network, shared by FootballStreaming.py (which generates the Mininet-WiFi network from it) and
+   DroneController.py (which loads it at start-up). The description is a JSON object built from a few parameters:
+      - fleet size: drones are assigned to APs round-robin (drone i to AP (i-1)%M+1); drones of an AP take off in waves, the first wave is deployed
+        and every following wave replaces the previous one when its energy is over
+      - AP grid: rows x cols APs covering the football field, numbered in snake order (left to right on even rows, right to left on odd rows); each
+        AP covers a cell of the field and its drones hover over the center of the cell
+      - channels: 5 GHz channels assigned to APs in order
+      - quality ladder: video tiers streamed by every drone, from the best to the worst (name, L4 port the drone streams to, video format used for the
+        meter rate, video file); default: high (8888) and low (7777) quality, a JSON list of tiers can be given with --tiers
+      - endpoints: one endpoint per AP (on Ethernet port 2)
+      - subscriber policies: for every endpoint, the tier it is subscribed to, its priority, and its guaranteed and maximum rate [kbps] (0 = link
+        rate). By default endpoints are subscribed to the tiers round-robin (with the default ladder, odd endpoints receive high quality streams and
+        even endpoints low quality streams), better tiers have higher priority (0 = highest), and one stream of the tier is guaranteed; a JSON
+        object <endpoint name, policy fields> given with --policy overrides them. Every endpoint has an egress queue (its policy queue ID) on every
+        AP port leading to it: the emulator configures the queues on OVS ports, the controller sends streams to them
+      - backbone: full mesh of Ethernet links between APs (ports 3, 4, ... towards the other APs, in AP order); streaming and broadcast rules forward
+        on a single backbone hop, so only the mesh shape is supported
+      - trouble-maker nodes (--test): a station associated with the first AP and a host on the first AP's first free Ethernet port
+   The default parameters (8 drones, 2x2 APs) describe the original network. Running this module writes a description (default: DEFAULT_PATH),
+   to be used by both the controller and the emulator"""
+
+#################################################################################################################Imports
+import sys
+import json
+
+########################################################################################################Global Variables
+DEFAULT_PATH="/home/francesco2/Documenti/PycharmProjects/Smart2/topology.json" #description loaded by the controller and the emulator
+
+SUBNET='192.168.1' #drone network /24 prefix (broadcast address is SUBNET.255)
+DPID_BASE=13 #DPID of the first AP
+LISTEN_PORT_BASE=6654 #OpenFlow listening port of the first AP
+STREAM_PORT_BASE=1231 #L4 port where endpoints receive the video of the first drone
+LINK_BW=1000 #bandwidth of Ethernet links [Mbit/s]
+CHANNELS=[36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128, 132, 136, 140, 149, 153, 157, 161, 165] #5 GHz channels (20 MHz)
+BACKBONES=('mesh',) #supported backbone shapes
+TIERS=[ { 'name': 'high', 'port': 8888, 'format': [720, 1280, 60, 0.5], 'video': 'OnePiece_Ep_0223_SUB_ITA.mp4' },
+        { 'name': 'low', 'port': 7777, 'format': [480, 720, 30, 0.5], 'video': 'low_res.mp4' } ] #default quality ladder, from the best to the worst tier
+                                                           #(format: num X pixels, num Y pixels, fps, compression rate (H.264))
+
+'''Builds a topology description
+   @param int drones (fleet size, a multiple of the number of APs)
+   @param int rows (rows of the AP grid)
+   @param int cols (columns of the AP grid)
+   @param (float, float) field (width and length of the covered area [m])
+   @param float height (hovering height [m])
+   @param str backbone (backbone shape)
+   @param dict[] tiers (quality ladder from the best to the worst tier, default None meaning TIERS)
+   @param <str, dict> policies (subscriber policy fields overriding the default ones of each endpoint, default None)
+   @return dict description'''
+def describe(drones=8, rows=2, cols=2, field=(105, 68), height=35, backbone='mesh', tiers=None, policies=None):
+    n_aps=rows*cols
+    if n_aps<1 or drones<n_aps or drones%n_aps!=0:
+        raise ValueError(f"Fleet size ({drones}) must be a positive multiple of the number of APs ({n_aps})")
+    if drones+n_aps+10>254:
+        raise ValueError(f"{drones} drones and {n_aps} endpoints do not fit in {SUBNET}.0/24")
+    if backbone not in BACKBONES:
+        raise ValueError(f"Unsupported backbone shape '{backbone}' (supported: {', '.join(BACKBONES)})")
+    tiers=TIERS if tiers is None else tiers
+    if not tiers or len({tier['name'] for tier in tiers})!=len(tiers) or len({tier['port'] for tier in tiers})!=len(tiers):
+        raise ValueError("Quality ladder must have at least one tier, with unique names and ports")
+
+    width, length=field
+    waves=drones//n_aps #drones per AP
+
+    aps={} #dictionary <AP name, dict>
+    for k in range(n_aps):
+        r=k//cols #grid row
+        c=k%cols if r%2==0 else cols-1-k%cols #grid column (snake order)
+        name=f'ap{k+1}'
+        aps[name]={ 'dpid': DPID_BASE+k,
+                    'listen_port': LISTEN_PORT_BASE+k,
+                    'channel': CHANNELS[k%len(CHANNELS)],
+                    'position': [c*width/(cols-1) if cols>1 else 0, r*length/(rows-1) if rows>1 else 0, 0],
+                    'hover': [(c+0.5)*width/cols, (r+0.5)*length/rows, height], #center of the covered cell
+                    'endpoint': f'endpoint{k+1}',
+                    'drones': [f'drone{k+1+w*n_aps}' for w in range(waves)],
+                    'backbone': {} } #dictionary <neighbour AP name, port name>
+
+    for name, ap in aps.items(): #full mesh: ports 3, 4, ... towards the other APs, in AP order
+        neighbours=[other for other in aps if other!=name]
+        ap['backbone']={other: f'{name}-eth{3+i}' for i, other in enumerate(neighbours)}
+    links=[[a, port_number(aps[a]['backbone'][b]), b, port_number(aps[b]['backbone'][a])]
+           for i, a in enumerate(aps) for b in list(aps)[i+1:]] #[AP, port, AP, port] backbone links
+
+    fleet={} #dictionary <drone name, dict>
+    for i in range(1, drones+1):
+        ap=f'ap{(i-1)%n_aps+1}'
+        group=aps[ap]['drones']
+        wave=(i-1)//n_aps
+        fleet[f'drone{i}']={ 'ip': f'{SUBNET}.{i}',
+                             'mac': f'02:00:00:{(i-1)>>8:02x}:{(i-1)&0xff:02x}:00', #mac80211_hwsim address of the drone's radio
+                             'ap': ap,
+                             'hover': aps[ap]['hover'],
+                             'wave': wave, #0 = deployed at start-up, w = w-th replacement
+                             'replacement': group[(wave+1)%waves] if waves>1 else None, #drone taking over when energy is over
+                             'stream_port': STREAM_PORT_BASE+i-1 } #L4 port where endpoints receive the drone's video
+
+    endpoints={} #dictionary <endpoint name, dict>
+    for k in range(n_aps):
+        ip=drones+k+1
+        endpoints[f'endpoint{k+1}']={ 'ip': f'{SUBNET}.{ip}',
+                                      'mac': f'00:00:00:00:00:{ip:02x}',
+                                      'ap': f'ap{k+1}' }
+
+    subscribers={} #dictionary <endpoint name, dict> (subscriber policy table)
+    names=[tier['name'] for tier in tiers]
+    for k, name in enumerate(endpoints):
+        policy=(policies or {}).get(name, {})
+        if policy.get('tier', names[k%len(tiers)]) not in names:
+            raise ValueError(f"Endpoint {name} is subscribed to unknown tier '{policy['tier']}'")
+        tier=names.index(policy.get('tier', names[k%len(tiers)]))
+        subscribers[name]={ 'tier': names[tier], #tier the endpoint is subscribed to
+                            'priority': tier, #priority of the endpoint's queue (0 = highest)
+                            'min_rate': tier_rate(tiers[tier]), #guaranteed rate [kbps]
+                            'max_rate': 0, #maximum rate [kbps] (0 = link rate)
+                            'queue': k+1 } #queue ID of the endpoint on AP ports leading to it
+        subscribers[name].update(policy)
+
+    first=next(iter(aps)) #trouble-makers connect to the first AP
+    trouble={ 'station': {'name': 'station1', 'ip': f'{SUBNET}.{drones+n_aps+9}', 'ap': first, 'port': f'{first}-wlan1'},
+              'host': {'name': 'host2', 'ip': f'{SUBNET}.{drones+n_aps+10}', 'ap': first, 'port': f'{first}-eth{3+len(aps[first]["backbone"])}'} }
+
+    return { 'fleet_size': drones,
+             'grid': [rows, cols],
+             'field': [width, length],
+             'height': height,
+             'backbone': backbone,
+             'tiers': tiers,
+             'broadcast': f'{SUBNET}.255',
+             'aps': aps,
+             'drones': fleet,
+             'endpoints': endpoints,
+             'policies': subscribers,
+             'links': links,
+             'trouble': trouble }
+
+'''Saves a topology description as JSON file
+   @param dict description
+   @param str path (default DEFAULT_PATH)'''
+def save(description, path=DEFAULT_PATH):
+    with open(path, 'w') as f:
+        json.dump(description, f, indent=2)
+
+'''Loads a topology description, or builds the default one if the file does not exist
+   @param str path (default DEFAULT_PATH)
+   @return dict description'''
+def load(path=DEFAULT_PATH):
+    try:
+        with open(path, 'r') as f:
+            description=json.load(f)
+    except FileNotFoundError:
+        return describe()
+    description.setdefault('tiers', TIERS) #descriptions written before the quality ladder have the default tiers
+    if 'policies' not in description: #descriptions written before subscriber policies have the default ones
+        description['policies']=describe(len(description['drones']), *description['grid'], tiers=description['tiers'],
+                                         policies={name: {'tier': e['quality']} for name, e in description['endpoints'].items() if 'quality' in e})['policies']
+    return description
+
+'''Returns the ports of an AP leading to each endpoint: the endpoint port for its own endpoint, and the backbone port towards the AP of every
+   other endpoint
+   @param dict description
+   @param str ap_name
+   @return <str, str> endpoints (port name -> endpoint name)'''
+def port_endpoints(description, ap_name):
+    aps=description['aps']
+    ports={f'{ap_name}-eth2': aps[ap_name]['endpoint']}
+    ports.update({port: aps[other]['endpoint'] for other, port in aps[ap_name]['backbone'].items()})
+    return ports
+
+'''Returns the port names of an AP receiving each tier of the quality ladder from its drones: the endpoint port, and the backbone ports towards the
+   other APs (according to the tier their endpoints are subscribed to)
+   @param dict description
+   @param str ap_name
+   @return str[][] port names subscribed to each tier (in ladder order)'''
+def stream_ports(description, ap_name):
+    ports=port_endpoints(description, ap_name)
+    return [[port for port, endpoint in ports.items() if description['policies'][endpoint]['tier']==tier['name']] for tier in description['tiers']]
+
+'''Returns the meter rate of a tier of the quality ladder, from its video format (pixels x fps x compression rate)
+   @param dict tier
+   @return int rate [kbps]'''
+def tier_rate(tier):
+    rate=1 #[bps]
+    for val in tier['format']:
+        rate*=val
+    return int(rate/1000) #[kbps]
+
+'''Returns the number of an AP port from its name (e.g. ap1-eth3 -> 3)
+   @param str port_name
+   @return int port_no'''
+def port_number(port_name):
+    return int(port_name.rsplit('-', 1)[1].lstrip('ethwlan'))
+
+'''Parses command line options of the form --option=<a>x<b>
+   @param str[] args
+   @param str option
+   @param tuple default
+   @return tuple values'''
+def parse_pair(args, option, default):
+    value=next((arg.split('=', 1)[1] for arg in args if arg.startswith(f'--{option}=')), None)
+    return default if value is None else tuple(float(v) if '.' in v else int(v) for v in value.split('x'))
+
+'''Builds a topology description from command line options (--fleet, --grid, --field, --height)
+   @param str[] args
+   @return dict description'''
+def from_args(args):
+    drones=int(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--fleet=')), 8))
+    height=float(next((arg.split('=', 1)[1] for arg in args if arg.startswith('--height=')), 35))
+    rows, cols=parse_pair(args, 'grid', (2, 2))
+    tiers_path=next((arg.split('=', 1)[1] for arg in args if arg.startswith('--tiers=')), None)
+    policy_path=next((arg.split('=', 1)[1] for arg in args if arg.startswith('--policy=')), None)
+    tiers=None
+    if tiers_path is not None:
+        with open(tiers_path, 'r') as f:
+            tiers=json.load(f) #JSON list of tiers, from the best to the worst
+    policies=None
+    if policy_path is not None:
+        with open(policy_path, 'r') as f:
+            policies=json.load(f) #JSON object <endpoint name, policy fields>
+    return describe(drones, rows, cols, parse_pair(args, 'field', (105, 68)), int(height) if height.is_integer() else height, tiers=tiers,
+                    policies=policies)
+
+####################################################################################################################Main
+if __name__ == '__main__':
+    description=from_args(sys.argv[1:])
+    path=next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--out=')), DEFAULT_PATH)
+    save(description, path)
+    print(f"Topology: {description['fleet_size']} drones, {len(description['aps'])} APs ({description['grid'][0]}x{description['grid'][1]}), "
+          f"{len(description['links'])} backbone links, {len(description['tiers'])} quality tiers -> {path}")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""Drone mobility patterns (one position per second of emulation) used by Mininet-WiFi in replay mode. Trajectories are generated with NumPy
+   (vectorized flight segments and hover repeats) and stored as binary .npy files, which are memory-mapped when loaded; the legacy text .dat format
+   (one "x y z" line per second) can still be exported and loaded"""
+
+#################################################################################################################Imports
+import os
+import numpy as np
+
+'''Returns the positions occupied every second while moving from 0 to distance in a number of seconds (0 excluded, distance included)
+   @param float distance [m]
+   @param int duration [s]
+   @return ndarray positions ((duration,) array)'''
+def segment(distance, duration):
+    return np.arange(1, duration+1, dtype=float)*(distance/duration)
+
+'''Returns the positions occupied while retracing a segment back to 0 (last position of the segment excluded, 0 included)
+   @param ndarray forward (positions of the segment)
+   @return ndarray positions'''
+def retrace(forward):
+    return np.append(forward[-2::-1], 0.0)
+
+'''Builds the mobility pattern of a drone: vertical lift to height, flight along X and then along Y to its hovering position, hovering, and way back
+   (deployed drones); or wait at the supply station for the hovering time of the deployed drone, then lift and flight to the hovering position (spare
+   drones). Drones of intermediate waves wait at the supply station, then fly, hover, and come back
+   @param float height [m]
+   @param float distance_x [m]
+   @param float distance_y [m]
+   @param float v (speed [m/s])
+   @param int t_h (hovering time [s])
+   @param bool spare (default False)
+   @param int wait (time at the supply station before lift [s], default None meaning t_h for spare drones and 0 otherwise)
+   @return ndarray trajectory ((T, 3) array of positions, one per second)'''
+def build_trajectory(height, distance_x, distance_y, v, t_h, spare=False, wait=None):
+    if wait is None:
+        wait=t_h if spare else 0
+
+    lift_pos=segment(height, round(height/v)) #intermediate positions during lift
+    x_pos=segment(distance_x, round(distance_x/v)) #intermediate positions during horizontal flight along X axis
+    y_pos=segment(distance_y, round(distance_y/v)) #intermediate positions during horizontal flight along Y axis
+
+    zeros=lambda values: np.zeros_like(values)
+    full=lambda values, value: np.full_like(values, value)
+
+    lift=np.column_stack((zeros(lift_pos), zeros(lift_pos), lift_pos)) #(0, 0, z)
+    fly_x=np.column_stack((x_pos, zeros(x_pos), full(x_pos, height))) #(x, 0, height)
+    fly_y=np.column_stack((full(y_pos, distance_x), y_pos, full(y_pos, height))) #(distance_x, y, height)
+
+    base=np.zeros((wait, 3)) #positions at the supply station before lift
+
+    if spare: #stay at supply station, then reach the hovering position
+        return np.concatenate((base, lift, fly_x, fly_y))
+
+    hover=np.tile((distance_x, distance_y, height), (t_h, 1)).astype(float) #repeat hovering position for hovering time
+
+    y_back=retrace(y_pos)
+    x_back=retrace(x_pos)
+    drop_pos=retrace(lift_pos)
+    fly_y_back=np.column_stack((full(y_back, distance_x), y_back, full(y_back, height)))
+    fly_x_back=np.column_stack((x_back, zeros(x_back), full(x_back, height)))
+    drop=np.column_stack((zeros(drop_pos), zeros(drop_pos), drop_pos))
+
+    return np.concatenate((base, lift, fly_x, fly_y, hover, fly_y_back, fly_x_back, drop))
+
+'''Saves a trajectory as binary .npy file, optionally exporting it also as .dat text file
+   @param str path (path without extension)
+   @param ndarray trajectory
+   @param bool dat (default True)'''
+def save_trajectory(path, trajectory, dat=True):
+    np.save(f'{path}.npy', trajectory)
+    if dat:
+        np.savetxt(f'{path}.dat', trajectory, fmt='%s') #legacy text format: one "x y z" line per second
+
+'''Loads a trajectory, memory-mapping the .npy file if it exists, or parsing the .dat file otherwise
+   @param str path (path without extension)
+   @return TraceSequence trajectory'''
+def load_trajectory(path):
+    if os.path.exists(f'{path}.npy'):
+        return TraceSequence(np.load(f'{path}.npy', mmap_mode='r'))
+    return TraceSequence(np.loadtxt(f'{path}.dat', ndmin=2))
+
+class TraceSequence: ######################################################################################Trace Sequence
+    '''Creates a TraceSequence object: a read-only view of a (T, 3) array of positions behaving like the list of position tuples expected by
+       Mininet-WiFi replaying mobility (len, indexing, and deletion of the first position, which only advances the view)
+       @param ndarray positions'''
+    def __init__(self, positions):
+        self.__positions=positions
+        self.__start=0 #index of the current first position
+
+    def __len__(self):
+        return len(self.__positions)-self.__start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index<0:
+            index+=len(self)
+        if not 0<=index<len(self):
+            raise IndexError('trace index out of range')
+        x, y, z=self.__positions[self.__start+index]
+        return float(x), float(y), float(z)
+
+    def __delitem__(self, index):
+        if index!=0:
+            raise IndexError('only the first position of a trace can be deleted')
+        if len(self)==0:
+            raise IndexError('trace is empty')
+        self.__start+=1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    '''Removes and returns a position (only the first one can be removed)
+       @param TraceSequence object
+       @param int index (default 0)
+       @return (float, float, float) position'''
+    def pop(self, index=0):
+        position=self[index]
+        del self[index]
+        return position